@@ -0,0 +1,6 @@
+"""
+Computational core of the astrological calculator.
+
+Modules in this package do not depend on Streamlit so they can be used from
+the pages, from worker processes and from batch jobs alike.
+"""
@@ -0,0 +1,107 @@
+"""
+Adaptive (quadtree) sampling of map values.
+
+Solar return maps are made of a few large regions separated by sign or house
+boundaries. Instead of sampling a uniform fine grid, the map starts from
+coarse square cells; a cell whose corners and center all agree is kept whole,
+any other cell is split into four, down to a minimum size. Boundaries end up
+resolved to the minimum cell size while only the cells along them are
+refined, so far fewer points are evaluated than on a uniform grid of the
+same resolution.
+"""
+import numpy as np
+
+# Offsets of the points tested in each cell, as fractions of its size:
+# the four corners and the center
+_PROBES = np.array([(0, 0), (0, 1), (1, 0), (1, 1), (0.5, 0.5)])
+
+
+class AdaptiveCells:
+    """
+    Square cells of varying size covering a map, with one value each.
+
+    Attributes:
+        latitudes (np.ndarray): Southern edge of each cell, in degrees.
+        longitudes (np.ndarray): Western edge of each cell, in degrees.
+        sizes (np.ndarray): Side of each cell, in degrees.
+        values (np.ndarray): Value of each cell (sign id or house number).
+        evaluations (int): Number of points evaluated to build the cells.
+    """
+    __slots__ = ('latitudes', 'longitudes', 'sizes', 'values', 'evaluations')
+
+    def __init__(self, latitudes, longitudes, sizes, values, evaluations):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.sizes = sizes
+        self.values = values
+        self.evaluations = evaluations
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.latitudes.nbytes + self.longitudes.nbytes + self.sizes.nbytes + self.values.nbytes
+
+    def polygons(self):
+        """
+        Cell outlines as closed [longitude, latitude] rings.
+
+        Returns:
+            list: One ring of five points per cell, ready for a pydeck PolygonLayer.
+        """
+        lat0, lon0, size = self.latitudes, self.longitudes, self.sizes
+        lat1, lon1 = np.minimum(lat0 + size, 90.0), np.minimum(lon0 + size, 180.0)
+        rings = np.stack([
+            np.stack([lon0, lat0], axis=1), np.stack([lon1, lat0], axis=1),
+            np.stack([lon1, lat1], axis=1), np.stack([lon0, lat1], axis=1),
+            np.stack([lon0, lat0], axis=1),
+        ], axis=1)
+        return rings.round(5).tolist()
+
+
+def adaptive_cells(evaluate, lat_range=(-66, 66), lon_range=(-180, 180), initial_size=6.0, min_size=1 / 6):
+    """
+    Sample a map adaptively.
+
+    Args:
+        evaluate (callable): f(latitudes, longitudes) -> integer values, taking
+            and returning 1-D arrays of points.
+        lat_range (tuple, optional): (south, north) edges of the map.
+        lon_range (tuple, optional): (west, east) edges of the map.
+        initial_size (float, optional): Side of the starting cells, in degrees.
+        min_size (float, optional): Cells are not split below this side, in
+            degrees (1/60 resolves boundaries to an arcminute).
+
+    Returns:
+        AdaptiveCells: The leaves of the quadtree.
+    """
+    lat0 = np.arange(lat_range[0], lat_range[1], initial_size, dtype=np.float64)
+    lon0 = np.arange(lon_range[0], lon_range[1], initial_size, dtype=np.float64)
+    lat, lon = (array.ravel() for array in np.meshgrid(lat0, lon0, indexing='ij'))
+    size = initial_size
+
+    leaves = []
+    evaluations = 0
+    while lat.size:
+        probe_lat = np.minimum(lat[:, None] + _PROBES[:, 0] * size, lat_range[1])
+        probe_lon = np.minimum(lon[:, None] + _PROBES[:, 1] * size, lon_range[1])
+        probes = evaluate(probe_lat.ravel(), probe_lon.ravel()).reshape(probe_lat.shape)
+        evaluations += probes.size
+
+        uniform = (probes == probes[:, :1]).all(axis=1)
+        final = uniform | (size / 2 < min_size)
+        # Leaves take the value at their center
+        leaves.append((lat[final], lon[final], np.full(final.sum(), size), probes[final, -1]))
+
+        half = size / 2
+        split_lat, split_lon = lat[~final], lon[~final]
+        lat = np.concatenate([split_lat, split_lat, split_lat + half, split_lat + half])
+        lon = np.concatenate([split_lon, split_lon + half, split_lon, split_lon + half])
+        # Drop children entirely outside the map
+        inside = (lat < lat_range[1]) & (lon < lon_range[1])
+        lat, lon = lat[inside], lon[inside]
+        size = half
+
+    latitudes, longitudes, sizes, values = (np.concatenate(parts) for parts in zip(*leaves))
+    return AdaptiveCells(latitudes, longitudes, sizes, values, evaluations)
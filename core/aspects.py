@@ -0,0 +1,112 @@
+"""
+Vectorized aspect engine.
+
+Aspects between every pair of planets are found in one pass over an array of
+longitudes, either for a single chart (shape (planet,)) or for a whole time
+series (shape (time, planet)), using a precomputed table of aspect angles and
+orbs.
+"""
+import numpy as np
+
+NO_ASPECT = -1
+
+
+class AspectTable:
+    """
+    Aspect ids, exact angles and orbs as parallel arrays.
+
+    Aspects are checked in table order and the first match wins, like
+    `utils.find_aspect`.
+
+    Attributes:
+        ids (np.ndarray): Aspect ids, shape (aspect,).
+        angles (np.ndarray): Exact aspect angles in degrees.
+        orbs (np.ndarray): Allowed orbs in degrees.
+    """
+    __slots__ = ('ids', 'angles', 'orbs')
+
+    def __init__(self, ids, angles, orbs):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.orbs = np.asarray(orbs, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, aspects):
+        """
+        Build the table from the {id: {'angle': ..., 'orb': ...}} mapping kept in session state.
+        """
+        ids = list(aspects)
+        return cls(
+            ids,
+            [aspects[aspect_id]['angle'] for aspect_id in ids],
+            [aspects[aspect_id]['orb'] for aspect_id in ids],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def separation(lon1, lon2):
+    """
+    Angular distance between longitudes, in [0, 180] degrees.
+    """
+    return np.abs((np.asarray(lon1) - np.asarray(lon2) + 180.0) % 360.0 - 180.0)
+
+
+def pairwise_separation(longitudes):
+    """
+    Angular distance between every pair of planets.
+
+    Args:
+        longitudes (array-like): Shape (..., planet).
+
+    Returns:
+        np.ndarray: Shape (..., planet, planet).
+    """
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return separation(longitudes[..., :, None], longitudes[..., None, :])
+
+
+def find_aspects(longitudes, table):
+    """
+    Find the aspect formed by every pair of planets.
+
+    Args:
+        longitudes (array-like): Shape (..., planet).
+        table (AspectTable): Aspects to look for.
+
+    Returns:
+        tuple: (aspect_ids, orbs), both shaped (..., planet, planet). aspect_ids
+        holds NO_ASPECT where no aspect is formed; orbs holds the signed
+        distance from the exact angle (separation - angle) and NaN where no
+        aspect is formed. The diagonal compares each planet with itself.
+    """
+    sep = pairwise_separation(longitudes)
+    deviation = sep[..., None] - table.angles
+    within = np.abs(deviation) <= table.orbs
+
+    found = within.any(axis=-1)
+    first = within.argmax(axis=-1)
+    aspect_ids = np.where(found, table.ids[first], NO_ASPECT)
+    orbs = np.where(found, np.take_along_axis(deviation, first[..., None], axis=-1)[..., 0], np.nan)
+    return aspect_ids, orbs
+
+
+def aspect_matrix(longitudes, table, aspect_id):
+    """
+    Adjacency matrix of a single aspect.
+
+    Unlike `find_aspects`, a pair counts even if an earlier aspect in the table
+    also matches, which is what pattern searches need.
+
+    Args:
+        longitudes (array-like): Shape (..., planet).
+        table (AspectTable): Table holding the aspect's angle and orb.
+        aspect_id (int): Aspect to test.
+
+    Returns:
+        np.ndarray: Boolean array shaped (..., planet, planet).
+    """
+    index = int(np.flatnonzero(table.ids == aspect_id)[0])
+    sep = pairwise_separation(longitudes)
+    return np.abs(sep - table.angles[index]) <= table.orbs[index]
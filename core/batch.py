@@ -0,0 +1,416 @@
+"""
+Batch natal charts for whole lists of birth records.
+
+Records are read from CSV or Parquet in chunks; every chunk is resolved
+(place, timezone, UTC Julian day) and charted in a worker process, with the
+houses, signs, aspects and element/modality shares computed as arrays over
+all the records of the chunk. Results are written in input order as each
+chunk completes, so memory stays bounded by the number of chunks in flight.
+
+Input columns (any other column is copied to the output):
+
+    date        ISO date, YYYY-MM-DD (years 1000-3000 are fine)
+    time        local time, HH:MM or HH:MM:SS (noon when missing)
+    latitude    degrees, north positive   } or `city`, resolved with the
+    longitude   degrees, east positive    } offline gazetteer
+    timezone    IANA name (optional; from the city or the coordinates,
+                which needs the timezone index of core.timezones)
+
+Run with:
+
+    python -m core.batch clients.csv --output charts.parquet --workers 8
+"""
+import argparse
+import collections
+import concurrent.futures
+import datetime
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytz
+import swisseph as swe
+
+from core.aspects import NO_ASPECT, find_aspects
+from core.chart import planet_weights
+from core.ephemeris import DEFAULT_FLAGS, datetime_to_julday
+from core.geocoding import GeocodingError, geocode
+from core.houses import HOUSE_SYSTEMS, ascendant, ecliptic_to_equatorial, house_position, midheaven, sidereal_context
+from core.signs import ELEMENTS, MODALITIES, sign_of, weighted_shares
+from core.parallel import DEFAULT_WORKERS, _init_worker
+from core.reference import load_reference
+from core.timezones import local_to_utc, timezone_at
+
+DEFAULT_CHUNK_ROWS = 2000
+# Chunks submitted ahead of the one being written, per worker
+CHUNKS_IN_FLIGHT = 2
+
+
+def read_records(path, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """
+    Read birth records in chunks.
+
+    CSV columns are read as text, so every chunk has the same column types.
+    Parquet needs pyarrow.
+
+    Args:
+        path (str): A .csv or .parquet file.
+        chunk_rows (int, optional): Rows per chunk.
+
+    Yields:
+        pd.DataFrame: Consecutive chunks of records.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunk_rows)
+
+
+def _column(records, name, default=''):
+    if name in records:
+        return records[name].astype(str).str.strip().replace({'nan': '', 'None': ''})
+    return pd.Series(default, index=records.index)
+
+
+def resolve_records(records):
+    """
+    Resolve the place, timezone and UTC Julian day of each record.
+
+    Args:
+        records (pd.DataFrame): Birth records (see the module docstring).
+
+    Returns:
+        pd.DataFrame: latitude, longitude, timezone, julday_ut and error
+        columns; rows that could not be resolved have an error message and
+        NaN Julian day.
+    """
+    dates = _column(records, 'date').str.extract(r'^(\d{1,4})-(\d{1,2})-(\d{1,2})').to_numpy()
+    times = _column(records, 'time', '12:00').replace('', '12:00').str.extract(r'^(\d{1,2}):(\d{2})(?::(\d{2}))?').to_numpy()
+    latitudes = pd.to_numeric(_column(records, 'latitude'), errors='coerce').to_numpy(dtype=np.float64)
+    longitudes = pd.to_numeric(_column(records, 'longitude'), errors='coerce').to_numpy(dtype=np.float64)
+    cities = _column(records, 'city').to_numpy()
+    zones = _column(records, 'timezone').to_numpy().astype(object)
+
+    count = len(records)
+    julday = np.full(count, np.nan)
+    errors = np.full(count, '', dtype=object)
+    for row in range(count):
+        if np.isnan(latitudes[row]) or np.isnan(longitudes[row]):
+            try:
+                place = geocode(cities[row], remote=False) if cities[row] else None
+            except GeocodingError:
+                errors[row] = 'unknown place (gazetteer not built)'
+                continue
+            if place is None:
+                errors[row] = 'unknown place'
+                continue
+            latitudes[row], longitudes[row] = place.latitude, place.longitude
+            zones[row] = zones[row] or place.timezone
+        if not zones[row]:
+            try:
+                zones[row] = timezone_at(latitudes[row], longitudes[row])
+            except FileNotFoundError:
+                errors[row] = 'no timezone (timezone index not built)'
+                continue
+        try:
+            year, month, day = (int(value) for value in dates[row])
+            hour, minute = int(times[row, 0]), int(times[row, 1])
+            second = int(times[row, 2]) if isinstance(times[row, 2], str) else 0
+            local_time = datetime.datetime(year, month, day, hour, minute, second)
+        except (TypeError, ValueError):
+            errors[row] = 'invalid date or time'
+            continue
+        try:
+            julday[row] = datetime_to_julday(local_to_utc(local_time, zones[row]))
+        except pytz.UnknownTimeZoneError:
+            errors[row] = 'unknown timezone'
+
+    return pd.DataFrame({
+        'latitude': latitudes, 'longitude': longitudes, 'timezone': zones,
+        'julday_ut': julday, 'error': errors,
+    }, index=records.index)
+
+
+def compute_charts(julday, latitudes, longitudes, reference, systems=(b'P',), flags=DEFAULT_FLAGS):
+    """
+    Charts of many records at once.
+
+    Planet and angle positions need one Swiss Ephemeris call per record and
+    planet; houses, signs, aspects and distributions are then evaluated as
+    (record, planet) arrays, in every requested house system.
+
+    Args:
+        julday (np.ndarray): Julian days (UT), shape (record,).
+        latitudes (np.ndarray): Geographic latitudes in degrees.
+        longitudes (np.ndarray): Geographic longitudes in degrees.
+        reference (ReferenceData): Planets, signs and aspects.
+        systems (tuple of bytes, optional): House systems (see
+            core.houses.HOUSE_SYSTEMS); Placidus by default.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        pd.DataFrame: One row per record with per-planet longitude, sign,
+        house and retrograde columns (the house in the first system is
+        `<planet>_house`, in the others `<planet>_<system>_house`), Ascendant and MC, one column per
+        planet pair with the aspect name, and element/modality percentages.
+    """
+    planet_ids = list(reference.planets)
+    count, n_planets = len(julday), len(planet_ids)
+    ecliptic = np.empty((count, n_planets, 3))
+    context = np.empty((count, 2))
+    for row, jd in enumerate(julday.tolist()):
+        for column, planet_id in enumerate(planet_ids):
+            values = swe.calc_ut(jd, planet_id, flags)[0]
+            ecliptic[row, column] = values[0], values[1], values[3]
+        context[row] = sidereal_context(jd)
+
+    # Equatorial coordinates by rotating the ecliptic ones by the true obliquity,
+    # instead of a second Swiss Ephemeris call per planet
+    armc = (context[:, :1] + longitudes[:, None]) % 360.0
+    eps = context[:, 1:]
+    # Ascendant and MC analytically: swe.houses fails beyond the polar circles
+    angles = np.column_stack([
+        ascendant(armc[:, 0], eps[:, 0], latitudes), midheaven(armc[:, 0], eps[:, 0]),
+    ])
+    equatorial = ecliptic_to_equatorial(ecliptic[..., 0], ecliptic[..., 1], eps)
+    houses = {
+        hsys: house_position(
+            hsys, armc, eps, latitudes[:, None], (ecliptic[..., 0], ecliptic[..., 1]), equatorial
+        ).astype(np.int8)
+        for hsys in systems
+    }
+    suffixes = {
+        hsys: '' if index == 0 else '_' + HOUSE_SYSTEMS.get(hsys, hsys.decode()).lower().replace(' ', '_')
+        for index, hsys in enumerate(systems)
+    }
+    signs = sign_of(ecliptic[..., 0])
+    angle_signs = sign_of(angles)
+
+    table = reference.sign_table()
+    sign_names = table.names
+    columns = {}
+    names = [reference.planets[planet_id]['name'].lower().replace(' ', '_') for planet_id in planet_ids]
+    for column, name in enumerate(names):
+        columns[f'{name}_lon'] = ecliptic[:, column, 0]
+        columns[f'{name}_sign'] = sign_names[signs[:, column]]
+        for hsys, suffix in suffixes.items():
+            columns[f'{name}{suffix}_house'] = houses[hsys][:, column]
+        columns[f'{name}_retrograde'] = ecliptic[:, column, 2] < 0
+    for column, name in enumerate(('asc', 'mc')):
+        columns[f'{name}_lon'] = angles[:, column]
+        columns[f'{name}_sign'] = sign_names[angle_signs[:, column]]
+
+    aspect_ids, _ = find_aspects(ecliptic[..., 0], reference.aspect_table())
+    aspect_names = {aspect_id: aspect['name'] for aspect_id, aspect in reference.aspects.items()}
+    aspect_names[NO_ASPECT] = ''
+    lookup_ids = np.array(sorted(aspect_names))
+    lookup_names = np.array([aspect_names[aspect_id] for aspect_id in lookup_ids], dtype=object)
+    for first, second in zip(*np.triu_indices(n_planets, k=1)):
+        pair_ids = aspect_ids[:, first, second]
+        columns[f'aspect_{names[first]}_{names[second]}'] = lookup_names[np.searchsorted(lookup_ids, pair_ids)]
+
+    # Element/modality shares: planets weigh 3 (luminaries), 2 (to Jupiter) or 1,
+    # Ascendant and MC weigh 3, as on the Natal Chart page
+    weights = np.concatenate([planet_weights(planet_ids), [3, 3]])
+    all_signs = np.concatenate([signs, angle_signs], axis=1)
+    for categories, field, codes in ((ELEMENTS, 'element', table.elements), (MODALITIES, 'modality', table.modalities)):
+        shares = weighted_shares(codes[all_signs], weights, len(categories))
+        for index, category in enumerate(categories):
+            columns[f'{field}_{category.lower()}_pct'] = shares[:, index]
+    return pd.DataFrame(columns)
+
+
+def chart_records(records, reference, systems=(b'P',)):
+    """
+    Resolve and chart a chunk of records.
+
+    Args:
+        records (pd.DataFrame): Birth records.
+        reference (ReferenceData): Reference tables.
+        systems (tuple of bytes, optional): House systems.
+
+    Returns:
+        pd.DataFrame: The input columns, the resolved place and time, and the
+        chart columns (empty for records with an error).
+    """
+    resolved = resolve_records(records)
+    valid = resolved['error'].to_numpy() == ''
+    charts = compute_charts(
+        resolved['julday_ut'].to_numpy()[valid], resolved['latitude'].to_numpy()[valid],
+        resolved['longitude'].to_numpy()[valid], reference, systems,
+    )
+    # Same column types in every chunk, whether or not it has failed records,
+    # so a chunk where every record failed does not give all-null columns
+    charts = charts.set_axis(records.index[valid]).reindex(records.index).astype(
+        {name: _chart_dtype(name) for name in charts}
+    )
+    output = pd.concat([
+        records.drop(columns=[name for name in resolved if name in records]),
+        resolved.astype({'timezone': 'string', 'error': 'string'}),
+        charts,
+    ], axis=1)
+    return output.reset_index(drop=True)
+
+
+def _chart_dtype(name):
+    """Declared dtype of a chart column, from its name (see compute_charts)."""
+    if name.endswith('_house'):
+        return 'Int8'
+    if name.endswith('_retrograde'):
+        return 'boolean'
+    if name.endswith('_sign') or name.startswith('aspect_'):
+        return 'string'
+    return 'float64'
+
+
+class ChartWriter:
+    """
+    Append chart chunks to a CSV or Parquet file.
+
+    Attributes:
+        path (str): Output file; Parquet when it ends with .parquet.
+        rows (int): Rows written so far.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.rows = 0
+        self._writer = None
+
+    def write(self, frame):
+        if self.path.endswith('.parquet'):
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            if self._writer is None:
+                # Chart columns have declared dtypes (see chart_records); input
+                # columns that are empty in the first chunk are taken as text
+                schema = pa.Schema.from_pandas(frame, preserve_index=False)
+                schema = pa.schema([
+                    field.with_type(pa.large_string()) if pa.types.is_null(field.type) else field for field in schema
+                ], metadata=schema.metadata)
+                table = pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(frame, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode='w' if self.rows == 0 else 'a', header=self.rows == 0, index=False)
+        self.rows += len(frame)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _chart_chunks(chunks, reference, systems, workers, ephe_path):
+    """Chart chunks across a process pool, yielding results in input order."""
+    if workers > 1:
+        try:
+            executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(ephe_path,),
+            )
+        except (OSError, NotImplementedError, ValueError):
+            workers = 1
+    if workers <= 1:
+        for records in chunks:
+            yield chart_records(records, reference, systems)
+        return
+
+    with executor:
+        pending = collections.deque()
+        chunks = iter(chunks)
+        while True:
+            # Keep a bounded number of chunks in flight, so memory does not grow with the input
+            while len(pending) < workers * CHUNKS_IN_FLIGHT:
+                records = next(chunks, None)
+                if records is None:
+                    break
+                pending.append((records, executor.submit(chart_records, records, reference, systems)))
+            if not pending:
+                return
+            records, future = pending.popleft()
+            try:
+                yield future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # The pool died (e.g. the platform cannot spawn): chart this chunk here
+                yield chart_records(records, reference, systems)
+
+
+def run_batch(input_path, output_path, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS, reference=None,
+              systems=(b'P',), ephe_path=None, progress=None):
+    """
+    Chart every record of an input file into an output file.
+
+    Args:
+        input_path (str): Birth records, .csv or .parquet.
+        output_path (str): Charts, .csv or .parquet.
+        workers (int, optional): Worker processes; defaults to DEFAULT_WORKERS.
+        chunk_rows (int, optional): Records per chunk.
+        reference (ReferenceData, optional): Reference tables; the data/ files
+            by default.
+        systems (tuple of bytes, optional): House systems; Placidus by default.
+        ephe_path (str, optional): Swiss Ephemeris data path for the workers.
+        progress (callable, optional): Called with the running statistics
+            after each chunk.
+
+    Returns:
+        dict: rows, failed, chunks, seconds and rows_per_second.
+    """
+    workers = DEFAULT_WORKERS if workers is None else max(1, int(workers))
+    reference = load_reference() if reference is None else reference
+    stats = {'rows': 0, 'failed': 0, 'chunks': 0, 'seconds': 0.0, 'rows_per_second': 0.0}
+    started = time.perf_counter()
+    with ChartWriter(output_path) as writer:
+        for charts in _chart_chunks(read_records(input_path, chunk_rows), reference, systems, workers, ephe_path):
+            writer.write(charts)
+            stats['rows'] += len(charts)
+            stats['failed'] += int((charts['error'] != '').sum())
+            stats['chunks'] += 1
+            stats['seconds'] = time.perf_counter() - started
+            stats['rows_per_second'] = stats['rows'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress is not None:
+                progress(stats)
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compute natal charts for a file of birth records.')
+    parser.add_argument('input', help='Birth records (.csv or .parquet)')
+    parser.add_argument('--output', required=True, help='Charts (.csv or .parquet)')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help='Worker processes (1 = serial)')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Records per chunk')
+    parser.add_argument('--house-systems', default='P',
+                        help='House system codes, the first one being the main one (e.g. P,K,W,E,R,C)')
+    parser.add_argument('--ephe-path', default=os.environ.get('SE_EPHE_PATH'), help='Swiss Ephemeris data path')
+    args = parser.parse_args(argv)
+
+    def progress(stats):
+        print(f"\r{stats['rows']} charts, {stats['rows_per_second']:.0f}/s", end='', file=sys.stderr)
+    systems = tuple(code.strip().upper().encode() for code in args.house_systems.split(',') if code.strip())
+    stats = run_batch(args.input, args.output, args.workers, args.chunk_rows, systems=systems,
+                      ephe_path=args.ephe_path, progress=progress)
+    print(
+        f"\nWrote {stats['rows']} charts ({stats['failed']} failed) to {args.output} "
+        f"in {stats['seconds']:.1f} s: {stats['rows_per_second']:.0f} charts/s, "
+        f"{stats['chunks']} chunks, {args.workers} workers",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
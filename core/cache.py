@@ -0,0 +1,223 @@
+"""
+Bounded LRU cache for computed results, with an optional on-disk tier.
+
+Results are kept in memory up to a total size in bytes (taken from the
+value's `nbytes` when it has one), evicting the least recently used entries
+first. When a directory is given, every stored result is also pickled there,
+so it survives restarts and is shared between processes; a memory miss that
+hits the disk promotes the entry back to memory. The disk tier has its own
+byte budget: a file's modification time is refreshed whenever it is read, and
+the least recently used files are deleted once the directory grows past the
+budget. The cache is thread safe, since Streamlit serves each session from
+its own thread.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+DISK_SUFFIX = '.pkl'
+
+
+def _size_of(value):
+    """Approximate memory footprint of a cached value, in bytes."""
+    nbytes = getattr(value, 'nbytes', None)
+    return int(nbytes) if nbytes is not None else sys.getsizeof(value)
+
+
+class ResultCache:
+    """
+    Memory-bounded LRU cache.
+
+    Attributes:
+        max_bytes (int): Memory budget for the cached values.
+        directory (str | None): Directory of the on-disk tier, if any.
+        max_disk_bytes (int): Budget for the files of the on-disk tier.
+        hits (int): Lookups answered from memory.
+        disk_hits (int): Lookups answered from disk.
+        misses (int): Lookups that found nothing.
+    """
+
+    def __init__(self, max_bytes=64 * 2**20, directory=None, max_disk_bytes=512 * 2**20):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    @property
+    def nbytes(self):
+        return self._nbytes
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + DISK_SUFFIX)
+
+    def _disk_files(self):
+        """(mtime, size, path) of every file of the disk tier, oldest first."""
+        files = []
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return files
+        for name in names:
+            if not name.endswith(DISK_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Removed by another process in the meantime
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        return files
+
+    def _evict_disk(self):
+        """Delete the least recently used files until the disk tier fits its budget."""
+        files = self._disk_files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _remember(self, key, value):
+        """Insert into memory and evict down to the budget; lock must be held."""
+        if key in self._entries:
+            self._nbytes -= _size_of(self._entries.pop(key))
+        self._entries[key] = value
+        self._nbytes += _size_of(value)
+        while self._nbytes > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self._nbytes -= _size_of(evicted)
+
+    def get(self, key, default=None):
+        """
+        Look up a result, from memory first and then from disk.
+
+        Args:
+            key (tuple): Hashable key; its repr also names the disk file.
+            default (optional): Returned when the key is not cached.
+
+        Returns:
+            The cached value, or `default`.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as file:
+                    stored_key, value = pickle.load(file)
+            except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+                stored_key = None
+            if stored_key == key:
+                try:
+                    # Mark the file as recently used for disk eviction
+                    os.utime(self._path(key))
+                except OSError:
+                    pass
+                with self._lock:
+                    self.disk_hits += 1
+                    self._remember(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """
+        Store a result in memory and, when enabled, on disk.
+
+        Args:
+            key (tuple): Hashable key.
+            value: Result to cache; arrays and objects exposing `nbytes` are
+                sized exactly.
+        """
+        with self._lock:
+            self._remember(key, value)
+        if self.directory:
+            # Write to a temporary file and rename, so readers never see a partial file
+            descriptor, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(descriptor, 'wb') as file:
+                    pickle.dump((key, value), file, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_path, self._path(key))
+            except OSError:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            self._evict_disk()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for a key, computing and storing it on a miss.
+
+        Args:
+            key (tuple): Hashable key.
+            compute (callable): Called without arguments to build the result.
+
+        Returns:
+            The cached or newly computed value.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        """
+        Cache counters.
+
+        Returns:
+            dict: Entries and bytes in memory and on disk, and hit/miss
+            counters.
+        """
+        files = self._disk_files() if self.directory else []
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'nbytes': self._nbytes,
+                'max_bytes': self.max_bytes,
+                'disk_entries': len(files),
+                'disk_bytes': sum(size for _, size, _ in files),
+                'max_disk_bytes': self.max_disk_bytes,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+            }
+
+    def clear(self):
+        """Drop every entry, from memory and from the disk tier."""
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+        if self.directory:
+            for _, _, path in self._disk_files():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
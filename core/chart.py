@@ -0,0 +1,242 @@
+"""
+Natal charts and the scalar helpers used to display them.
+
+Everything here takes the reference tables explicitly (see core.reference),
+so a chart can be computed in a worker process, a batch job or a benchmark
+as well as in a Streamlit page.
+"""
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from core.aspects import find_aspects
+from core.ephemeris import DEFAULT_FLAGS
+from core.houses import HOUSE_SYSTEMS, house_positions, house_systems
+from core.signs import ELEMENTS, MODALITIES, format_dms, sign_of, weighted_shares
+
+# Ascendant and MC weigh as much as the luminaries, the other cusps nothing
+CUSP_WEIGHTS = np.where(np.isin(np.arange(12), (0, 9)), 3, 0)
+
+
+def planet_weights(planet_ids):
+    """
+    Weight of each planet in element and modality shares.
+
+    Luminaries weigh 3, Mercury to Jupiter 2 and the outer planets 1; the
+    Ascendant and MC weigh 3 like the luminaries.
+
+    Args:
+        planet_ids (array-like): Swiss Ephemeris planet ids.
+
+    Returns:
+        np.ndarray: Weights, same shape.
+    """
+    planet_ids = np.asarray(planet_ids)
+    return np.where(planet_ids <= 1, 3, np.where(planet_ids <= 5, 2, 1))
+
+
+def calculate_sign(longitude):
+    """
+    Calculate the zodiac sign for a given planetary longitude.
+
+    Args:
+        longitude (float): Longitude of the planet in degrees.
+
+    Returns:
+        int: The zodiac sign corresponding to the longitude (0-11).
+    """
+    return int(longitude // 30)
+
+
+def sign_string(lon, table):
+    """
+    Format a longitude as sign symbol, degrees, minutes and seconds.
+
+    Args:
+        lon (float): Ecliptic longitude in degrees.
+        table (SignTable): Sign symbols, e.g. the cached
+            ReferenceData.sign_table().
+
+    Returns:
+        str: e.g. '♈︎ 12° 34' 56"'.
+    """
+    return format_dms(lon, table.symbols).item()
+
+
+def is_aspect(angle1, angle2, aspect):
+    """
+    Check if two planetary angles form a specific aspect.
+
+    Args:
+        angle1 (float): The first planetary angle in degrees.
+        angle2 (float): The second planetary angle in degrees.
+        aspect (dict): Aspect with 'angle' and 'orb' (see ReferenceData.aspects).
+
+    Returns:
+        bool: True if the aspect is formed, False otherwise.
+    """
+    angle = aspect['angle']
+    orb = aspect['orb']
+    return angle - orb <= abs(swe.difdeg2n(angle1, angle2)) <= angle + orb
+
+
+def find_aspect(lon1, lon2, aspects):
+    """
+    First aspect formed by two longitudes.
+
+    Args:
+        lon1 (float): First longitude in degrees.
+        lon2 (float): Second longitude in degrees.
+        aspects (dict): Aspect table (see ReferenceData.aspects).
+
+    Returns:
+        int or None: The aspect id, or None when no aspect is formed.
+    """
+    for aspect_id, aspect in aspects.items():
+        if is_aspect(lon1, lon2, aspect):
+            return aspect_id
+    return None
+
+
+class NatalChart:
+    """
+    Planet positions, houses and cusps of a chart.
+
+    Attributes:
+        jd (float): Julian day (UT) of the chart.
+        latitude (float): Geographic latitude in degrees.
+        longitude (float): Geographic longitude in degrees.
+        planet_ids (np.ndarray): Swiss Ephemeris planet ids, shape (planet,).
+        positions (np.ndarray): [longitude, latitude, speed] of each planet,
+            shape (planet, 3).
+        houses (np.ndarray): House number of each planet (1-12).
+        cusps (np.ndarray): Longitudes of the twelve house cusps.
+        ascmc (np.ndarray): Ascendant, MC and the other angles from `swe.houses`.
+    """
+    __slots__ = ('jd', 'latitude', 'longitude', 'planet_ids', 'positions', 'houses', 'cusps', 'ascmc')
+
+    def __init__(self, jd, latitude, longitude, planet_ids, positions, houses, cusps, ascmc):
+        self.jd = jd
+        self.latitude = latitude
+        self.longitude = longitude
+        self.planet_ids = planet_ids
+        self.positions = positions
+        self.houses = houses
+        self.cusps = cusps
+        self.ascmc = ascmc
+
+    @property
+    def longitudes(self):
+        return self.positions[:, 0]
+
+    def aspects(self, table):
+        """
+        Aspects between every pair of planets.
+
+        Args:
+            table (AspectTable): Aspects and orbs to use.
+
+        Returns:
+            tuple: (aspect ids, signed orbs), both shaped (planet, planet);
+            NO_ASPECT where no aspect is formed.
+        """
+        return find_aspects(self.longitudes, table)
+
+    def frame(self, reference):
+        """
+        Planets and cusps as one display table.
+
+        Args:
+            reference (ReferenceData): Names, symbols and signs.
+
+        Returns:
+            pd.DataFrame: One row per cusp ('House' type) and per planet
+            ('Planet' type) with Name, Type, House, Lon, Symbol, Direction,
+            Weight, Sign and Longitude columns.
+        """
+        planets = reference.planets
+        cusps = pd.DataFrame({
+            'Name': None, 'Type': 'House', 'House': np.arange(1, 13), 'Lon': self.cusps,
+            'Symbol': None, 'Direction': None,
+            'Weight': CUSP_WEIGHTS,
+        })
+        bodies = pd.DataFrame({
+            'Name': [planets[planet_id]['name'] for planet_id in self.planet_ids],
+            'Type': 'Planet',
+            'House': self.houses,
+            'Lon': self.longitudes,
+            'Symbol': [planets[planet_id]['symbol'] for planet_id in self.planet_ids],
+            'Direction': np.where(self.positions[:, 2] < 0, '℞', ''),
+            'Weight': planet_weights(self.planet_ids),
+        })
+        data = pd.concat([cusps, bodies], ignore_index=True)
+        longitudes = data['Lon'].to_numpy(dtype=np.float64)
+        data['Sign'] = sign_of(longitudes).astype(np.int64)
+        data['Longitude'] = format_dms(longitudes, reference.sign_table().symbols)
+        return data
+
+    def house_systems(self, systems=tuple(HOUSE_SYSTEMS)):
+        """
+        House numbers and cusps of the chart in several house systems.
+
+        Args:
+            systems (iterable of bytes, optional): House systems; all of
+                core.houses.HOUSE_SYSTEMS by default.
+
+        Returns:
+            dict: House system -> (house number of each planet, the twelve
+            cusp longitudes).
+        """
+        return {
+            hsys: (positions.astype(np.int64), cusps)
+            for hsys, (cusps, positions) in house_systems(
+                self.jd, self.planet_ids.tolist(), self.latitude, self.longitude, systems
+            ).items()
+        }
+
+    def distribution(self, reference):
+        """
+        Weighted share of each element and modality, planets and angles included.
+
+        Args:
+            reference (ReferenceData): Elements and modalities of the signs.
+
+        Returns:
+            tuple: (elements, modalities) as pd.Series of percentages.
+        """
+        table = reference.sign_table()
+        weights = np.concatenate([CUSP_WEIGHTS, planet_weights(self.planet_ids)])
+        signs = sign_of(np.concatenate([self.cusps, self.longitudes]))
+        elements = weighted_shares(table.elements[signs], weights, len(ELEMENTS))
+        modalities = weighted_shares(table.modalities[signs], weights, len(MODALITIES))
+        return (
+            pd.Series(elements, index=pd.Index(ELEMENTS, name='Element'), name='Weight'),
+            pd.Series(modalities, index=pd.Index(MODALITIES, name='Modality'), name='Weight'),
+        )
+
+
+def natal_chart(jd, latitude, longitude, planet_ids, hsys=b'P', flags=DEFAULT_FLAGS):
+    """
+    Compute a chart.
+
+    Args:
+        jd (float): Julian day (UT).
+        latitude (float): Geographic latitude in degrees.
+        longitude (float): Geographic longitude in degrees.
+        planet_ids (iterable): Swiss Ephemeris planet ids.
+        hsys (bytes, optional): House system, b'P' (Placidus) by default.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        NatalChart: The chart.
+    """
+    planet_ids = np.array(list(planet_ids), dtype=np.int64)
+    positions = np.array([
+        [values[0], values[1], values[3]] for values in (swe.calc_ut(jd, int(pid), flags)[0] for pid in planet_ids)
+    ]).reshape(-1, 3)
+    houses, _ = house_positions(jd, planet_ids.tolist(), latitude, longitude, hsys)
+    cusps, ascmc = swe.houses(jd, latitude, longitude, hsys)
+    return NatalChart(
+        jd, latitude, longitude, planet_ids, positions, houses.astype(np.int64),
+        np.array(cusps[:12]), np.array(ascmc),
+    )
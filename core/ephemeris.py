@@ -0,0 +1,171 @@
+"""
+Array-backed ephemeris engine.
+
+Planet positions are stored in a single contiguous NumPy array shaped
+(time, planet, field) where field is [longitude, latitude, speed]. Nothing in
+the hot path allocates a dict per row; a long-format DataFrame is only built
+when a caller explicitly asks for one through `PlanetPositions.to_frame`.
+"""
+import datetime
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+# Field indices along the last axis of `PlanetPositions.data`
+LON, LAT, SPEED = 0, 1, 2
+FIELDS = ('longitude', 'latitude', 'speed')
+
+DEFAULT_FLAGS = swe.FLG_SWIEPH | swe.FLG_SPEED
+
+# Upper bound of the geocentric longitude speed of each planet, in degrees per
+# day, with a small margin over the fastest motion seen in 1000-3000 CE
+MAX_SPEED = {0: 1.03, 1: 15.5, 2: 2.25, 3: 1.3, 4: 0.82, 5: 0.26, 6: 0.14, 7: 0.075, 8: 0.045, 9: 0.05}
+
+
+class PlanetPositions:
+    """
+    Planet positions sampled over a series of Julian days.
+
+    Attributes:
+        jd (np.ndarray): Julian days (UT), shape (time,).
+        planet_ids (np.ndarray): Swiss Ephemeris planet ids, shape (planet,).
+        data (np.ndarray): Positions, shape (time, planet, 3) with the fields
+            [longitude, latitude, speed] in degrees and degrees/day.
+    """
+    __slots__ = ('jd', 'planet_ids', 'data')
+
+    def __init__(self, jd, planet_ids, data):
+        self.jd = jd
+        self.planet_ids = planet_ids
+        self.data = data
+
+    def __len__(self):
+        return len(self.jd)
+
+    @property
+    def longitude(self):
+        return self.data[..., LON]
+
+    @property
+    def latitude(self):
+        return self.data[..., LAT]
+
+    @property
+    def speed(self):
+        return self.data[..., SPEED]
+
+    def to_frame(self):
+        """
+        Build the long-format view (one row per time and planet).
+
+        Returns:
+            pd.DataFrame: Columns julday, planet_id, longitude, latitude, speed.
+        """
+        n_times, n_planets = self.data.shape[:2]
+        frame = {
+            'julday': np.repeat(self.jd, n_planets),
+            'planet_id': np.tile(self.planet_ids, n_times),
+        }
+        for index, field in enumerate(FIELDS):
+            frame[field] = self.data[..., index].ravel()
+        return pd.DataFrame(frame)
+
+
+def datetime_to_julday(date):
+    """
+    Convert a datetime object to a Julian day.
+
+    Args:
+        date (datetime.date): A Python date or datetime object.
+
+    Returns:
+        float: The Julian day corresponding to the given date.
+    """
+    year = date.year
+    month = date.month
+    day = date.day
+    hour = getattr(date, 'hour', 0)
+    minute = getattr(date, 'minute', 0)
+    second = getattr(date, 'second', 0)
+    microsecond = getattr(date, 'microsecond', 0)
+    
+    hour_float = hour + minute / 60 + second / 3600 + microsecond / 3600000000
+    return swe.julday(year, month, day, hour_float)
+
+
+def julday_to_datetime(julday: float) -> datetime.datetime:
+    """
+    Convert a Julian day to a datetime object.
+
+    Args:
+        julday (float): Julian day to be converted.
+
+    Returns:
+        datetime.datetime: A Python datetime object representing the given Julian day.
+    """
+    year, month, day, hour = swe.revjul(julday)
+    
+    # Extract hours, minutes, and seconds from the fractional part of the day
+    hours = int(hour)
+    minutes = int((hour - hours) * 60)
+    seconds = int((((hour - hours) * 60) - minutes) * 60)
+    
+    # Create the datetime object
+    return datetime.datetime(year, month, day, hours, minutes, seconds)
+
+
+def julday_range(julday_start, julday_end, julday_step):
+    """
+    Build the sampling grid from start to end (inclusive) with a fixed step.
+
+    The grid is computed as start + i * step instead of by repeated addition,
+    so long ranges do not accumulate rounding error.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): The increment in Julian days.
+
+    Returns:
+        np.ndarray: Julian days, shape (time,).
+    """
+    if julday_step <= 0:
+        raise ValueError('julday_step must be positive')
+    if julday_end < julday_start:
+        return np.empty(0)
+    count = int(np.floor((julday_end - julday_start) / julday_step + 1e-9)) + 1
+    return julday_start + julday_step * np.arange(count)
+
+
+def compute_positions(julday, planet_ids, flags=DEFAULT_FLAGS):
+    """
+    Calculate positions of several planets for an array of Julian days.
+
+    Calls are batched planet by planet so every Swiss Ephemeris call in the
+    inner loop reuses the same planet and flags, and the results are written
+    straight into the preallocated output array.
+
+    Args:
+        julday (float or array-like): Julian day(s) in UT.
+        planet_ids (iterable of int): Swiss Ephemeris planet ids.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        PlanetPositions: Positions shaped (time, planet, 3).
+    """
+    jd = np.ascontiguousarray(np.atleast_1d(julday), dtype=np.float64)
+    ids = np.asarray(list(planet_ids), dtype=np.int32)
+    data = np.empty((jd.size, ids.size, 3))
+    if jd.size == 0:
+        return PlanetPositions(jd, ids, data)
+
+    calc_ut = swe.calc_ut
+    times = jd.tolist()
+    for column, planet_id in enumerate(ids.tolist()):
+        # calc_ut returns (lon, lat, dist, lon_speed, lat_speed, dist_speed)
+        xx = np.array([calc_ut(t, planet_id, flags)[0] for t in times])
+        data[:, column, LON] = xx[:, 0]
+        data[:, column, LAT] = xx[:, 1]
+        data[:, column, SPEED] = xx[:, 3]
+    return PlanetPositions(jd, ids, data)
@@ -0,0 +1,328 @@
+"""
+Persistent, memory-mapped ephemeris store.
+
+Planet positions for a fixed sampling grid (daily by default, 1000-3000 CE to
+match the birth date limits) are precomputed once and written to a compact
+binary file:
+
+    magic (8 bytes) | header length (uint32) | JSON header | padding | data
+
+The data block is a little-endian float32 array shaped (time, planet, 3)
+holding [longitude, latitude, speed], so a full daily table for ten planets
+is about 88 MB and longitudes are exact to better than 0.1". The header
+records the grid, the planet ids, the Swiss Ephemeris version and flags the
+file was built with, and a fingerprint of those values. A store built with a
+different pyswisseph version or flags is ignored, and callers fall back to
+live computation.
+
+Build it with:
+
+    python -m core.ephemeris_store build --output data/ephemeris.bin
+"""
+import argparse
+import datetime
+import functools
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+
+import numpy as np
+import swisseph as swe
+
+from core.ephemeris import DEFAULT_FLAGS, PlanetPositions, compute_positions, julday_range
+from core.interpolation import INTERPOLATION_STEP, interpolated_positions
+
+MAGIC = b'SREPHEM\x00'
+FORMAT_VERSION = 1
+DATA_ALIGNMENT = 4096
+DTYPE = '<f4'
+
+DEFAULT_PATH = os.environ.get(
+    'EPHEMERIS_STORE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'ephemeris.bin')
+)
+DEFAULT_PLANET_IDS = tuple(range(10))
+
+
+def _fingerprint(planet_ids, jd_start, step, count, flags):
+    """Hash everything that determines the content of the data block."""
+    payload = json.dumps({
+        'format_version': FORMAT_VERSION,
+        'swe_version': swe.version,
+        'pyswisseph_version': str(swe.__version__),
+        'flags': int(flags),
+        'planet_ids': [int(pid) for pid in planet_ids],
+        'jd_start': float(jd_start),
+        'step': float(step),
+        'count': int(count),
+        'dtype': DTYPE,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class EphemerisStore:
+    """
+    Read-only view over an ephemeris file opened with mmap.
+
+    Attributes:
+        header (dict): Parsed file header.
+        planet_ids (np.ndarray): Planet ids stored in the file.
+        jd_start (float): First Julian day of the grid.
+        step (float): Grid step in days.
+        data (np.memmap): Positions, shape (time, planet, 3).
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f'Not an ephemeris store: {path}')
+            (header_length,) = struct.unpack('<I', file.read(4))
+            header = json.loads(file.read(header_length).decode('utf-8'))
+        if header['format_version'] != FORMAT_VERSION:
+            raise ValueError(f'Unsupported ephemeris store version: {header["format_version"]}')
+
+        self.path = path
+        self.header = header
+        self.planet_ids = np.asarray(header['planet_ids'], dtype=np.int32)
+        self.jd_start = header['jd_start']
+        self.step = header['step']
+        self.count = header['count']
+        self.flags = header['flags']
+        self.data = np.memmap(
+            path, dtype=DTYPE, mode='r', offset=header['data_offset'],
+            shape=(self.count, len(self.planet_ids), 3)
+        )
+
+    @property
+    def jd_end(self):
+        return self.jd_start + (self.count - 1) * self.step
+
+    def is_current(self, flags=DEFAULT_FLAGS):
+        """Check the file was built by this pyswisseph version with the given flags."""
+        expected = _fingerprint(self.planet_ids, self.jd_start, self.step, self.count, flags)
+        return self.header['fingerprint'] == expected
+
+    def verify(self):
+        """Recompute the data checksum. Reads the whole file."""
+        crc = 0
+        for start in range(0, self.count, 65536):
+            crc = zlib.crc32(np.ascontiguousarray(self.data[start:start + 65536]).tobytes(), crc)
+        return crc == self.header['data_crc32']
+
+    def _grid_index(self, julday):
+        """Return the grid index of a Julian day, or None if it is off the grid."""
+        offset = (julday - self.jd_start) / self.step
+        index = round(offset)
+        if abs(offset - index) > 1e-6:
+            return None
+        return index
+
+    def query(self, julday_start, julday_end, julday_step, planet_ids):
+        """
+        Slice a range out of the store.
+
+        The slice is a view on the memory map (no copy) when the requested
+        planets are the ones stored, in the same order. Parts of the range
+        outside the stored grid are computed live.
+
+        Args:
+            julday_start (float): The starting Julian day.
+            julday_end (float): The ending Julian day.
+            julday_step (float): Step in days; must be a multiple of the store step.
+            planet_ids (iterable of int): Planet ids, all present in the store.
+
+        Returns:
+            PlanetPositions or None: None when the request is not aligned with
+            the store grid or asks for planets it does not hold.
+        """
+        ids = np.asarray(list(planet_ids), dtype=np.int32)
+        stride = julday_step / self.step
+        if round(stride) < 1 or abs(stride - round(stride)) > 1e-9:
+            return None
+        stride = int(round(stride))
+        first = self._grid_index(julday_start)
+        if first is None:
+            return None
+
+        column_of = {int(pid): column for column, pid in enumerate(self.planet_ids.tolist())}
+        if any(int(pid) not in column_of for pid in ids.tolist()):
+            return None
+
+        jd = julday_range(julday_start, julday_end, julday_step)
+        grid = first + stride * np.arange(jd.size)
+        inside = (grid >= 0) & (grid < self.count)
+        if not inside.any():
+            return None
+
+        lo, hi = np.flatnonzero(inside)[[0, -1]]
+        stored = self.data[grid[lo]:grid[hi] + 1:stride]
+        if not np.array_equal(ids, self.planet_ids):
+            stored = stored[:, [column_of[pid] for pid in ids.tolist()]]
+
+        if lo == 0 and hi == jd.size - 1:
+            return PlanetPositions(jd, ids, stored)
+
+        # Splice live computation onto the parts outside the stored range
+        before = compute_positions(jd[:lo], ids).data
+        after = compute_positions(jd[hi + 1:], ids).data
+        return PlanetPositions(jd, ids, np.concatenate([before, stored, after]))
+
+
+@functools.lru_cache(maxsize=4)
+def open_store(path=DEFAULT_PATH, flags=DEFAULT_FLAGS):
+    """
+    Open an ephemeris store once per process.
+
+    Args:
+        path (str, optional): Path of the store file.
+        flags (int, optional): Flags the caller computes with.
+
+    Returns:
+        EphemerisStore or None: None when the file is missing, unreadable or
+        was built with a different pyswisseph version or flags.
+    """
+    try:
+        store = EphemerisStore(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return store if store.is_current(flags) else None
+
+
+def query_positions(julday_start, julday_end, julday_step, planet_ids, flags=DEFAULT_FLAGS):
+    """
+    Positions over a date range, served from the store when possible.
+
+    Dense ranges that the store cannot serve are evaluated through a Chebyshev
+    interpolator instead of one `swe.calc_ut` call per sample.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): The increment in Julian days.
+        planet_ids (iterable of int): Swiss Ephemeris planet ids.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        PlanetPositions: Positions shaped (time, planet, 3).
+    """
+    planet_ids = list(planet_ids)
+    store = open_store(DEFAULT_PATH, flags)
+    if store is not None:
+        positions = store.query(julday_start, julday_end, julday_step, planet_ids)
+        if positions is not None:
+            return positions
+    if julday_step < INTERPOLATION_STEP:
+        return interpolated_positions(julday_start, julday_end, julday_step, planet_ids, flags)
+    return compute_positions(julday_range(julday_start, julday_end, julday_step), planet_ids, flags)
+
+
+def build_store(path, jd_start, jd_end, step=1.0, planet_ids=DEFAULT_PLANET_IDS,
+                flags=DEFAULT_FLAGS, chunk_size=10000, progress=None):
+    """
+    Precompute positions on a regular grid and write them to `path`.
+
+    The file is written in chunks through a memory map, so memory use stays
+    bounded regardless of the range, and is moved into place only once
+    complete.
+
+    Args:
+        path (str): Output file.
+        jd_start (float): First Julian day of the grid.
+        jd_end (float): Last Julian day of the grid (inclusive).
+        step (float, optional): Grid step in days.
+        planet_ids (iterable of int, optional): Planet ids to store.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+        chunk_size (int, optional): Number of time steps computed per chunk.
+        progress (callable, optional): Called with (done, total) after each chunk.
+    """
+    planet_ids = [int(pid) for pid in planet_ids]
+    jd = julday_range(jd_start, jd_end, step)
+    count = jd.size
+
+    header = {
+        'format_version': FORMAT_VERSION,
+        'swe_version': swe.version,
+        'pyswisseph_version': str(swe.__version__),
+        'flags': int(flags),
+        'planet_ids': planet_ids,
+        'jd_start': float(jd_start),
+        'step': float(step),
+        'count': int(count),
+        'dtype': DTYPE,
+        'fingerprint': _fingerprint(planet_ids, jd_start, step, count, flags),
+        'data_crc32': 0,
+        'data_offset': 0,
+    }
+
+    def encode(header):
+        raw = json.dumps(header, sort_keys=True).encode('utf-8')
+        return MAGIC + struct.pack('<I', len(raw)) + raw
+
+    # Reserve room for the header, it is rewritten with the checksum at the end
+    header['data_offset'] = DATA_ALIGNMENT * (len(encode(header)) // DATA_ALIGNMENT + 1)
+
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as file:
+        file.truncate(header['data_offset'] + count * len(planet_ids) * 3 * np.dtype(DTYPE).itemsize)
+
+    data = np.memmap(tmp_path, dtype=DTYPE, mode='r+', offset=header['data_offset'],
+                     shape=(count, len(planet_ids), 3))
+    crc = 0
+    for start in range(0, count, chunk_size):
+        block = compute_positions(jd[start:start + chunk_size], planet_ids, flags).data.astype(DTYPE)
+        data[start:start + len(block)] = block
+        crc = zlib.crc32(block.tobytes(), crc)
+        if progress:
+            progress(min(start + chunk_size, count), count)
+    data.flush()
+    del data
+
+    header['data_crc32'] = crc
+    with open(tmp_path, 'r+b') as file:
+        file.write(encode(header))
+    os.replace(tmp_path, path)
+    open_store.cache_clear()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or inspect the precomputed ephemeris store.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Precompute positions and write the store')
+    build.add_argument('--output', default=DEFAULT_PATH)
+    build.add_argument('--start-year', type=int, default=1000)
+    build.add_argument('--end-year', type=int, default=3000)
+    build.add_argument('--step', type=float, default=1.0, help='Grid step in days (e.g. 1/24 for hourly)')
+
+    info = commands.add_parser('info', help='Print the header and check it against this environment')
+    info.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    info.add_argument('--verify', action='store_true', help='Also verify the data checksum')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        jd_start = swe.julday(args.start_year, 1, 1, 0.0)
+        jd_end = swe.julday(args.end_year, 12, 31, 0.0)
+        started = datetime.datetime.now()
+
+        def progress(done, total):
+            print(f'\r{done}/{total} steps ({done / total:.0%})', end='', file=sys.stderr)
+
+        build_store(args.output, jd_start, jd_end, args.step, progress=progress)
+        print(f'\nWrote {args.output} in {datetime.datetime.now() - started}', file=sys.stderr)
+        return 0
+
+    store = EphemerisStore(args.path)
+    for key, value in sorted(store.header.items()):
+        print(f'{key}: {value}')
+    print(f'current: {store.is_current()}')
+    if args.verify:
+        print(f'checksum ok: {store.verify()}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""
+Offline gazetteer of cities with a prefix and fuzzy name index.
+
+Birth places are resolved locally from a GeoNames city dump instead of a
+geocoding API call on every rerun. The dump is converted once into a compact
+NumPy archive holding, for every city, its name, country and first-level
+administrative division, coordinates, population and IANA timezone, plus a
+sorted array of normalized names (accents stripped, case folded) pointing
+back to the cities. A prefix query is then two binary searches on that
+array, and results are ranked by population.
+
+Build it with (any GeoNames `citiesNNN.zip`/`.txt`, local path or URL):
+
+    python -m core.gazetteer build --source https://download.geonames.org/export/dump/cities15000.zip \\
+        --admin1 https://download.geonames.org/export/dump/admin1CodesASCII.txt
+"""
+import argparse
+import difflib
+import functools
+import io
+import os
+import re
+import sys
+import unicodedata
+import urllib.request
+import zipfile
+
+import numpy as np
+
+DEFAULT_PATH = os.environ.get(
+    'GAZETTEER',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'gazetteer.npz')
+)
+FORMAT_VERSION = 1
+
+# Columns of the GeoNames "geoname" table used here
+_NAME, _ASCII_NAME, _ALTERNATE_NAMES, _LATITUDE, _LONGITUDE = 1, 2, 3, 4, 5
+_COUNTRY, _ADMIN1, _POPULATION, _TIMEZONE = 8, 10, 14, 17
+
+
+def normalize(name):
+    """
+    Index key of a place name: ASCII, case folded, punctuation collapsed.
+
+    Args:
+        name (str): Place name as typed or as stored.
+
+    Returns:
+        str: e.g. 'São Paulo' -> 'sao paulo'.
+    """
+    decomposed = unicodedata.normalize('NFKD', name)
+    ascii_name = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(re.split(r'[^0-9a-z]+', ascii_name.casefold())).strip()
+
+
+class Place:
+    """
+    A city of the gazetteer.
+
+    Attributes:
+        name (str): City name.
+        admin1 (str): First-level administrative division (state, region).
+        country (str): ISO 3166 country code.
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+        timezone (str): IANA timezone name.
+        population (int): Population, used to rank homonyms.
+    """
+    __slots__ = ('name', 'admin1', 'country', 'latitude', 'longitude', 'timezone', 'population')
+
+    def __init__(self, name, admin1, country, latitude, longitude, timezone, population):
+        self.name = name
+        self.admin1 = admin1
+        self.country = country
+        self.latitude = latitude
+        self.longitude = longitude
+        self.timezone = timezone
+        self.population = population
+
+    @property
+    def label(self):
+        return ', '.join(part for part in (self.name, self.admin1, self.country) if part)
+
+    def __repr__(self):
+        return f'Place({self.label!r}, {self.latitude:.4f}, {self.longitude:.4f}, {self.timezone!r})'
+
+
+class Gazetteer:
+    """
+    In-memory city table with a sorted name index.
+
+    Attributes:
+        names, admin1, countries, timezones (np.ndarray): Per-city strings.
+        latitudes, longitudes (np.ndarray): Per-city coordinates (float32).
+        populations (np.ndarray): Per-city population.
+        keys (np.ndarray): Sorted normalized names.
+        key_cities (np.ndarray): City index of each key.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as archive:
+            if int(archive['format_version']) != FORMAT_VERSION:
+                raise ValueError(f'{path}: unsupported gazetteer format')
+            self.names = archive['names']
+            self.admin1 = archive['admin1']
+            self.countries = archive['countries']
+            self.latitudes = archive['latitudes']
+            self.longitudes = archive['longitudes']
+            self.populations = archive['populations']
+            self.timezones = archive['timezones'][archive['timezone_ids']]
+            self.keys = archive['keys']
+            self.key_cities = archive['key_cities']
+        # Keys grouped by their first two characters, for fuzzy matching
+        self._buckets = {}
+
+    def __len__(self):
+        return len(self.names)
+
+    def place(self, index):
+        """The city at a table index, as a Place."""
+        return Place(
+            str(self.names[index]), str(self.admin1[index]), str(self.countries[index]),
+            float(self.latitudes[index]), float(self.longitudes[index]),
+            str(self.timezones[index]), int(self.populations[index]),
+        )
+
+    def _prefix_cities(self, prefix):
+        """City indices whose names start with a normalized prefix."""
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        hi = np.searchsorted(self.keys, prefix + '\uffff', side='left')
+        return self.key_cities[lo:hi]
+
+    def _fuzzy_cities(self, key, limit):
+        """City indices of the names closest to a misspelled key."""
+        # Candidates share the first two characters, which keeps difflib's work small
+        bucket = key[:2]
+        if bucket not in self._buckets:
+            lo = np.searchsorted(self.keys, bucket, side='left')
+            hi = np.searchsorted(self.keys, bucket + '\uffff', side='left')
+            self._buckets[bucket] = np.unique(self.keys[lo:hi]).tolist()
+        matches = difflib.get_close_matches(key, self._buckets[bucket], n=limit, cutoff=0.75)
+        cities = [
+            self.key_cities[np.searchsorted(self.keys, match, side='left'):np.searchsorted(self.keys, match, side='right')]
+            for match in matches
+        ]
+        return np.concatenate(cities) if cities else np.empty(0, dtype=np.int32)
+
+    def search(self, query, limit=10, fuzzy=True):
+        """
+        Cities matching a query, most populous first.
+
+        The query is a city name or prefix, optionally followed by commas and
+        an administrative division or country code to narrow it down, e.g.
+        'Springfield, IL' or 'Porto, PT'. Without a prefix match, names close
+        to the query (typos) are returned when `fuzzy` is set.
+
+        Args:
+            query (str): Text typed by the user.
+            limit (int, optional): Maximum number of results.
+            fuzzy (bool, optional): Fall back to approximate matching.
+
+        Returns:
+            list: Place objects.
+        """
+        name, *qualifiers = query.split(',')
+        key = normalize(name)
+        if not key:
+            return []
+        cities = self._prefix_cities(key)
+        if not cities.size and fuzzy:
+            cities = self._fuzzy_cities(key, limit * 4)
+        cities = np.unique(cities)
+        # Cities with a name equal to the query, not just starting with it
+        exact_cities = self.key_cities[
+            np.searchsorted(self.keys, key, side='left'):np.searchsorted(self.keys, key, side='right')
+        ]
+
+        for qualifier in filter(None, map(normalize, qualifiers)):
+            admin1 = np.array([normalize(value) for value in self.admin1[cities]], dtype=str)
+            countries = np.char.lower(self.countries[cities])
+            cities = cities[(countries == qualifier) | np.char.startswith(admin1, qualifier)]
+
+        # Exact names first, then by population
+        exact = np.isin(cities, exact_cities)
+        order = np.lexsort((-self.populations[cities], ~exact))
+        return [self.place(index) for index in cities[order][:limit]]
+
+    def lookup(self, query):
+        """
+        Best match for a query.
+
+        Args:
+            query (str): City name, optionally qualified (see `search`).
+
+        Returns:
+            Place or None: The most populous exact or prefix match.
+        """
+        places = self.search(query, limit=1)
+        return places[0] if places else None
+
+
+@functools.lru_cache(maxsize=2)
+def open_gazetteer(path=DEFAULT_PATH):
+    """
+    Load the gazetteer once per process.
+
+    Args:
+        path (str, optional): Path of the gazetteer archive.
+
+    Returns:
+        Gazetteer or None: None when the file is missing or unreadable.
+    """
+    try:
+        return Gazetteer(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _open_text(source):
+    """Lines of a GeoNames text file given as a path or URL, zipped or not."""
+    if re.match(r'https?://', source):
+        with urllib.request.urlopen(source, timeout=60) as response:
+            payload = response.read()
+    else:
+        with open(source, 'rb') as file:
+            payload = file.read()
+    if source.endswith('.zip'):
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            member = next(name for name in archive.namelist() if name.endswith('.txt'))
+            payload = archive.read(member)
+    return io.StringIO(payload.decode('utf-8'))
+
+
+def build_gazetteer(path, source, admin1_source=None, alternate_names=False, min_population=0):
+    """
+    Convert a GeoNames city dump into a gazetteer archive.
+
+    Args:
+        path (str): Output file (.npz).
+        source (str): Path or URL of a GeoNames `cities*.txt` or `.zip`.
+        admin1_source (str, optional): Path or URL of `admin1CodesASCII.txt`,
+            to store division names instead of codes.
+        alternate_names (bool, optional): Also index the alternate names
+            (other languages, former names); makes the index several times
+            larger.
+        min_population (int, optional): Skip smaller places.
+
+    Returns:
+        int: Number of cities written.
+    """
+    admin1_names = {}
+    if admin1_source:
+        for line in _open_text(admin1_source):
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 2:
+                admin1_names[fields[0]] = fields[1]
+
+    names, admin1, countries, latitudes, longitudes, populations, timezones = [], [], [], [], [], [], []
+    keys, key_cities = [], []
+    for line in _open_text(source):
+        fields = line.rstrip('\n').split('\t')
+        if len(fields) < 19 or not fields[_TIMEZONE]:
+            continue
+        population = int(fields[_POPULATION] or 0)
+        if population < min_population:
+            continue
+        index = len(names)
+        names.append(fields[_NAME])
+        countries.append(fields[_COUNTRY])
+        admin1.append(admin1_names.get(f'{fields[_COUNTRY]}.{fields[_ADMIN1]}', fields[_ADMIN1]))
+        latitudes.append(float(fields[_LATITUDE]))
+        longitudes.append(float(fields[_LONGITUDE]))
+        populations.append(population)
+        timezones.append(fields[_TIMEZONE])
+
+        city_names = {fields[_NAME], fields[_ASCII_NAME]}
+        if alternate_names and fields[_ALTERNATE_NAMES]:
+            city_names.update(fields[_ALTERNATE_NAMES].split(','))
+        for key in {normalize(name) for name in city_names} - {''}:
+            keys.append(key)
+            key_cities.append(index)
+
+    keys = np.array(keys, dtype=str)
+    order = np.argsort(keys, kind='stable')
+    timezone_names, timezone_ids = np.unique(np.array(timezones, dtype=str), return_inverse=True)
+
+    temp_path = path + '.tmp.npz'
+    np.savez_compressed(
+        temp_path,
+        format_version=np.array(FORMAT_VERSION),
+        names=np.array(names, dtype=str),
+        admin1=np.array(admin1, dtype=str),
+        countries=np.array(countries, dtype=str),
+        latitudes=np.array(latitudes, dtype=np.float32),
+        longitudes=np.array(longitudes, dtype=np.float32),
+        populations=np.array(populations, dtype=np.int64),
+        timezones=timezone_names,
+        timezone_ids=timezone_ids.astype(np.int16),
+        keys=keys[order],
+        key_cities=np.array(key_cities, dtype=np.int32)[order],
+    )
+    os.replace(temp_path, path)
+    return len(names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the offline city gazetteer.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Convert a GeoNames city dump')
+    build.add_argument('--source', required=True, help='Path or URL of a GeoNames cities*.zip or .txt file')
+    build.add_argument('--admin1', help='Path or URL of admin1CodesASCII.txt')
+    build.add_argument('--output', default=DEFAULT_PATH)
+    build.add_argument('--alternate-names', action='store_true', help='Also index alternate names')
+    build.add_argument('--min-population', type=int, default=0)
+
+    search = commands.add_parser('search', help='Look up a city')
+    search.add_argument('query')
+    search.add_argument('--path', default=DEFAULT_PATH)
+    search.add_argument('--limit', type=int, default=10)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        count = build_gazetteer(args.output, args.source, args.admin1, args.alternate_names, args.min_population)
+        print(f'Wrote {count} cities to {args.output}', file=sys.stderr)
+        return 0
+
+    gazetteer = open_gazetteer(args.path)
+    if gazetteer is None:
+        print(f'{args.path}: gazetteer not found, run the build command first', file=sys.stderr)
+        return 1
+    for place in gazetteer.search(args.query, args.limit):
+        print(f'{place.label}\t{place.latitude:.4f}\t{place.longitude:.4f}\t{place.timezone}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,286 @@
+"""
+Place name resolution: the offline gazetteer first, OpenCage as a fallback.
+
+The remote service is only queried when the gazetteer is not built or has no
+match, and only when an API key is configured (OPENCAGE_API_KEY). Remote
+answers go through `GeocodeCache`, shared by every session of the process:
+
+- keys are normalized place names, so 'São Paulo' and 'sao  paulo' share
+  an entry;
+- found places expire after POSITIVE_TTL, "not found" answers after the
+  shorter NEGATIVE_TTL; failed lookups (GeocodingError) are never cached;
+- the most recent MEMORY_ENTRIES entries are kept in memory, and every
+  entry in a SQLite file (GEOCODE_CACHE, empty to disable), so they survive
+  restarts; the file is only opened on the first remote lookup, and expired
+  entries are deleted from it then;
+- concurrent requests for the same key wait for a single upstream call;
+- upstream calls have a timeout and are retried with exponential backoff on
+  connection errors, 429 and 5xx responses.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import requests
+
+from core.gazetteer import Place, normalize, open_gazetteer
+
+OPENCAGE_URL = 'https://api.opencagedata.com/geocode/v1/json'
+OPENCAGE_API_KEY = os.environ.get('OPENCAGE_API_KEY') or None
+REMOTE_TIMEOUT = 10.0
+REMOTE_RETRIES = 3
+REMOTE_BACKOFF = 0.5
+
+POSITIVE_TTL = 30 * 86400
+NEGATIVE_TTL = 86400
+MEMORY_ENTRIES = 4096
+DEFAULT_CACHE_PATH = os.environ.get(
+    'GEOCODE_CACHE',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'geocode_cache.sqlite')
+)
+
+
+class GeocodingError(Exception):
+    """The remote geocoder could not answer, as opposed to not finding the place."""
+
+
+def opencage_lookup(query, api_key=OPENCAGE_API_KEY, timeout=REMOTE_TIMEOUT,
+                    retries=REMOTE_RETRIES, backoff=REMOTE_BACKOFF):
+    """
+    Resolve a place name with the OpenCage API.
+
+    Args:
+        query (str): Place name.
+        api_key (str, optional): OpenCage API key.
+        timeout (float, optional): Connect and read timeout in seconds.
+        retries (int, optional): Extra attempts after a connection error, a
+            429 or a 5xx response.
+        backoff (float, optional): Delay before the first retry, in seconds;
+            doubled after each attempt.
+
+    Returns:
+        Place or None: The first result, or None when the service answered
+        that nothing matches.
+
+    Raises:
+        GeocodingError: The service could not be reached, kept failing after
+            the retries, rejected the request or sent an unreadable answer.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response = requests.get(OPENCAGE_URL, params={'q': query, 'key': api_key, 'limit': 1}, timeout=timeout)
+            if response.status_code == 429 or response.status_code >= 500:
+                response.raise_for_status()
+            break
+        except (requests.ConnectionError, requests.Timeout, requests.HTTPError) as error:
+            if attempt == retries:
+                raise GeocodingError(f'Geocoding service unavailable: {error}') from error
+            time.sleep(backoff * 2**attempt)
+    try:
+        response.raise_for_status()
+        results = response.json()['results']
+    except (requests.RequestException, KeyError, ValueError) as error:
+        raise GeocodingError(f'Geocoding service error: {error}') from error
+    if not results:
+        return None
+    result = results[0]
+    components = result.get('components', {})
+    return Place(
+        components.get('city') or components.get('town') or components.get('village') or result['formatted'],
+        components.get('state', ''),
+        components.get('country_code', '').upper(),
+        result['geometry']['lat'],
+        result['geometry']['lng'],
+        result.get('annotations', {}).get('timezone', {}).get('name', ''),
+        0,
+    )
+
+
+class GeocodeCache:
+    """
+    TTL cache of geocoding answers with a SQLite tier and request coalescing.
+
+    Attributes:
+        path (str | None): SQLite file of the persistent tier, if any.
+        positive_ttl (float): Lifetime of found places, in seconds.
+        negative_ttl (float): Lifetime of "not found" answers, in seconds.
+        max_entries (int): Entries kept in memory, least recently used
+            dropped first; SQLite keeps them all.
+        hits (int): Lookups answered from the cache.
+        misses (int): Lookups that called upstream.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, positive_ttl=POSITIVE_TTL, negative_ttl=NEGATIVE_TTL,
+                 max_entries=MEMORY_ENTRIES):
+        self.path = path or None
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._connection = None
+        self._connected = False
+
+    def _connect(self):
+        """
+        SQLite connection, opened on first use; lock must be held.
+
+        Offline callers (batch jobs, worker processes) never query the
+        remote service, so they never create the file. Expired entries are
+        purged when it is opened.
+        """
+        if not self._connected:
+            self._connected = True
+            if self.path:
+                try:
+                    self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                    self._connection.execute(
+                        'CREATE TABLE IF NOT EXISTS geocode (key TEXT PRIMARY KEY, place TEXT, expires REAL)'
+                    )
+                    self._connection.execute('DELETE FROM geocode WHERE expires < ?', (time.time(),))
+                    self._connection.commit()
+                except sqlite3.Error:
+                    self._connection = None
+        return self._connection
+
+    def _remember(self, key, entry):
+        """Insert into memory and drop the least recently used entries; lock must be held."""
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _load(self, key, now):
+        """Unexpired (found, place) for a key from memory or SQLite; lock must be held."""
+        entry = self._memory.get(key)
+        if entry is not None:
+            self._memory.move_to_end(key)
+        elif self._connect() is not None:
+            row = self._connection.execute('SELECT place, expires FROM geocode WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                place = Place(*json.loads(row[0])) if row[0] is not None else None
+                entry = (place, row[1])
+                self._remember(key, entry)
+        if entry is None or entry[1] <= now:
+            return False, None
+        return True, entry[0]
+
+    def _store(self, key, place, now):
+        """Remember an answer in memory and SQLite; lock must be held."""
+        expires = now + (self.positive_ttl if place is not None else self.negative_ttl)
+        self._remember(key, (place, expires))
+        if self._connect() is not None:
+            payload = json.dumps([getattr(place, slot) for slot in Place.__slots__]) if place is not None else None
+            try:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO geocode (key, place, expires) VALUES (?, ?, ?)', (key, payload, expires)
+                )
+                self._connection.commit()
+            except sqlite3.Error:
+                pass
+
+    def get(self, query, fetch):
+        """
+        Cached answer for a query, calling `fetch` at most once per key at a time.
+
+        Args:
+            query (str): Place name; normalized to build the key.
+            fetch (callable): f(query) -> Place or None, the upstream lookup,
+                None meaning the place does not exist. Exceptions it raises
+                (e.g. GeocodingError) are passed to every waiting caller and
+                nothing is cached.
+
+        Returns:
+            Place or None: None when the place does not exist upstream.
+        """
+        key = normalize(query)
+        with self._lock:
+            found, place = self._load(key, time.time())
+            if found:
+                self.hits += 1
+                return place
+            future = self._pending.get(key)
+            owner = future is None
+            if owner:
+                future = self._pending[key] = Future()
+                self.misses += 1
+        if not owner:
+            # Another session is already asking upstream for the same place
+            return future.result()
+
+        try:
+            place = fetch(query)
+        except BaseException as error:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(error)
+            raise
+        with self._lock:
+            self._store(key, place, time.time())
+            del self._pending[key]
+        future.set_result(place)
+        return place
+
+    def clear(self):
+        """Drop every entry from memory and SQLite."""
+        with self._lock:
+            self._memory.clear()
+            if self._connect() is not None:
+                self._connection.execute('DELETE FROM geocode')
+                self._connection.commit()
+
+
+GEOCODE_CACHE = GeocodeCache()
+
+
+def suggest_places(query, limit=10):
+    """
+    Autocomplete suggestions from the offline gazetteer.
+
+    Args:
+        query (str): Text typed so far.
+        limit (int, optional): Maximum number of suggestions.
+
+    Returns:
+        list: Place objects, empty when the gazetteer is not built.
+    """
+    gazetteer = open_gazetteer()
+    return gazetteer.search(query, limit) if gazetteer is not None else []
+
+
+def geocode(query, remote=True):
+    """
+    Resolve a place name to coordinates and timezone.
+
+    Args:
+        query (str): Place name, optionally qualified ('Porto, PT').
+        remote (bool, optional): Fall back to OpenCage when the gazetteer has
+            no match and an API key is configured.
+
+    Returns:
+        Place or None: The best match, or None when nothing was found.
+        Remote answers are cached.
+
+    Raises:
+        GeocodingError: The remote service was needed but failed (the
+            failure is not cached, so the next call asks again), or there is
+            nothing to look the place up in: no gazetteer is built and the
+            remote service is disabled or has no API key.
+    """
+    if open_gazetteer() is None and not (remote and OPENCAGE_API_KEY):
+        raise GeocodingError(
+            'No gazetteer built and OPENCAGE_API_KEY not set' if remote else 'No gazetteer built'
+        )
+    places = suggest_places(query, limit=1)
+    if places:
+        return places[0]
+    if not (remote and OPENCAGE_API_KEY):
+        return None
+    return GEOCODE_CACHE.get(query, opencage_lookup)
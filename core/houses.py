@@ -0,0 +1,324 @@
+"""
+Vectorized Ascendant and house positions.
+
+The sidereal time and the obliquity of the ecliptic depend only on time, so
+they are computed once per Julian day. The Ascendant and the house positions
+of the Placidus, Whole Sign, Equal, Regiomontanus and Campanus systems are
+then evaluated analytically over NumPy arrays of latitudes and longitudes;
+they match `swe.houses` and `swe.house_pos` to within 1e-8. Other systems
+(Koch...) go through `swe.house_pos`, still sharing the time-dependent work.
+
+Several house systems can be computed in one call (`house_systems`), which
+evaluates the sidereal time, the obliquity and the planet positions once for
+all of them.
+"""
+import numpy as np
+import swisseph as swe
+
+# House systems offered for comparison, by Swiss Ephemeris code
+HOUSE_SYSTEMS = {
+    b'P': 'Placidus',
+    b'K': 'Koch',
+    b'W': 'Whole Sign',
+    b'E': 'Equal',
+    b'R': 'Regiomontanus',
+    b'C': 'Campanus',
+}
+
+
+def sidereal_context(jd):
+    """
+    Time-dependent quantities shared by every location.
+
+    Args:
+        jd (float): Julian day (UT).
+
+    Returns:
+        tuple: (Greenwich apparent sidereal time in degrees, true obliquity of
+        the ecliptic in degrees). ARMC at a place is the first plus its
+        geographic longitude.
+    """
+    return swe.sidtime(jd) * 15, swe.calc_ut(jd, swe.ECL_NUT)[0][0]
+
+
+def ascendant(armc, eps, lat):
+    """
+    Ecliptic longitude of the Ascendant.
+
+    Args:
+        armc (array-like): Right ascension of the meridian in degrees.
+        eps (float): Obliquity of the ecliptic in degrees.
+        lat (array-like): Geographic latitude in degrees.
+
+    Returns:
+        np.ndarray: Longitude of the Ascendant in [0, 360).
+    """
+    theta = np.deg2rad(armc)
+    e = np.deg2rad(eps)
+    y = np.cos(theta)
+    x = -(np.sin(theta) * np.cos(e) + np.tan(np.deg2rad(lat)) * np.sin(e))
+    return np.rad2deg(np.arctan2(y, x)) % 360.0
+
+
+def midheaven(armc, eps):
+    """
+    Ecliptic longitude of the Midheaven (MC).
+
+    Unlike the house cusps, it is defined at every latitude.
+
+    Args:
+        armc (array-like): Right ascension of the meridian in degrees.
+        eps (array-like): Obliquity of the ecliptic in degrees.
+
+    Returns:
+        np.ndarray: Longitude of the MC in [0, 360).
+    """
+    theta = np.deg2rad(armc)
+    return np.rad2deg(np.arctan2(np.sin(theta), np.cos(theta) * np.cos(np.deg2rad(eps)))) % 360.0
+
+
+def ecliptic_to_equatorial(longitude, latitude, eps):
+    """
+    Right ascension and declination from ecliptic coordinates.
+
+    Args:
+        longitude (array-like): Ecliptic longitude in degrees.
+        latitude (array-like): Ecliptic latitude in degrees.
+        eps (array-like): Obliquity of the ecliptic in degrees.
+
+    Returns:
+        tuple: (right ascension in [0, 360), declination), in degrees.
+    """
+    lon, lat, e = np.deg2rad(longitude), np.deg2rad(latitude), np.deg2rad(eps)
+    declination = np.arcsin(np.sin(lat) * np.cos(e) + np.cos(lat) * np.sin(e) * np.sin(lon))
+    right_ascension = np.arctan2(np.sin(lon) * np.cos(e) - np.tan(lat) * np.sin(e), np.cos(lon))
+    return np.rad2deg(right_ascension) % 360.0, np.rad2deg(declination)
+
+
+def placidus_house_position(armc, eps, lat, planet_pos, planet_equ):
+    """
+    Placidus house position of a body as a number in [1, 13).
+
+    Above the horizon the position runs from the Ascendant (13, i.e. 1) to the
+    MC (10) and the Descendant (7) in proportion to the body's hour angle over
+    its diurnal semi-arc; below the horizon likewise with the nocturnal
+    semi-arc. Where the body is circumpolar the semi-arcs are undefined and
+    `swe.house_pos` is used for those points only.
+
+    Args:
+        armc (array-like): Right ascension of the meridian in degrees.
+        eps (array-like): Obliquity of the ecliptic in degrees.
+        lat (array-like): Geographic latitude in degrees.
+        planet_pos (tuple): Ecliptic (longitude, latitude) of the body.
+        planet_equ (tuple): Equatorial (right ascension, declination) of the body.
+
+    All arguments broadcast together, so several chart times can be evaluated
+    at once by giving the time-dependent ones an extra leading axis.
+
+    Returns:
+        np.ndarray: House positions; the integer part is the house number.
+    """
+    armc, lat, eps, lon_ecl, lat_ecl, ra, dec = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (armc, lat, eps, *planet_pos, *planet_equ))
+    )
+    hour_angle = (armc - ra + 180.0) % 360.0 - 180.0
+    tangents = np.tan(np.deg2rad(lat)) * np.tan(np.deg2rad(dec))
+    circumpolar = np.abs(tangents) >= 1
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        diurnal = np.rad2deg(np.arccos(-tangents))
+        nocturnal = 180.0 - diurnal
+        # Hour angle measured from the lower meridian (IC)
+        from_ic = hour_angle % 360.0 - 180.0
+        position = np.where(
+            np.abs(hour_angle) <= diurnal,
+            10.0 - 3.0 * hour_angle / diurnal,
+            4.0 - 3.0 * from_ic / nocturnal,
+        )
+    position = (position - 1.0) % 12.0 + 1.0
+
+    if circumpolar.any():
+        position[circumpolar] = [
+            swe.house_pos(a, l, e, (pl, pb), b'P')
+            for a, l, e, pl, pb in zip(*(
+                values[circumpolar].tolist() for values in (armc, lat, eps, lon_ecl, lat_ecl)
+            ))
+        ]
+    return position
+
+
+def _house_circle_angle(armc, lat, planet_equ):
+    """
+    Angle of the great circle through the north and south points of the
+    horizon and the body, from the zenith towards the east, and the
+    latitude, both in radians.
+    """
+    hour_angle = np.deg2rad(armc - planet_equ[0])
+    dec, phi = np.deg2rad(planet_equ[1]), np.deg2rad(lat)
+    # Body in the horizon frame: east and zenith components
+    east = -np.cos(dec) * np.sin(hour_angle)
+    zenith = np.cos(dec) * np.cos(hour_angle) * np.cos(phi) + np.sin(dec) * np.sin(phi)
+    return np.arctan2(east, zenith), phi
+
+
+def house_position(hsys, armc, eps, lat, planet_pos, planet_equ):
+    """
+    House position of a body as a number in [1, 13), in any house system.
+
+    Placidus, Whole Sign, Equal, Regiomontanus and Campanus are evaluated
+    analytically; other systems call `swe.house_pos` for every point.
+
+    Args:
+        hsys (bytes): House system, e.g. b'P'.
+        armc (array-like): Right ascension of the meridian in degrees.
+        eps (array-like): Obliquity of the ecliptic in degrees.
+        lat (array-like): Geographic latitude in degrees.
+        planet_pos (tuple): Ecliptic (longitude, latitude) of the body.
+        planet_equ (tuple): Equatorial (right ascension, declination) of the body.
+
+    All arguments broadcast together, like in `placidus_house_position`.
+
+    Returns:
+        np.ndarray: House positions; the integer part is the house number.
+        Where `swe.house_pos` has no answer for the body itself (Koch, for
+        bodies far from the ecliptic), the position of its ecliptic point
+        (latitude 0) is returned instead. Beyond the polar circles, where
+        Koch is undefined even for ecliptic points, positions stay 0.
+    """
+    if hsys == b'P':
+        return placidus_house_position(armc, eps, lat, planet_pos, planet_equ)
+    armc, lat, eps, lon_ecl, lat_ecl, ra, dec = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (armc, lat, eps, *planet_pos, *planet_equ))
+    )
+    if hsys in (b'W', b'E'):
+        first = ascendant(armc, eps, lat)
+        if hsys == b'W':
+            first = first // 30 * 30
+        return (lon_ecl - first) % 360.0 / 30.0 + 1.0
+    if hsys in (b'R', b'C'):
+        # Campanus divides the prime vertical into equal arcs, Regiomontanus
+        # the equator; both measure from the meridian along circles through
+        # the north and south points of the horizon
+        angle, phi = _house_circle_angle(armc, lat, (ra, dec))
+        if hsys == b'R':
+            angle = np.arctan2(np.sin(angle) * np.cos(phi), np.cos(angle))
+        return (np.rad2deg(angle) / 30.0 + 9.0) % 12.0 + 1.0
+    positions = np.array([
+        swe.house_pos(a, l, e, (pl, pb), hsys)
+        for a, l, e, pl, pb in zip(*(values.ravel().tolist() for values in (armc, lat, eps, lon_ecl, lat_ecl)))
+    ]).reshape(armc.shape)
+    # swe.house_pos returns 0 where the system is undefined for the body
+    # (Koch, for bodies far from the ecliptic): use its ecliptic point instead
+    undefined = positions == 0
+    if undefined.any():
+        positions[undefined] = [
+            swe.house_pos(a, l, e, (pl, 0.0), hsys)
+            for a, l, e, pl in zip(*(values[undefined].tolist() for values in (armc, lat, eps, lon_ecl)))
+        ]
+    return positions
+
+
+def _planet_coordinates(jd, planet_ids):
+    """Ecliptic (longitude, latitude) and equatorial (RA, declination) of each planet, shaped (planet, 2)."""
+    ecliptic = np.array([swe.calc_ut(jd, planet_id)[0][:2] for planet_id in planet_ids]).reshape(-1, 2)
+    equatorial = np.array([
+        swe.calc_ut(jd, planet_id, swe.FLG_SWIEPH | swe.FLG_EQUATORIAL)[0][:2] for planet_id in planet_ids
+    ]).reshape(-1, 2)
+    return ecliptic, equatorial
+
+
+def house_cusps(armc, eps, lat, hsys=b'P'):
+    """
+    House cusps for arrays of ARMC and latitude.
+
+    Args:
+        armc (array-like): Right ascension of the meridian in degrees.
+        eps (float): Obliquity of the ecliptic in degrees.
+        lat (array-like): Geographic latitude in degrees, broadcast against armc.
+        hsys (bytes, optional): House system, b'P' (Placidus) by default.
+
+    Returns:
+        np.ndarray: Longitudes of the twelve cusps, shape (*places, 12).
+    """
+    armc, lat = np.broadcast_arrays(np.asarray(armc, dtype=np.float64), np.asarray(lat, dtype=np.float64))
+    cusps = np.array([
+        swe.houses_armc(a, l, eps, hsys)[0][:12] for a, l in zip(armc.ravel().tolist(), lat.ravel().tolist())
+    ]).reshape(armc.shape + (12,))
+    return cusps
+
+
+def house_systems(jd, planet_ids, latitudes, longitudes, systems=tuple(HOUSE_SYSTEMS)):
+    """
+    Cusps and planet house positions in several house systems at once.
+
+    The sidereal time, the obliquity and the ecliptic and equatorial planet
+    positions are computed once and shared by every system.
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+        planet_ids (iterable): Swiss Ephemeris planet ids.
+        latitudes (array-like): Geographic latitudes in degrees.
+        longitudes (array-like): Geographic longitudes in degrees, broadcast
+            against the latitudes.
+        systems (iterable of bytes, optional): House systems; all of
+            HOUSE_SYSTEMS by default.
+
+    Returns:
+        dict: House system -> (cusps shaped (*places, 12), fractional house
+        positions in [1, 13) shaped (planet, *places)).
+    """
+    planet_ids = list(planet_ids)
+    sidereal, eps = sidereal_context(jd)
+    latitudes, longitudes = np.broadcast_arrays(
+        np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)
+    )
+    armc = (sidereal + longitudes) % 360.0
+    ecliptic, equatorial = _planet_coordinates(jd, planet_ids)
+    # Planets on a leading axis, places on the trailing ones
+    expand = (slice(None),) + (None,) * latitudes.ndim
+    planet_pos = (ecliptic[:, 0][expand], ecliptic[:, 1][expand])
+    planet_equ = (equatorial[:, 0][expand], equatorial[:, 1][expand])
+    return {
+        hsys: (
+            house_cusps(armc, eps, latitudes, hsys),
+            house_position(hsys, armc[None], eps, latitudes[None], planet_pos, planet_equ),
+        )
+        for hsys in systems
+    }
+
+
+def house_positions(jd, planet_ids, latitudes, longitudes, hsys=b'P'):
+    """
+    House positions of several planets at several places, for one chart time.
+
+    The sidereal time, the obliquity and the planet positions are computed
+    once for the Julian day; positions are then evaluated for every planet
+    and place together (see `house_position`).
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+        planet_ids (iterable): Swiss Ephemeris planet ids.
+        latitudes (array-like): Geographic latitudes in degrees.
+        longitudes (array-like): Geographic longitudes in degrees, broadcast
+            against the latitudes.
+        hsys (bytes, optional): House system, b'P' (Placidus) by default.
+
+    Returns:
+        tuple: (house numbers as int8, fractional house positions in [1, 13)),
+        both shaped (planet, *places).
+    """
+    planet_ids = list(planet_ids)
+    sidereal, eps = sidereal_context(jd)
+    latitudes, longitudes = np.broadcast_arrays(
+        np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64)
+    )
+    armc = sidereal + longitudes
+    ecliptic, equatorial = _planet_coordinates(jd, planet_ids)
+    # Planets on a leading axis, places on the trailing ones
+    expand = (slice(None),) + (None,) * latitudes.ndim
+    positions = house_position(
+        hsys, armc[None], eps, latitudes[None],
+        (ecliptic[:, 0][expand], ecliptic[:, 1][expand]),
+        (equatorial[:, 0][expand], equatorial[:, 1][expand]),
+    )
+    return positions.astype(np.int8), positions
@@ -0,0 +1,149 @@
+"""
+Piecewise Chebyshev interpolation of planet positions.
+
+Each planet's longitude and latitude are approximated on consecutive segments
+of fixed length by Chebyshev polynomials fitted through exact Swiss Ephemeris
+samples taken at the Chebyshev nodes of the segment. Speed is the analytic
+derivative of the longitude polynomial. Evaluating the interpolator costs a
+few multiply-adds per point, so minute-level scans are cheap; building it
+takes DEGREE + 1 exact samples per segment.
+
+Segment lengths are chosen per planet (shorter for the Moon and Mercury).
+With the default degree the error against `swe.calc_ut`, measured on random
+samples over 1000-3000 CE including retrograde stations, stays below
+ERROR_BOUND_ARCSEC in longitude and latitude. It is below 0.01" for the Sun
+and Moon; for the other planets most of it is jitter in the reference itself
+(the Moshier fallback used when no .se1 files are installed is not smooth at
+the arcsecond level), which also shows up as occasional speed differences of
+a few hundredths of a degree per day for the slow outer planets.
+"""
+import numpy as np
+from numpy.polynomial import chebyshev
+
+from core.ephemeris import DEFAULT_FLAGS, LAT, LON, SPEED, PlanetPositions, compute_positions, julday_range
+
+DEGREE = 12
+ERROR_BOUND_ARCSEC = 10.0
+
+# Segment length in days for each Swiss Ephemeris planet id
+SEGMENT_DAYS = {0: 16, 1: 4, 2: 8, 3: 16, 4: 16, 5: 32, 6: 32, 7: 64, 8: 64, 9: 64}
+DEFAULT_SEGMENT_DAYS = 8
+
+# Below this step a range is cheaper to interpolate than to compute exactly
+INTERPOLATION_STEP = 0.25
+
+_NODES = np.cos(np.pi * (np.arange(DEGREE + 1) + 0.5) / (DEGREE + 1))
+# Maps values at the nodes to Chebyshev coefficients
+_FIT = np.linalg.inv(chebyshev.chebvander(_NODES, DEGREE))
+
+
+def _clenshaw(coefficients, x):
+    """
+    Evaluate Chebyshev series with a different coefficient set per point.
+
+    Args:
+        coefficients (np.ndarray): Shape (degree + 1, n).
+        x (np.ndarray): Points in [-1, 1], shape (n,).
+
+    Returns:
+        np.ndarray: Series values, shape (n,).
+    """
+    b1 = np.zeros_like(x)
+    b2 = np.zeros_like(x)
+    for c in coefficients[:0:-1]:
+        b1, b2 = 2 * x * b1 - b2 + c, b1
+    return x * b1 - b2 + coefficients[0]
+
+
+class ChebyshevEphemeris:
+    """
+    Interpolated positions for several planets over a fixed date range.
+
+    Attributes:
+        jd_start (float): Start of the covered range.
+        jd_end (float): End of the covered range.
+        planet_ids (np.ndarray): Swiss Ephemeris planet ids.
+    """
+
+    def __init__(self, jd_start, jd_end, planet_ids, segments):
+        self.jd_start = jd_start
+        self.jd_end = jd_end
+        self.planet_ids = np.asarray(planet_ids, dtype=np.int32)
+        # One (segment_days, lon_coef, lat_coef, speed_coef) tuple per planet
+        self._segments = segments
+
+    @classmethod
+    def build(cls, jd_start, jd_end, planet_ids, flags=DEFAULT_FLAGS):
+        """
+        Fit the interpolator from exact samples.
+
+        Args:
+            jd_start (float): Start of the range to cover.
+            jd_end (float): End of the range to cover.
+            planet_ids (iterable of int): Swiss Ephemeris planet ids.
+            flags (int, optional): Swiss Ephemeris calculation flags.
+
+        Returns:
+            ChebyshevEphemeris: The fitted interpolator.
+        """
+        planet_ids = [int(pid) for pid in planet_ids]
+        segments = []
+        for planet_id in planet_ids:
+            days = SEGMENT_DAYS.get(planet_id, DEFAULT_SEGMENT_DAYS)
+            count = max(1, int(np.ceil((jd_end - jd_start) / days)))
+            mids = jd_start + days * (np.arange(count) + 0.5)
+            # Sample times, shape (nodes, segments)
+            times = mids + (days / 2) * _NODES[:, None]
+            samples = compute_positions(times.ravel(), [planet_id], flags).data[:, 0]
+            lon = np.unwrap(samples[:, LON].reshape(times.shape), period=360.0, axis=0)
+            lat = samples[:, LAT].reshape(times.shape)
+
+            lon_coef = _FIT @ lon
+            lat_coef = _FIT @ lat
+            # d/dt = d/dx * 2 / days; pad the derivative back to degree + 1 terms
+            speed_coef = np.zeros_like(lon_coef)
+            speed_coef[:-1] = chebyshev.chebder(lon_coef, axis=0) * (2 / days)
+            segments.append((days, lon_coef, lat_coef, speed_coef))
+        return cls(jd_start, jd_end, planet_ids, segments)
+
+    def positions(self, julday):
+        """
+        Evaluate the interpolator.
+
+        Args:
+            julday (float or array-like): Julian day(s) within the fitted range.
+
+        Returns:
+            PlanetPositions: Positions shaped (time, planet, 3).
+        """
+        jd = np.ascontiguousarray(np.atleast_1d(julday), dtype=np.float64)
+        if jd.size and (jd.min() < self.jd_start - 1e-9 or jd.max() > self.jd_end + 1e-9):
+            raise ValueError('Julian day outside the interpolated range')
+
+        data = np.empty((jd.size, self.planet_ids.size, 3))
+        for column, (days, lon_coef, lat_coef, speed_coef) in enumerate(self._segments):
+            offset = (jd - self.jd_start) / days
+            index = np.clip(offset.astype(np.int64), 0, lon_coef.shape[1] - 1)
+            x = 2 * (offset - index) - 1
+            data[:, column, LON] = _clenshaw(lon_coef[:, index], x) % 360.0
+            data[:, column, LAT] = _clenshaw(lat_coef[:, index], x)
+            data[:, column, SPEED] = _clenshaw(speed_coef[:, index], x)
+        return PlanetPositions(jd, self.planet_ids, data)
+
+
+def interpolated_positions(julday_start, julday_end, julday_step, planet_ids, flags=DEFAULT_FLAGS):
+    """
+    Positions over a date range evaluated through a Chebyshev interpolator.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): The increment in Julian days.
+        planet_ids (iterable of int): Swiss Ephemeris planet ids.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        PlanetPositions: Positions shaped (time, planet, 3).
+    """
+    interpolator = ChebyshevEphemeris.build(julday_start, julday_end, planet_ids, flags)
+    return interpolator.positions(julday_range(julday_start, julday_end, julday_step))
@@ -0,0 +1,74 @@
+"""
+Run-length aggregation of event series into intervals.
+
+Detected events (pattern matches, aspects in orb...) are rows identified by
+some key columns and a time. `build_intervals` groups rows by key and
+collapses the ones that follow each other into [first, last] intervals with
+a vectorized sort/groupby/diff, so rows for different keys may interleave
+freely and the index does not need to be contiguous.
+"""
+import numpy as np
+import pandas as pd
+
+
+def build_intervals(events, keys, max_gap, first='first', last='last'):
+    """
+    Collapse events or intervals of the same key into maximal intervals.
+
+    Rows of the same key are merged when one starts at most `max_gap` after
+    the end of everything before it, so overlapping and nested intervals are
+    merged too. Point events are rows with first == last; see
+    `events_to_intervals`.
+
+    Args:
+        events (pd.DataFrame): Key columns plus the `first` and `last` columns.
+        keys (list of str): Columns identifying an event (e.g. pattern and planets).
+        max_gap (float): Largest gap bridged between consecutive rows, e.g. 1.5
+            sampling steps for a regular scan.
+        first (str, optional): Start column.
+        last (str, optional): End column.
+
+    Returns:
+        pd.DataFrame: One row per interval with the key columns, `first`, `last`
+        and `samples` (number of samples merged, summing an existing `samples`
+        column), sorted by key and start.
+    """
+    if events.empty:
+        columns = {key: events[key] for key in keys} if set(keys) <= set(events) else {key: [] for key in keys}
+        return pd.DataFrame(columns | {first: pd.Series(dtype=float), last: pd.Series(dtype=float),
+                                       'samples': pd.Series(dtype=np.int64)})
+
+    events = events.sort_values(keys + [first], kind='stable', ignore_index=True)
+    if 'samples' not in events:
+        events = events.assign(samples=1)
+    grouping = [events[key] for key in keys]
+    # Latest end seen so far in each key, so a short interval nested in a
+    # longer one does not end the run
+    reach = events[last].groupby(grouping, sort=False).cummax()
+    previous = reach.groupby(grouping, sort=False).shift()
+    new_interval = previous.isna().to_numpy() | (events[first] - previous > max_gap).to_numpy()
+    interval_id = np.cumsum(new_interval)
+
+    intervals = events.groupby(interval_id, sort=False).agg(
+        **{key: (key, 'first') for key in keys},
+        **{first: (first, 'min'), last: (last, 'max'), 'samples': ('samples', 'sum')},
+    )
+    return intervals.reset_index(drop=True)
+
+
+def events_to_intervals(events, keys, time, step):
+    """
+    Turn a regularly sampled event series into intervals.
+
+    Args:
+        events (pd.DataFrame): Key columns plus a time column, one row per
+            sample at which an event holds.
+        keys (list of str): Columns identifying an event.
+        time (str): Time column (e.g. 'julday').
+        step (float): Sampling step; consecutive samples are one step apart.
+
+    Returns:
+        pd.DataFrame: Key columns plus 'first', 'last' and 'samples'.
+    """
+    points = events[keys].assign(first=events[time].to_numpy(), last=events[time].to_numpy())
+    return build_intervals(points, keys, 1.5 * step)
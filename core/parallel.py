@@ -0,0 +1,166 @@
+"""
+Multi-core time-range scans.
+
+A Julian-day range is split into shards aligned with the sampling grid and
+each shard is scanned in a worker process. pyswisseph keeps global state and
+is not thread-safe, so workers are separate processes started with 'spawn',
+each with its own Swiss Ephemeris instance. Shard results come back in order
+and periods that run across a shard boundary are joined before they are
+reported, so the output is the same as a serial scan.
+
+The number of workers defaults to the SCAN_WORKERS environment variable, or
+the number of CPUs up to MAX_DEFAULT_WORKERS, since every scan started from
+a page starts its own pool. With one worker, with a short range, or if a
+process pool cannot be started, the scan runs serially in-process. When the
+consumer stops early (a Streamlit rerun closes the generator), queued shards
+are cancelled instead of waited for.
+"""
+import concurrent.futures
+import multiprocessing
+import os
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from core.intervals import build_intervals
+from core.scan import key_columns, refine_periods, scan_chunk, scan_pattern_periods
+
+MAX_DEFAULT_WORKERS = 4
+DEFAULT_WORKERS = int(os.environ.get('SCAN_WORKERS', min(os.cpu_count() or 1, MAX_DEFAULT_WORKERS)))
+# Shards shorter than this are not worth a worker round trip
+MIN_SHARD_STEPS = 366
+# Shards per worker, so uneven shards still keep every worker busy
+SHARDS_PER_WORKER = 4
+
+
+def shard_range(julday_start, julday_end, julday_step, shards):
+    """
+    Split a sampled range into contiguous shards on the same sampling grid.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): Sampling step in days.
+        shards (int): Maximum number of shards.
+
+    Returns:
+        list of tuple: (start, end) Julian days of each shard, in order.
+    """
+    count = int(np.floor((julday_end - julday_start) / julday_step + 1e-9)) + 1
+    bounds = np.linspace(0, count, min(shards, count) + 1).round().astype(int)
+    return [
+        (julday_start + lo * julday_step, julday_start + (hi - 1) * julday_step)
+        for lo, hi in zip(bounds[:-1], bounds[1:]) if hi > lo
+    ]
+
+
+def _init_worker(ephe_path):
+    if ephe_path:
+        swe.set_ephe_path(ephe_path)
+
+
+def _scan_shard(shard_start, shard_end, julday_step, planet_ids, table, pattern, refine):
+    """Scan one shard; periods not touching its edges are refined in the worker."""
+    periods = scan_chunk(shard_start, shard_end, julday_step, planet_ids, table, pattern)
+    if refine:
+        touches_edge = (
+            np.isclose(periods['first'].to_numpy(dtype=float), shard_start, rtol=0, atol=1e-6)
+            | np.isclose(periods['last'].to_numpy(dtype=float), shard_end, rtol=0, atol=1e-6)
+        )
+        periods = pd.concat([
+            refine_periods(periods[~touches_edge], pattern, table, julday_step),
+            periods[touches_edge],
+        ], ignore_index=True)
+    return periods
+
+
+def parallel_pattern_periods(julday_start, julday_end, julday_step, planet_ids, table, pattern,
+                             workers=None, refine=False, ephe_path=None):
+    """
+    Scan a date range for a pattern across a process pool.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): Sampling step in days.
+        planet_ids (iterable of int): Swiss Ephemeris planet ids.
+        table (AspectTable): Aspect angles and orbs.
+        pattern (Pattern): Pattern to look for.
+        workers (int, optional): Worker processes; defaults to DEFAULT_WORKERS.
+        refine (bool, optional): Add exact start, peak and end times.
+        ephe_path (str, optional): Swiss Ephemeris data path for the workers.
+
+    Yields:
+        tuple: (progress, periods) as shards complete, in range order, with the
+        same columns as `core.scan.scan_pattern_periods`.
+    """
+    planet_ids = [int(pid) for pid in planet_ids]
+    workers = DEFAULT_WORKERS if workers is None else max(1, int(workers))
+    count = int(np.floor((julday_end - julday_start) / julday_step + 1e-9)) + 1
+    shards = shard_range(julday_start, julday_end, julday_step,
+                         min(workers * SHARDS_PER_WORKER, max(1, count // MIN_SHARD_STEPS)))
+
+    if workers <= 1 or len(shards) <= 1:
+        yield from scan_pattern_periods(julday_start, julday_end, julday_step, planet_ids, table, pattern,
+                                        refine=refine)
+        return
+
+    try:
+        executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=min(workers, len(shards)),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(ephe_path,),
+        )
+    except (OSError, NotImplementedError, ValueError):
+        yield from scan_pattern_periods(julday_start, julday_end, julday_step, planet_ids, table, pattern,
+                                        refine=refine)
+        return
+
+    keys = key_columns(pattern)
+    try:
+        futures = [
+            executor.submit(_scan_shard, start, end, julday_step, planet_ids, table, pattern, refine)
+            for start, end in shards
+        ]
+        open_periods = None
+        for index, ((shard_start, shard_end), future) in enumerate(zip(shards, futures)):
+            try:
+                periods = future.result()
+            except concurrent.futures.process.BrokenProcessPool:
+                # The pool died (e.g. the platform cannot spawn): finish serially
+                periods = _scan_shard(shard_start, shard_end, julday_step, planet_ids, table, pattern, refine)
+
+            # Join periods running across the boundary with the previous shard
+            starts_at_edge = np.isclose(periods['first'].to_numpy(dtype=float), shard_start, rtol=0, atol=1e-6)
+            if open_periods is not None and not open_periods.empty:
+                joined = build_intervals(
+                    pd.concat([open_periods, periods[starts_at_edge]], ignore_index=True)[keys + ['first', 'last', 'samples']],
+                    keys, 1.5 * julday_step
+                )
+                periods = pd.concat([joined, periods[~starts_at_edge]], ignore_index=True)
+
+            is_last_shard = index == len(shards) - 1
+            if is_last_shard:
+                still_open = np.zeros(len(periods), dtype=bool)
+            else:
+                still_open = np.isclose(periods['last'].to_numpy(dtype=float), shard_end, rtol=0, atol=1e-6)
+            open_periods = periods[still_open][keys + ['first', 'last', 'samples']].reset_index(drop=True)
+            closed = periods[~still_open]
+
+            if refine and 'start' in closed:
+                # Boundary periods come back unrefined
+                pending = closed['start'].isna()
+                closed = pd.concat([
+                    closed[~pending],
+                    refine_periods(closed[pending][keys + ['first', 'last', 'samples']], pattern, table, julday_step),
+                ], ignore_index=True)
+            elif refine:
+                closed = refine_periods(closed, pattern, table, julday_step)
+
+            progress = 1.0 if is_last_shard else (shard_end - julday_start) / (julday_end - julday_start)
+            yield progress, closed.sort_values('first', ignore_index=True)
+    finally:
+        # Closing the generator early must not wait for the queued shards
+        executor.shutdown(wait=False, cancel_futures=True)
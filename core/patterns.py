@@ -0,0 +1,161 @@
+"""
+Aspect pattern detection over time series.
+
+A pattern (Grand Trine, T-Square, Yod...) is declared as a small graph in
+`data/patterns.json`: a number of vertices and a list of [vertex, vertex,
+aspect_id] edges. Detection builds one boolean adjacency matrix per aspect for
+every timestamp, then tests every candidate assignment of planets to
+vertices with array indexing, so adding a pattern only means adding a JSON
+entry. Assignments that are the same pattern up to a symmetry of its graph
+are generated only once.
+"""
+import functools
+import itertools
+
+import numpy as np
+import pandas as pd
+
+from core.aspects import aspect_matrix
+
+
+class Pattern:
+    """
+    Declarative aspect pattern.
+
+    Attributes:
+        id (int): Pattern id.
+        name (str): Display name.
+        vertices (int): Number of planets taking part.
+        edges (tuple): (vertex, vertex, aspect_id) triples that must all hold.
+    """
+    __slots__ = ('id', 'name', 'vertices', 'edges')
+
+    def __init__(self, id, name, vertices, edges):
+        self.id = id
+        self.name = name
+        self.vertices = vertices
+        self.edges = tuple((int(a), int(b), int(aspect_id)) for a, b, aspect_id in edges)
+
+    @classmethod
+    def from_dict(cls, pattern):
+        return cls(pattern['id'], pattern['name'], pattern['vertices'], pattern['edges'])
+
+    def _edge_set(self, mapping=None):
+        mapping = mapping or range(self.vertices)
+        return frozenset((frozenset((mapping[a], mapping[b])), aspect_id) for a, b, aspect_id in self.edges)
+
+    def automorphisms(self):
+        """
+        Vertex permutations that map the pattern's labelled edges onto themselves.
+        """
+        edges = self._edge_set()
+        return [
+            permutation for permutation in itertools.permutations(range(self.vertices))
+            if self._edge_set(permutation) == edges
+        ]
+
+    def candidates(self, n_planets):
+        """
+        Planet assignments to test, one per pattern instance.
+
+        Args:
+            n_planets (int): Number of planets in the chart.
+
+        Returns:
+            np.ndarray: Planet column indices, shape (candidate, vertices).
+        """
+        return _candidates(self.vertices, self.edges, n_planets)
+
+
+@functools.lru_cache(maxsize=None)
+def _candidates(vertices, edges, n_planets):
+    pattern = Pattern(None, None, vertices, edges)
+    tuples = np.array(list(itertools.permutations(range(n_planets), vertices)), dtype=np.int64)
+    if tuples.size == 0:
+        return tuples.reshape(0, vertices)
+
+    # Keep an assignment only if it is the lexicographically smallest among
+    # the assignments an automorphism maps it to
+    keep = np.ones(len(tuples), dtype=bool)
+    for permutation in pattern.automorphisms():
+        image = np.empty_like(tuples)
+        image[:, list(permutation)] = tuples
+        differs = image != tuples
+        first = differs.argmax(axis=1)
+        rows = np.arange(len(tuples))
+        smaller = differs.any(axis=1) & (image[rows, first] < tuples[rows, first])
+        keep &= ~smaller
+    return tuples[keep]
+
+
+def load_patterns(patterns_data):
+    """
+    Build Pattern objects from the parsed contents of data/patterns.json.
+    """
+    return [Pattern.from_dict(pattern) for pattern in patterns_data]
+
+
+def detect_pattern(longitudes, table, pattern, chunk_size=4096):
+    """
+    Find every instance of a pattern at every timestamp.
+
+    Args:
+        longitudes (np.ndarray): Shape (time, planet).
+        table (AspectTable): Aspect angles and orbs.
+        pattern (Pattern): Pattern to look for.
+        chunk_size (int, optional): Timestamps processed together, bounds memory.
+
+    Returns:
+        tuple: (time_index, planets) where time_index has shape (match,) and
+        planets holds the planet column of each vertex, shape (match, vertices).
+    """
+    longitudes = np.atleast_2d(longitudes)
+    candidates = pattern.candidates(longitudes.shape[1])
+    aspect_ids = sorted({aspect_id for _, _, aspect_id in pattern.edges})
+
+    time_index, candidate_index = [], []
+    for start in range(0, len(longitudes), chunk_size):
+        block = longitudes[start:start + chunk_size]
+        adjacency = {aspect_id: aspect_matrix(block, table, aspect_id) for aspect_id in aspect_ids}
+        matched = np.ones((len(block), len(candidates)), dtype=bool)
+        for a, b, aspect_id in pattern.edges:
+            matched &= adjacency[aspect_id][:, candidates[:, a], candidates[:, b]]
+        t, c = np.nonzero(matched)
+        time_index.append(t + start)
+        candidate_index.append(c)
+
+    time_index = np.concatenate(time_index) if time_index else np.empty(0, dtype=np.int64)
+    candidate_index = np.concatenate(candidate_index) if candidate_index else np.empty(0, dtype=np.int64)
+    return time_index, candidates[candidate_index]
+
+
+def detect_patterns(positions, table, patterns):
+    """
+    Find several patterns over a PlanetPositions time series.
+
+    Args:
+        positions (PlanetPositions): Positions shaped (time, planet, 3).
+        table (AspectTable): Aspect angles and orbs.
+        patterns (iterable of Pattern): Patterns to look for.
+
+    Returns:
+        pd.DataFrame: One row per match with columns julday, pattern_id and
+        planet_1..planet_n (planet ids, -1 for vertices the pattern lacks),
+        sorted by julday.
+    """
+    patterns = list(patterns)
+    width = max((pattern.vertices for pattern in patterns), default=0)
+    frames = []
+    for pattern in patterns:
+        time_index, planets = detect_pattern(positions.longitude, table, pattern)
+        frame = {'julday': positions.jd[time_index], 'pattern_id': np.full(len(time_index), pattern.id)}
+        for vertex in range(width):
+            frame[f'planet_{vertex + 1}'] = (
+                positions.planet_ids[planets[:, vertex]] if vertex < pattern.vertices
+                else np.full(len(time_index), -1)
+            )
+        frames.append(pd.DataFrame(frame))
+
+    if not frames:
+        return pd.DataFrame(columns=['julday', 'pattern_id'])
+    return pd.concat(frames, ignore_index=True).sort_values('julday', kind='stable', ignore_index=True)
@@ -0,0 +1,145 @@
+"""
+Speed-bound pruning for range scans.
+
+The angular separation of two planets changes by at most the sum of their
+maximum speeds per day (core.ephemeris.MAX_SPEED), and a planet's distance
+from a fixed natal point by at most its own. So a pair that is, say, 40°
+outside every aspect orb cannot form an aspect for at least 40° divided by
+that speed, and a scan can jump ahead to that time instead of sampling the
+days in between. The bound is conservative: no sample at which an aspect or
+pattern holds is ever skipped, and scans give the same results with and
+without pruning.
+
+A pattern holds only when every one of its edges does, so it cannot form
+before the slowest edge of some planet assignment can; `PruningIndex`
+takes the earliest such time over all assignments. Scans then only sample
+the windows returned by `active_windows`, so quiet stretches between events
+cost one position evaluation per jump instead of one per step.
+"""
+import numpy as np
+
+from core.aspects import separation
+from core.ephemeris import DEFAULT_FLAGS, MAX_SPEED, compute_positions
+
+# Samples scanned after a jump before the bound is evaluated again
+WINDOW_STEPS = 32
+
+
+def reach_days(distance, max_speed):
+    """
+    Days before something `distance` degrees outside an orb can be within it.
+
+    Args:
+        distance (array-like): Degrees outside the orb (<= 0 when within it).
+        max_speed (array-like): Largest rate at which the distance can shrink,
+            in degrees per day; np.inf when unknown.
+
+    Returns:
+        np.ndarray: Days, 0 where the orb may already be reached.
+    """
+    distance = np.maximum(np.asarray(distance, dtype=np.float64), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days = distance / np.asarray(max_speed, dtype=np.float64)
+    return np.nan_to_num(days, nan=0.0, posinf=np.inf)
+
+
+class PruningIndex:
+    """
+    Earliest times at which aspects between moving planets can form.
+
+    Attributes:
+        planet_ids (np.ndarray): Swiss Ephemeris planet ids, shape (planet,).
+        max_speeds (np.ndarray): Maximum longitude speed of each planet in
+            degrees per day, np.inf when no bound is known.
+        table (AspectTable): Aspect angles and orbs.
+        flags (int): Swiss Ephemeris calculation flags.
+    """
+    __slots__ = ('planet_ids', 'max_speeds', 'table', 'flags')
+
+    def __init__(self, planet_ids, table, flags=DEFAULT_FLAGS):
+        self.planet_ids = np.asarray(list(planet_ids), dtype=np.int64)
+        self.max_speeds = np.array([MAX_SPEED.get(planet_id, np.inf) for planet_id in self.planet_ids.tolist()])
+        self.table = table
+        self.flags = flags
+
+    def pair_days(self, longitudes, aspect_ids=None):
+        """
+        Days before each pair of planets can be within orb of an aspect.
+
+        Args:
+            longitudes (array-like): Longitude of each planet, shape (planet,).
+            aspect_ids (iterable of int, optional): Aspects to consider; all
+                of the table by default.
+
+        Returns:
+            np.ndarray: Days, shape (aspect, planet, planet), one slice per
+            requested aspect in the given order.
+        """
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        aspect_ids = self.table.ids.tolist() if aspect_ids is None else list(aspect_ids)
+        rows = [self.table.ids.tolist().index(aspect_id) for aspect_id in aspect_ids]
+        distance = (
+            np.abs(separation(longitudes[:, None], longitudes[None, :])[None] - self.table.angles[rows, None, None])
+            - self.table.orbs[rows, None, None]
+        )
+        return reach_days(distance, self.max_speeds[:, None] + self.max_speeds[None, :])
+
+    def pattern_start(self, julday, pattern):
+        """
+        Earliest Julian day at or after `julday` at which a pattern can hold.
+
+        Args:
+            julday (float): Julian day (UT) to look ahead from.
+            pattern (Pattern): The pattern.
+
+        Returns:
+            float: The Julian day; `julday` itself when the pattern may
+            already hold, np.inf when it can never form with these planets.
+        """
+        candidates = pattern.candidates(self.planet_ids.size)
+        if len(candidates) == 0:
+            return np.inf
+        longitudes = compute_positions(julday, self.planet_ids, self.flags).longitude[0]
+        aspect_ids = sorted({aspect_id for _, _, aspect_id in pattern.edges})
+        days = dict(zip(aspect_ids, self.pair_days(longitudes, aspect_ids)))
+        # Every edge has to hold, so an assignment waits for its slowest edge
+        wait = np.zeros(len(candidates))
+        for a, b, aspect_id in pattern.edges:
+            wait = np.maximum(wait, days[aspect_id][candidates[:, a], candidates[:, b]])
+        return julday + wait.min()
+
+
+def active_windows(julday_start, julday_end, julday_step, next_start, window_steps=WINDOW_STEPS):
+    """
+    Sample windows of a range that may hold an event, skipping the rest.
+
+    Args:
+        julday_start (float): First sample of the range.
+        julday_end (float): Last Julian day of the range.
+        julday_step (float): Sampling step in days.
+        next_start (callable): f(julday) -> earliest Julian day at or after
+            julday at which an event can hold, e.g. a bound
+            `PruningIndex.pattern_start`.
+        window_steps (int, optional): Samples per window.
+
+    Returns:
+        list of tuple: (start, end) Julian days of the windows, on the
+        sampling grid of the range and in order; consecutive windows touch
+        when nothing was skipped between them.
+    """
+    windows = []
+    index = 0
+    last = int(np.floor((julday_end - julday_start) / julday_step + 1e-9))
+    while index <= last:
+        start = next_start(julday_start + index * julday_step)
+        if start > julday_start + index * julday_step:
+            if not np.isfinite(start):
+                break
+            # Jump to the first sample at or after the earliest possible
+            # event, then look ahead again from there
+            index = max(index + 1, int(np.ceil((start - julday_start) / julday_step - 1e-9)))
+            continue
+        end = min(index + window_steps - 1, last)
+        windows.append((julday_start + index * julday_step, julday_start + end * julday_step))
+        index = end + 1
+    return windows
@@ -0,0 +1,276 @@
+"""
+Reference tables (signs, houses, planets, aspects, patterns) as config objects.
+
+The JSON files in data/ are parsed once per process by `load_reference` into
+a `ReferenceData`, which every computation receives explicitly, so nothing
+in the core depends on a Streamlit session. The tables keep the layout the
+pages have always used, mappings keyed by id whose values are mappings of
+fields, but they are read-only, so one instance is safely shared by every
+session and thread of the process. Array-backed views (`aspect_table`,
+`sign_table`) and id -> field lookups (`lookup`) are built once and cached.
+
+The only per-session state is the orbs edited on the Settings page, a small
+{aspect id: orb} dict applied on top of the shared tables with `with_orbs`.
+"""
+import functools
+import json
+import os
+import threading
+from types import MappingProxyType
+
+from core.aspects import AspectTable
+from core.patterns import load_patterns
+from core.signs import SignTable
+
+DATA_DIR = os.environ.get(
+    'ASTRO_DATA',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+)
+
+
+def load_json_file(file_path):
+    """
+    Load data from a JSON file.
+
+    Args:
+        file_path (str): Path to the JSON file.
+
+    Returns:
+        Parsed data from the JSON file.
+
+    Raises:
+        FileNotFoundError: If the file is not found.
+        json.JSONDecodeError: If the file is not valid JSON.
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def _freeze(table):
+    """Read-only copy of an {id: {field: value}} table; lists become tuples."""
+    return MappingProxyType({
+        key: MappingProxyType({
+            field: tuple(value) if isinstance(value, list) else value for field, value in row.items()
+        })
+        for key, row in table.items()
+    })
+
+
+def _thaw(table):
+    """Plain dict copy of a frozen table."""
+    return {key: dict(row) for key, row in table.items()}
+
+
+class ReferenceData:
+    """
+    Astrological reference tables, read-only and shareable.
+
+    Attributes:
+        signs (Mapping): Sign id (0-11) -> name, symbol, element, modality,
+            color, rgb_color.
+        houses (Mapping): House number (1-12) -> name, symbol, roman.
+        planets (Mapping): Swiss Ephemeris planet id -> name, symbol, type.
+        aspects (Mapping): Aspect id -> name, symbol, angle, orb.
+        patterns (Mapping): Pattern id -> Pattern.
+    """
+    __slots__ = ('signs', 'houses', 'planets', 'aspects', 'patterns', '_cache', '_lock')
+
+    def __init__(self, signs, houses, planets, aspects, patterns):
+        self.signs = signs if isinstance(signs, MappingProxyType) else _freeze(signs)
+        self.houses = houses if isinstance(houses, MappingProxyType) else _freeze(houses)
+        self.planets = planets if isinstance(planets, MappingProxyType) else _freeze(planets)
+        self.aspects = aspects if isinstance(aspects, MappingProxyType) else _freeze(aspects)
+        self.patterns = MappingProxyType(dict(patterns))
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def __reduce__(self):
+        # Mapping proxies do not pickle: send plain dicts to worker processes
+        return ReferenceData, (
+            _thaw(self.signs), _thaw(self.houses), _thaw(self.planets), _thaw(self.aspects), dict(self.patterns)
+        )
+
+    def _cached(self, key, build):
+        """Value built once per instance and shared by every caller."""
+        value = self._cache.get(key)
+        if value is None:
+            with self._lock:
+                value = self._cache.get(key)
+                if value is None:
+                    value = self._cache[key] = build()
+        return value
+
+    @classmethod
+    def from_directory(cls, directory=DATA_DIR):
+        """
+        Parse the reference tables from the JSON files of a data directory.
+
+        Args:
+            directory (str, optional): Directory holding signs.json,
+                houses.json, planets.json, aspects.json and patterns.json.
+
+        Returns:
+            ReferenceData: The parsed tables.
+        """
+        def load(name):
+            return load_json_file(os.path.join(directory, name))
+
+        signs = {
+            sign['id']: {
+                'name': sign['name'],
+                'symbol': sign['symbol'],
+                'element': sign['element'],
+                'modality': sign['modality'],
+                'color': sign['color'],
+                'rgb_color': sign['rgb_color']
+            } for sign in load('signs.json')
+        }
+        houses = {
+            house['id']: {
+                'name': house['name'],
+                'symbol': house['symbol'],
+                'roman': house['roman_numeral']
+            } for house in load('houses.json')
+        }
+        planets = {
+            planet['id']: {
+                'name': planet['name'],
+                'symbol': planet['symbol'],
+                'type': planet['type']
+            } for planet in load('planets.json')
+        }
+        aspects = {
+            aspect['id']: {
+                'name': aspect['name'],
+                'symbol': aspect['symbol'],
+                'angle': aspect['angle'],
+                'orb': aspect['orb']
+            } for aspect in load('aspects.json')
+        }
+        patterns = {pattern.id: pattern for pattern in load_patterns(load('patterns.json'))}
+        return cls(signs, houses, planets, aspects, patterns)
+
+    def aspect_table(self):
+        """
+        Vectorized aspect table with the current orbs.
+
+        Returns:
+            AspectTable: Aspect ids, angles and orbs as read-only arrays,
+            shared by every caller.
+        """
+        return self._cached('aspect_table', lambda: _read_only(AspectTable.from_dict(self.aspects)))
+
+    def sign_table(self):
+        """
+        Vectorized sign table.
+
+        Returns:
+            SignTable: Sign names, symbols, elements, modalities and colors as
+            read-only arrays indexed by sign id, shared by every caller.
+        """
+        return self._cached('sign_table', lambda: _read_only(SignTable.from_dict(self.signs)))
+
+    def lookup(self, table, field):
+        """
+        Id -> field mapping of one table, for `Series.map` and the like.
+
+        Args:
+            table (str): 'signs', 'houses', 'planets' or 'aspects'.
+            field (str): Field name, e.g. 'symbol'.
+
+        Returns:
+            Mapping: Read-only {id: value}, shared by every caller.
+        """
+        return self._cached(
+            ('lookup', table, field),
+            lambda: MappingProxyType({key: row[field] for key, row in getattr(self, table).items()})
+        )
+
+    def orbs(self):
+        """
+        The orb of every aspect.
+
+        Returns:
+            dict: A new, editable {aspect id: orb}, e.g. a session's settings.
+        """
+        return {aspect_id: aspect['orb'] for aspect_id, aspect in self.aspects.items()}
+
+    def with_orbs(self, orbs):
+        """
+        Reference data with other orbs, sharing every other table.
+
+        Only the aspect table is rebuilt (a handful of entries), so this is
+        cheap enough to call on every page run with a session's orbs.
+
+        Args:
+            orbs (Mapping): Aspect id -> orb in degrees; aspects missing from
+                it keep their orb.
+
+        Returns:
+            ReferenceData: `self` when no orb changes, otherwise a new
+            instance sharing signs, houses, planets and patterns.
+        """
+        if all(orbs.get(aspect_id, aspect['orb']) == aspect['orb'] for aspect_id, aspect in self.aspects.items()):
+            return self
+        aspects = MappingProxyType({
+            aspect_id: MappingProxyType(dict(aspect, orb=orbs[aspect_id])) if aspect_id in orbs else aspect
+            for aspect_id, aspect in self.aspects.items()
+        })
+        return ReferenceData(self.signs, self.houses, self.planets, aspects, self.patterns)
+
+    def pattern(self, name):
+        """
+        Pattern definition by name.
+
+        Args:
+            name (str): Pattern name, e.g. 'Grand Trine'.
+
+        Returns:
+            Pattern: The pattern.
+
+        Raises:
+            KeyError: If no pattern has that name.
+        """
+        for pattern in self.patterns.values():
+            if pattern.name == name:
+                return pattern
+        raise KeyError(name)
+
+
+def _read_only(table):
+    """Mark the arrays of a __slots__ table as read-only and return it."""
+    for name in table.__slots__:
+        value = getattr(table, name)
+        if hasattr(value, 'setflags'):
+            value.setflags(write=False)
+    return table
+
+
+@functools.lru_cache(maxsize=4)
+def load_reference(directory=DATA_DIR):
+    """
+    Reference tables parsed once per process.
+
+    The returned object is read-only and shared by every caller; use
+    `with_orbs` for other orbs.
+
+    Args:
+        directory (str, optional): Data directory.
+
+    Returns:
+        ReferenceData: The shared reference data.
+    """
+    return ReferenceData.from_directory(directory)
+
+
+def default_orbs(directory=DATA_DIR):
+    """
+    An editable copy of the default orbs.
+
+    Args:
+        directory (str, optional): Data directory.
+
+    Returns:
+        dict: Aspect id -> orb in degrees.
+    """
+    return load_reference(directory).orbs()
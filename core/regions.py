@@ -0,0 +1,253 @@
+"""
+Merge map cells into one polygon per region.
+
+Solar return maps are a handful of regions (one per sign or house), but are
+computed as many small cells. This module traces the outline of every region
+so the client receives one GeoJSON feature per value instead of one record
+per cell.
+
+Cells live on an integer lattice (row, column, size in lattice units). Every
+cell contributes its sides as unit edges oriented counter-clockwise; an edge
+shared by two cells of the same value appears once in each direction and
+cancels, so only region boundaries remain. Those edges are chained into
+rings (counter-clockwise outlines, clockwise holes) and simplified to within
+`tolerance` lattice units.
+"""
+import numpy as np
+
+# Unit steps along the lattice: east, north, west, south
+_STEPS = np.array([(0, 1), (1, 0), (0, -1), (-1, 0)])
+
+
+def _unit_edges(rows, cols, sizes):
+    """Counter-clockwise unit edges of every cell, as (row, col, direction) arrays."""
+    sizes = sizes.astype(np.int64)
+    cell = np.repeat(np.arange(len(rows)), sizes)
+    offset = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    r, c, s = rows[cell], cols[cell], sizes[cell]
+    # South side going east, east side going north, north side going west, west side going south
+    starts = [
+        (r, c + offset, 0),
+        (r + offset, c + s, 1),
+        (r + s, c + s - offset, 2),
+        (r + s - offset, c, 3),
+    ]
+    edge_rows = np.concatenate([start_row for start_row, _, _ in starts])
+    edge_cols = np.concatenate([start_col for _, start_col, _ in starts])
+    directions = np.concatenate([np.full(len(cell), direction) for _, _, direction in starts])
+    return edge_rows, edge_cols, directions, np.tile(cell, 4)
+
+
+def _chain(edge_rows, edge_cols, directions):
+    """Link directed unit edges into closed rings of lattice vertices."""
+    width = int(edge_cols.max()) + 3
+    start_keys = edge_rows * width + edge_cols
+    end_keys = (edge_rows + _STEPS[directions, 0]) * width + edge_cols + _STEPS[directions, 1]
+
+    # Outgoing edges of each vertex, sorted by start vertex; a vertex has one,
+    # or two where two outlines touch at a corner
+    order = np.argsort(start_keys, kind='stable')
+    sorted_keys = start_keys[order]
+    first = order[np.searchsorted(sorted_keys, end_keys, side='left')]
+    last = order[np.searchsorted(sorted_keys, end_keys, side='right') - 1]
+    # At a shared corner turn left, to stay on the same outline
+    turn_first = (directions[first] - directions - 1) % 4
+    turn_last = (directions[last] - directions - 1) % 4
+    following = np.where(turn_first <= turn_last, first, last).tolist()
+
+    visited = np.zeros(len(edge_rows), dtype=bool)
+    points = np.column_stack([edge_rows, edge_cols]).astype(np.float64)
+    rings = []
+    for start in range(len(edge_rows)):
+        if visited[start]:
+            continue
+        ring = []
+        index = start
+        while not visited[index]:
+            visited[index] = True
+            ring.append(index)
+            index = following[index]
+        rings.append(points[ring])
+    return rings
+
+
+def _signed_area(ring):
+    y, x = ring[:, 0], ring[:, 1]
+    return 0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+
+
+def _contains(ring, point):
+    """Even-odd point-in-polygon test, ring given as (row, col) vertices."""
+    y, x = ring[:, 0], ring[:, 1]
+    y2, x2 = np.roll(y, -1), np.roll(x, -1)
+    crosses = (y > point[0]) != (y2 > point[0])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = x + (point[0] - y) * (x2 - x) / (y2 - y)
+    return np.count_nonzero(crosses & (point[1] < x_cross)) % 2 == 1
+
+
+def _simplify(ring, tolerance):
+    """Douglas-Peucker simplification of a closed ring."""
+    # Drop vertices in the middle of straight runs first
+    before, after = np.roll(ring, 1, axis=0), np.roll(ring, -1, axis=0)
+    cross = (ring[:, 0] - before[:, 0]) * (after[:, 1] - ring[:, 1]) - (ring[:, 1] - before[:, 1]) * (after[:, 0] - ring[:, 0])
+    ring = ring[cross != 0]
+    if len(ring) <= 4 or tolerance <= 0:
+        return ring
+
+    def reduce(points):
+        keep = np.zeros(len(points), dtype=bool)
+        keep[[0, -1]] = True
+        stack = [(0, len(points) - 1)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo < 2:
+                continue
+            a, b = points[lo], points[hi]
+            segment = b - a
+            length = np.hypot(*segment)
+            middle = points[lo + 1:hi] - a
+            if length == 0:
+                distance = np.hypot(middle[:, 0], middle[:, 1])
+            else:
+                distance = np.abs(segment[0] * middle[:, 1] - segment[1] * middle[:, 0]) / length
+            farthest = int(np.argmax(distance))
+            if distance[farthest] > tolerance:
+                split = lo + 1 + farthest
+                keep[split] = True
+                stack += [(lo, split), (split, hi)]
+        return points[keep]
+
+    # Split the ring at the vertex farthest from its first one
+    far = int(np.argmax(np.hypot(*(ring - ring[0]).T)))
+    first = reduce(np.vstack([ring[:far + 1]]))
+    second = reduce(np.vstack([ring[far:], ring[:1]]))
+    simplified = np.vstack([first, second[1:-1]])
+    return simplified if len(simplified) >= 3 and _signed_area(simplified) * _signed_area(ring) > 0 else ring
+
+
+def trace_regions(rows, cols, sizes, values, tolerance=1.0):
+    """
+    Outline the union of same-valued cells.
+
+    Args:
+        rows (np.ndarray): Lattice row of each cell's southern edge.
+        cols (np.ndarray): Lattice column of each cell's western edge.
+        sizes (np.ndarray): Side of each cell in lattice units.
+        values (np.ndarray): Value of each cell.
+        tolerance (float, optional): Simplification tolerance in lattice units.
+
+    Returns:
+        dict: value -> list of polygons; each polygon is a list of rings of
+        (row, col) vertices, the outline first and its holes after.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    sizes = np.asarray(sizes, dtype=np.int64)
+    values = np.asarray(values)
+
+    regions = {}
+    for value in np.unique(values):
+        selected = values == value
+        edge_rows, edge_cols, directions, _ = _unit_edges(rows[selected], cols[selected], sizes[selected])
+
+        # An undirected edge shared by two cells appears twice: keep the singles.
+        # A unit edge is identified by its lower-left vertex and its axis.
+        end_rows = edge_rows + _STEPS[directions, 0]
+        end_cols = edge_cols + _STEPS[directions, 1]
+        width = int(max(edge_cols.max(), end_cols.max())) + 2
+        keys = (np.minimum(edge_rows, end_rows) * width + np.minimum(edge_cols, end_cols)) * 2 + directions % 2
+        _, inverse, counts = np.unique(keys, return_inverse=True, return_counts=True)
+        boundary = counts[inverse] == 1
+
+        rings = _chain(edge_rows[boundary], edge_cols[boundary], directions[boundary])
+        outlines = [ring for ring in rings if _signed_area(ring) > 0]
+        holes = [ring for ring in rings if _signed_area(ring) < 0]
+
+        polygons = [[outline] for outline in outlines]
+        areas = np.array([_signed_area(outline) for outline in outlines])
+        for hole in holes:
+            # Center of the cell inside the hole along its first edge, which
+            # is off every lattice edge, unlike the hole's own vertices
+            middle = 0.5 * (hole[0] + hole[1])
+            normal = 0.5 * np.array([hole[1, 1] - hole[0, 1], hole[0, 0] - hole[1, 0]])
+            probe = middle + normal if _contains(hole, middle + normal) else middle - normal
+            # An outline can sit inside another one's hole, so the hole
+            # belongs to the smallest outline around it, not the first one
+            containing = [index for index, outline in enumerate(outlines) if _contains(outline, probe)]
+            if containing:
+                polygons[min(containing, key=areas.__getitem__)].append(hole)
+        regions[value.item()] = [[_simplify(ring, tolerance) for ring in polygon] for polygon in polygons]
+    return regions
+
+
+def _to_degrees(regions, lat0, lon0, unit):
+    return {
+        value: [
+            [np.column_stack([lon0 + ring[:, 1] * unit, lat0 + ring[:, 0] * unit]) for ring in polygon]
+            for polygon in polygons
+        ]
+        for value, polygons in regions.items()
+    }
+
+
+def grid_regions(grid, tolerance=1.0):
+    """
+    Regions of a uniform SolarReturnGrid, each grid point being the center of a cell.
+
+    Args:
+        grid (SolarReturnGrid): Values on a regular grid.
+        tolerance (float, optional): Simplification tolerance in cells.
+
+    Returns:
+        dict: value -> list of polygons of (longitude, latitude) rings.
+    """
+    step = float(grid.latitudes[1] - grid.latitudes[0]) if len(grid.latitudes) > 1 else 1.0
+    rows, cols = np.indices(grid.values.shape)
+    regions = trace_regions(rows.ravel(), cols.ravel(), np.ones(grid.values.size), grid.values.ravel(), tolerance)
+    return _to_degrees(regions, grid.latitudes[0] - step / 2, grid.longitudes[0] - step / 2, step)
+
+
+def cell_regions(cells, tolerance=1.0):
+    """
+    Regions of AdaptiveCells.
+
+    Args:
+        cells (AdaptiveCells): Quadtree leaves.
+        tolerance (float, optional): Simplification tolerance in smallest cells.
+
+    Returns:
+        dict: value -> list of polygons of (longitude, latitude) rings.
+    """
+    unit = cells.sizes.min()
+    lat0, lon0 = cells.latitudes.min(), cells.longitudes.min()
+    rows = np.rint((cells.latitudes - lat0) / unit)
+    cols = np.rint((cells.longitudes - lon0) / unit)
+    sizes = np.rint(cells.sizes / unit)
+    regions = trace_regions(rows, cols, sizes, cells.values, tolerance)
+    return _to_degrees(regions, lat0, lon0, unit)
+
+
+def region_features(regions, properties):
+    """
+    Build a GeoJSON FeatureCollection with one MultiPolygon per region.
+
+    Args:
+        regions (dict): value -> polygons, from `grid_regions` or `cell_regions`.
+        properties (callable): value -> dict of feature properties.
+
+    Returns:
+        dict: GeoJSON FeatureCollection, features sorted by value.
+    """
+    features = []
+    for value in sorted(regions):
+        coordinates = [
+            [np.round(ring, 4).tolist() + [np.round(ring[0], 4).tolist()] for ring in polygon]
+            for polygon in regions[value]
+        ]
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'MultiPolygon', 'coordinates': coordinates},
+            'properties': {'number': value, **properties(value)},
+        })
+    return {'type': 'FeatureCollection', 'features': features}
@@ -0,0 +1,167 @@
+"""
+Streaming pattern scans over long date ranges.
+
+The range is processed in fixed-size time chunks so memory stays bounded no
+matter how many years are scanned. Each chunk's matches are collapsed into
+periods. Periods still running at the end of a chunk are held back and
+extended by the next chunk, so a pattern is reported once, when it ends (or
+when the scan finishes).
+
+Within a chunk only the windows where the pattern can hold are sampled:
+stretches in which the planets are too far from the pattern's aspects to
+form it are skipped (see core.pruning).
+"""
+import numpy as np
+import pandas as pd
+
+from core.ephemeris import PlanetPositions
+from core.ephemeris_store import query_positions
+from core.intervals import build_intervals, events_to_intervals
+from core.patterns import detect_pattern
+from core.pruning import PruningIndex, active_windows
+from core.timing import refine_pattern
+
+DEFAULT_CHUNK_STEPS = 366
+
+
+def key_columns(pattern):
+    """Columns identifying a pattern instance: its id and each vertex's planet and sign."""
+    return ['pattern_id'] + [
+        f'{column}_{vertex + 1}' for vertex in range(pattern.vertices) for column in ('planet', 'sign')
+    ]
+
+
+def _pattern_matches(positions, table, pattern):
+    """Matches of one pattern as a DataFrame with planet and sign columns per vertex."""
+    time_index, planets = detect_pattern(positions.longitude, table, pattern)
+    signs = (positions.longitude[time_index[:, None], planets] // 30).astype(int)
+    matches = {'julday': positions.jd[time_index], 'pattern_id': np.full(len(time_index), pattern.id)}
+    for vertex in range(pattern.vertices):
+        matches[f'planet_{vertex + 1}'] = positions.planet_ids[planets[:, vertex]]
+        matches[f'sign_{vertex + 1}'] = signs[:, vertex]
+    return pd.DataFrame(matches)
+
+
+def refine_periods(periods, pattern, table, step):
+    """
+    Add exact 'start', 'peak' and 'end' Julian days to sampled periods.
+
+    Args:
+        periods (pd.DataFrame): Output of a pattern scan.
+        pattern (Pattern): The pattern scanned for.
+        table (AspectTable): Aspect angles and orbs used by the scan.
+        step (float): Sampling step of the scan in days.
+
+    Returns:
+        pd.DataFrame: The periods with the three extra columns.
+    """
+    angle = dict(zip(table.ids.tolist(), table.angles.tolist()))
+    orb = dict(zip(table.ids.tolist(), table.orbs.tolist()))
+    planets = periods[[f'planet_{vertex + 1}' for vertex in range(pattern.vertices)]].to_numpy().tolist()
+    times = [
+        refine_pattern(
+            [(vertices[a], vertices[b], angle[aspect_id], orb[aspect_id]) for a, b, aspect_id in pattern.edges],
+            first, last, step
+        )
+        for vertices, first, last in zip(planets, periods['first'].tolist(), periods['last'].tolist())
+    ]
+    times = np.array(times, dtype=float).reshape(-1, 3)
+    return periods.assign(start=times[:, 0], peak=times[:, 1], end=times[:, 2])
+
+
+def windowed_positions(julday_start, julday_end, julday_step, planet_ids, table, pattern):
+    """
+    Positions at the samples of a range where a pattern can hold.
+
+    Returns:
+        PlanetPositions: Positions of the active windows, concatenated.
+    """
+    planet_ids = list(planet_ids)
+    index = PruningIndex(planet_ids, table)
+    windows = active_windows(
+        julday_start, julday_end, julday_step, lambda julday: index.pattern_start(julday, pattern)
+    )
+    parts = [query_positions(start, end, julday_step, planet_ids) for start, end in windows]
+    if len(parts) == 1:
+        return parts[0]
+    if not parts:
+        return PlanetPositions(np.empty(0), np.asarray(planet_ids, dtype=np.int32), np.empty((0, len(planet_ids), 3)))
+    return PlanetPositions(
+        np.concatenate([part.jd for part in parts]), parts[0].planet_ids,
+        np.concatenate([part.data for part in parts]),
+    )
+
+
+def scan_chunk(julday_start, julday_end, julday_step, planet_ids, table, pattern, prune=True):
+    """
+    Pattern periods within one chunk of samples.
+
+    Args:
+        prune (bool, optional): Skip the samples at which the pattern cannot
+            hold (see core.pruning); the result is the same either way.
+
+    Returns:
+        pd.DataFrame: Key columns plus the first and last sampled Julian days.
+    """
+    if prune:
+        positions = windowed_positions(julday_start, julday_end, julday_step, planet_ids, table, pattern)
+    else:
+        positions = query_positions(julday_start, julday_end, julday_step, planet_ids)
+    matches = _pattern_matches(positions, table, pattern)
+    return events_to_intervals(matches, key_columns(pattern), 'julday', julday_step)
+
+
+def scan_pattern_periods(julday_start, julday_end, julday_step, planet_ids, table, pattern,
+                         chunk_steps=DEFAULT_CHUNK_STEPS, refine=False, prune=True):
+    """
+    Scan a date range chunk by chunk and yield pattern periods as they close.
+
+    Args:
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        julday_step (float): Sampling step in days.
+        planet_ids (iterable of int): Swiss Ephemeris planet ids.
+        table (AspectTable): Aspect angles and orbs.
+        pattern (Pattern): Pattern to look for.
+        chunk_steps (int, optional): Samples per chunk.
+        refine (bool, optional): Add exact start, peak and end times.
+        prune (bool, optional): Skip stretches where the pattern cannot hold.
+
+    Yields:
+        tuple: (progress, periods) after every chunk, where progress is the
+        scanned fraction of the range and periods is a DataFrame of the
+        periods closed in this chunk, with key columns pattern_id, planet_n
+        and sign_n plus the first and last sampled Julian days and the
+        number of samples.
+    """
+    planet_ids = list(planet_ids)
+    keys = key_columns(pattern)
+    total = julday_end - julday_start
+    open_periods = None
+
+    chunk = 0
+    while True:
+        chunk_start = julday_start + chunk * chunk_steps * julday_step
+        if chunk_start > julday_end + 1e-9:
+            break
+        chunk_end = min(chunk_start + (chunk_steps - 1) * julday_step, julday_end)
+        periods = scan_chunk(chunk_start, chunk_end, julday_step, planet_ids, table, pattern, prune)
+        # Extend periods carried over from the previous chunk with their continuation
+        if open_periods is not None:
+            periods = build_intervals(pd.concat([open_periods, periods], ignore_index=True), keys, 1.5 * julday_step)
+
+        is_last_chunk = chunk_end >= julday_end - 1e-9
+        if is_last_chunk:
+            still_open = np.zeros(len(periods), dtype=bool)
+        else:
+            still_open = np.isclose(periods['last'].to_numpy(dtype=float), chunk_end, rtol=0, atol=1e-6)
+        open_periods = periods[still_open].reset_index(drop=True)
+        closed = periods[~still_open].sort_values('first', ignore_index=True)
+        if refine:
+            closed = refine_periods(closed, pattern, table, julday_step)
+
+        progress = 1.0 if is_last_chunk or total <= 0 else (chunk_end - julday_start) / total
+        yield progress, closed
+        if is_last_chunk:
+            break
+        chunk += 1
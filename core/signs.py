@@ -0,0 +1,131 @@
+"""
+Array-backed zodiac sign tables and vectorized formatting.
+
+Signs are small integer codes (0-11, Aries to Pisces), so every per-sign
+attribute is a 12-entry array and classifying any number of longitudes is a
+single fancy-indexing operation instead of a dict lookup per row. The same
+functions serve the one chart of the Natal Chart page and batch jobs over
+millions of positions.
+"""
+import numpy as np
+
+ELEMENTS = ['Fire', 'Earth', 'Air', 'Water']
+MODALITIES = ['Cardinal', 'Fixed', 'Mutable']
+
+
+class SignTable:
+    """
+    Sign attributes as arrays indexed by sign id.
+
+    Attributes:
+        names (np.ndarray): Sign names, shape (12,).
+        symbols (np.ndarray): Sign symbols.
+        elements (np.ndarray): Index of each sign's element in ELEMENTS.
+        modalities (np.ndarray): Index of each sign's modality in MODALITIES.
+        colors (np.ndarray): Hex colors.
+        rgb_colors (np.ndarray): RGB colors, shape (12, 3).
+    """
+    __slots__ = ('names', 'symbols', 'elements', 'modalities', 'colors', 'rgb_colors')
+
+    def __init__(self, names, symbols, elements, modalities, colors, rgb_colors):
+        self.names = np.asarray(names, dtype=object)
+        self.symbols = np.asarray(symbols, dtype=object)
+        self.elements = np.asarray(elements, dtype=np.int8)
+        self.modalities = np.asarray(modalities, dtype=np.int8)
+        self.colors = np.asarray(colors, dtype=object)
+        self.rgb_colors = np.asarray(rgb_colors, dtype=np.uint8)
+
+    @classmethod
+    def from_dict(cls, signs):
+        """
+        Build the table from the {id: {'name': ..., 'element': ...}} sign mapping.
+        """
+        rows = [signs[sign] for sign in range(12)]
+        return cls(
+            [sign['name'] for sign in rows],
+            [sign['symbol'] for sign in rows],
+            [ELEMENTS.index(sign['element']) for sign in rows],
+            [MODALITIES.index(sign['modality']) for sign in rows],
+            [sign['color'] for sign in rows],
+            [sign['rgb_color'] for sign in rows],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def element_names(self, signs):
+        """Element name of each sign id in an array."""
+        return np.asarray(ELEMENTS, dtype=object)[self.elements[signs]]
+
+    def modality_names(self, signs):
+        """Modality name of each sign id in an array."""
+        return np.asarray(MODALITIES, dtype=object)[self.modalities[signs]]
+
+
+def sign_of(longitudes):
+    """
+    Sign ids (0-11) of ecliptic longitudes.
+
+    Args:
+        longitudes (array-like): Longitudes in degrees, any shape.
+
+    Returns:
+        np.ndarray: Sign ids as int8, same shape.
+    """
+    return (np.mod(longitudes, 360.0) // 30).astype(np.int8)
+
+
+def format_dms(longitudes, symbols):
+    """
+    Format longitudes as sign symbol, degrees, minutes and seconds.
+
+    Longitudes are rounded to the nearest second once, so 29° 59' 59.7" reads
+    as 0° 0' 0" of the next sign rather than 29° 59' 60".
+
+    Args:
+        longitudes (array-like): Longitudes in degrees, any shape.
+        symbols (array-like): Symbol of each sign id, e.g. SignTable.symbols.
+
+    Returns:
+        np.ndarray: Strings like '♈︎ 12° 34' 56"', same shape.
+    """
+    seconds = np.rint(np.mod(np.asarray(longitudes, dtype=np.float64), 360.0) * 3600).astype(np.int64) % (360 * 3600)
+    sign, seconds = np.divmod(seconds, 30 * 3600)
+    degree, seconds = np.divmod(seconds, 3600)
+    minute, second = np.divmod(seconds, 60)
+    parts = (
+        np.asarray(symbols, dtype=str)[sign], ' ', degree.astype(str), '° ',
+        minute.astype(str), "' ", second.astype(str), '"',
+    )
+    text = parts[0]
+    for part in parts[1:]:
+        text = np.char.add(text, part)
+    return np.asarray(text).astype(object)
+
+
+def weighted_shares(categories, weights, n_categories):
+    """
+    Weighted percentage of each category, per row, with a single bincount.
+
+    Args:
+        categories (array-like): Category codes, shape (..., position), e.g.
+            SignTable.elements[sign_of(longitudes)].
+        weights (array-like): Weight of each position, broadcast to
+            `categories`.
+        n_categories (int): Number of categories.
+
+    Returns:
+        np.ndarray: Percentages, shape (..., n_categories); rows sum to 100,
+        or are all 0 when every weight of the row is 0.
+    """
+    categories = np.asarray(categories, dtype=np.int64)
+    weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), categories.shape)
+    rows = categories.reshape(-1, categories.shape[-1])
+    count = len(rows)
+    flat = np.arange(count)[:, None] * n_categories + rows
+    totals = np.bincount(
+        flat.ravel(), weights=weights.reshape(flat.shape).ravel(), minlength=count * n_categories
+    ).reshape(count, n_categories)
+    row_weights = weights.reshape(flat.shape).sum(axis=1, keepdims=True)
+    shares = np.divide(totals * 100, row_weights, out=np.zeros(totals.shape), where=row_weights != 0)
+    return shares.reshape(categories.shape[:-1] + (n_categories,))
@@ -0,0 +1,291 @@
+"""
+Solar returns and world maps of the solar return chart.
+
+The solar return moment is found with `swe.solcross`. For the maps, the
+sidereal time and obliquity at that moment are computed once and the
+Ascendant sign or a planet's house is evaluated over a whole latitude /
+longitude grid with NumPy, returning a compact int8 array instead of one
+record per cell.
+
+Finished maps are memoized in `MAP_CACHE`, shared by every session of the
+process and keyed on the chart time, the view and the grid resolution. Set
+SOLAR_CACHE_MB to change its memory budget, SOLAR_CACHE_DIR to also keep
+maps on disk and SOLAR_CACHE_DISK_MB to change the budget of that directory.
+Since the cache is shared, the Settings page only offers to clear it when
+SOLAR_CACHE_ADMIN=1.
+"""
+import os
+
+import numpy as np
+import swisseph as swe
+
+from core.adaptive import adaptive_cells
+from core.cache import ResultCache
+from core.houses import ascendant, placidus_house_position, sidereal_context
+
+# Default map grid, in degrees; beyond the polar circles houses are undefined
+GRID_LATITUDES = np.arange(-66, 67)
+GRID_LONGITUDES = np.arange(-180, 180)
+
+MAP_CACHE = ResultCache(
+    max_bytes=int(float(os.environ.get('SOLAR_CACHE_MB', 64)) * 2**20),
+    directory=os.environ.get('SOLAR_CACHE_DIR') or None,
+    max_disk_bytes=int(float(os.environ.get('SOLAR_CACHE_DISK_MB', 512)) * 2**20),
+)
+MAP_CACHE_ADMIN = os.environ.get('SOLAR_CACHE_ADMIN') == '1'
+
+
+class SolarReturnGrid:
+    """
+    Values of a solar return map over a latitude/longitude grid.
+
+    Attributes:
+        latitudes (np.ndarray): Grid latitudes, shape (lat,).
+        longitudes (np.ndarray): Grid longitudes, shape (lon,).
+        values (np.ndarray): int8 array shaped (lat, lon) holding the sign id
+            (0-11) of the Ascendant or the house number (1-12) of a planet.
+    """
+    __slots__ = ('latitudes', 'longitudes', 'values')
+
+    def __init__(self, latitudes, longitudes, values):
+        self.latitudes = latitudes
+        self.longitudes = longitudes
+        self.values = values
+
+    @property
+    def nbytes(self):
+        return self.latitudes.nbytes + self.longitudes.nbytes + self.values.nbytes
+
+
+def solar_return(sun_longitude, julday_from):
+    """
+    Julian day the Sun next returns to a given longitude.
+
+    Args:
+        sun_longitude (float): Natal Sun longitude in degrees.
+        julday_from (float): Julian day (UT) to search from.
+
+    Returns:
+        float: Julian day (UT) of the solar return.
+    """
+    return swe.solcross_ut(sun_longitude, julday_from)
+
+
+def solar_returns(sun_longitude, julday_from, count):
+    """
+    Julian days of consecutive solar returns.
+
+    Each search starts just after the previous return rather than from the
+    start of its year, so every call to `swe.solcross` only has to cover one
+    short step.
+
+    Args:
+        sun_longitude (float): Natal Sun longitude in degrees.
+        julday_from (float): Julian day (UT) to search the first return from.
+        count (int): Number of returns.
+
+    Returns:
+        np.ndarray: Julian days (UT) of the returns, shape (count,).
+    """
+    returns = np.empty(count)
+    jd = julday_from
+    for index in range(count):
+        jd = returns[index] = swe.solcross_ut(sun_longitude, jd)
+        # The Sun moves about a degree a day, so a day later the search is past this return
+        jd += 1.0
+    return returns
+
+
+def ascendant_evaluator(jd):
+    """
+    Function giving the Ascendant sign at any points for a fixed chart time.
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+
+    Returns:
+        callable: f(latitudes, longitudes) -> int8 sign ids (0-11), broadcasting
+        its arguments.
+    """
+    sidereal, eps = sidereal_context(jd)
+
+    def evaluate(latitudes, longitudes):
+        armc = sidereal + np.asarray(longitudes, dtype=np.float64)
+        return (ascendant(armc, eps, latitudes) // 30).astype(np.int8)
+    return evaluate
+
+
+def house_evaluator(jd, planet_id):
+    """
+    Function giving a planet's Placidus house at any points for a fixed chart time.
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+        planet_id (int): Swiss Ephemeris planet id.
+
+    Returns:
+        callable: f(latitudes, longitudes) -> int8 house numbers (1-12),
+        broadcasting its arguments.
+    """
+    sidereal, eps = sidereal_context(jd)
+    ecliptic = swe.calc_ut(jd, planet_id)[0]
+    equatorial = swe.calc_ut(jd, planet_id, swe.FLG_SWIEPH | swe.FLG_EQUATORIAL)[0]
+
+    def evaluate(latitudes, longitudes):
+        armc = sidereal + np.asarray(longitudes, dtype=np.float64)
+        position = placidus_house_position(
+            armc, eps, latitudes, (ecliptic[0], ecliptic[1]), (equatorial[0], equatorial[1])
+        )
+        return position.astype(np.int8)
+    return evaluate
+
+
+def evaluate_grid(evaluate, latitudes=GRID_LATITUDES, longitudes=GRID_LONGITUDES):
+    """
+    Evaluate a map function over every point of a latitude/longitude grid.
+
+    Args:
+        evaluate (callable): f(latitudes, longitudes) -> integer values.
+        latitudes (array-like, optional): Grid latitudes in degrees.
+        longitudes (array-like, optional): Grid longitudes in degrees.
+
+    Returns:
+        SolarReturnGrid: The values, shape (lat, lon).
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    return SolarReturnGrid(latitudes, longitudes, evaluate(latitudes[:, None], longitudes[None, :]))
+
+
+def ascendant_grid(jd, latitudes=GRID_LATITUDES, longitudes=GRID_LONGITUDES):
+    """
+    Sign of the Ascendant at every grid point.
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+        latitudes (array-like, optional): Grid latitudes in degrees.
+        longitudes (array-like, optional): Grid longitudes in degrees.
+
+    Returns:
+        SolarReturnGrid: Sign ids (0-11).
+    """
+    return evaluate_grid(ascendant_evaluator(jd), latitudes, longitudes)
+
+
+def house_grid(jd, planet_id, latitudes=GRID_LATITUDES, longitudes=GRID_LONGITUDES):
+    """
+    Placidus house of a planet at every grid point.
+
+    Args:
+        jd (float): Julian day (UT) of the chart.
+        planet_id (int): Swiss Ephemeris planet id.
+        latitudes (array-like, optional): Grid latitudes in degrees.
+        longitudes (array-like, optional): Grid longitudes in degrees.
+
+    Returns:
+        SolarReturnGrid: House numbers (1-12).
+    """
+    return evaluate_grid(house_evaluator(jd, planet_id), latitudes, longitudes)
+
+
+def solar_return_grids(jds, planet_id=None, latitudes=GRID_LATITUDES, longitudes=GRID_LONGITUDES):
+    """
+    Maps of several solar returns evaluated in one pass.
+
+    The time-dependent quantities get a leading axis, so every grid is
+    computed by a single broadcast NumPy evaluation shaped (time, lat, lon).
+
+    Args:
+        jds (array-like): Julian days (UT) of the charts.
+        planet_id (int, optional): Planet whose house is mapped; the Ascendant
+            sign is mapped when omitted.
+        latitudes (array-like, optional): Grid latitudes in degrees.
+        longitudes (array-like, optional): Grid longitudes in degrees.
+
+    Returns:
+        list: One SolarReturnGrid per Julian day, views of a single array.
+    """
+    latitudes = np.asarray(latitudes, dtype=np.float64)
+    longitudes = np.asarray(longitudes, dtype=np.float64)
+    sidereal, eps = np.array([sidereal_context(jd) for jd in jds]).reshape(-1, 2).T[:, :, None, None]
+    armc = sidereal + longitudes[None, None, :]
+    lat = latitudes[None, :, None]
+    if planet_id is None:
+        values = (ascendant(armc, eps, lat) // 30).astype(np.int8)
+    else:
+        ecliptic = np.array([swe.calc_ut(jd, planet_id)[0][:2] for jd in jds]).reshape(-1, 2)
+        equatorial = np.array([
+            swe.calc_ut(jd, planet_id, swe.FLG_SWIEPH | swe.FLG_EQUATORIAL)[0][:2] for jd in jds
+        ]).reshape(-1, 2)
+        planet_pos = tuple(ecliptic.T[:, :, None, None])
+        planet_equ = tuple(equatorial.T[:, :, None, None])
+        values = placidus_house_position(armc, eps, lat, planet_pos, planet_equ).astype(np.int8)
+    return [SolarReturnGrid(latitudes, longitudes, grid) for grid in values]
+
+
+def solar_return_map(jd, planet_id=None, min_size=None, cache=MAP_CACHE):
+    """
+    Solar return map, memoized.
+
+    Args:
+        jd (float): Julian day (UT) of the solar return.
+        planet_id (int, optional): Planet whose house is mapped; the Ascendant
+            sign is mapped when omitted.
+        min_size (float, optional): Minimum cell side in degrees for an
+            adaptive map; the default 1 degree uniform grid when omitted.
+        cache (ResultCache, optional): Cache to use; None disables caching.
+
+    Returns:
+        SolarReturnGrid | AdaptiveCells: The map values.
+    """
+    def compute():
+        if planet_id is None:
+            evaluate = ascendant_evaluator(jd)
+        else:
+            evaluate = house_evaluator(jd, planet_id)
+        if min_size is None:
+            return evaluate_grid(evaluate)
+        return adaptive_cells(evaluate, min_size=min_size)
+
+    if cache is None:
+        return compute()
+    return cache.get_or_compute(_map_key(jd, planet_id, min_size), compute)
+
+
+def solar_return_maps(jds, planet_id=None, min_size=None, cache=MAP_CACHE):
+    """
+    Memoized maps of several solar returns.
+
+    Uniform maps missing from the cache are computed together with
+    `solar_return_grids`; adaptive maps are refined one return at a time,
+    since each has its own boundaries.
+
+    Args:
+        jds (array-like): Julian days (UT) of the solar returns.
+        planet_id (int, optional): Planet whose house is mapped; the Ascendant
+            sign is mapped when omitted.
+        min_size (float, optional): Minimum cell side in degrees for adaptive
+            maps; the default 1 degree uniform grid when omitted.
+        cache (ResultCache, optional): Cache to use; None disables caching.
+
+    Returns:
+        list: One SolarReturnGrid or AdaptiveCells per Julian day.
+    """
+    if min_size is not None:
+        return [solar_return_map(jd, planet_id, min_size, cache) for jd in jds]
+
+    maps = [None if cache is None else cache.get(_map_key(jd, planet_id, min_size)) for jd in jds]
+    missing = [index for index, sr_map in enumerate(maps) if sr_map is None]
+    if missing:
+        grids = solar_return_grids([jds[index] for index in missing], planet_id)
+        for index, grid in zip(missing, grids):
+            # Copy out of the shared block, so evicting one year frees its memory
+            maps[index] = SolarReturnGrid(grid.latitudes, grid.longitudes, grid.values.copy())
+            if cache is not None:
+                cache.put(_map_key(jds[index], planet_id, min_size), maps[index])
+    return maps
+
+
+def _map_key(jd, planet_id, min_size):
+    # Rounded to well below a second, so the same return found twice shares an entry
+    return ('solar_return_map', round(float(jd), 8), planet_id, min_size)
@@ -0,0 +1,378 @@
+"""
+Offline timezone lookup from coordinates.
+
+Timezone polygons (the GeoJSON released by timezone-boundary-builder) are
+converted once into a uniform grid index over the globe:
+
+- every cell records the zone of its center, found for all cells at once by
+  scanline filling each zone's rings (even-odd rule, so holes and
+  multi-polygons need no special care);
+- cells crossed by a zone boundary also keep the boundary edges inside them.
+
+A point in a cell without edges is in the cell's zone. Otherwise it is inside
+a zone when the zone contains the cell center XOR the path from the point to
+the center crosses that zone's edges an odd number of times, which only
+involves the handful of edges stored for the cell. A lookup takes a few tens
+of microseconds. Outside every polygon (datasets without ocean zones) the
+nautical zone `Etc/GMT±N` of the longitude is returned; without an index,
+`timezone_at` raises instead of guessing.
+
+Build it with:
+
+    python -m core.timezones build \\
+        --source https://github.com/evansiroky/timezone-boundary-builder/releases/latest/download/timezones-with-oceans.geojson.zip
+
+`pytz` zones and the UTC offsets of local times are cached, so converting
+many historical birth times costs one zone load per timezone name.
+"""
+import argparse
+import datetime
+import errno
+import functools
+import io
+import json
+import os
+import re
+import sys
+import urllib.request
+import zipfile
+
+import numpy as np
+import pytz
+
+DEFAULT_PATH = os.environ.get(
+    'TIMEZONE_INDEX',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'timezones.npz')
+)
+FORMAT_VERSION = 1
+DEFAULT_RESOLUTION = 0.5
+
+
+def nautical_zone(longitude):
+    """
+    Nautical timezone of a longitude, for points outside every polygon.
+
+    Args:
+        longitude (float): Longitude in degrees.
+
+    Returns:
+        str: e.g. 'Etc/GMT-2' for 30°E (the Etc sign convention is inverted).
+    """
+    offset = int(np.clip(round(longitude / 15), -12, 12))
+    return f'Etc/GMT{-offset:+d}' if offset else 'Etc/GMT'
+
+
+class TimezoneIndex:
+    """
+    Grid index of timezone polygons.
+
+    Attributes:
+        zones (np.ndarray): Timezone names, indexed by zone id.
+        resolution (float): Cell side in degrees.
+        cell_zones (np.ndarray): Zone id of each cell center (-1 for none),
+            shaped (lat, lon).
+        offsets (np.ndarray): Start of each cell's edges in `edges`, flat
+            cell order, one extra entry at the end.
+        edges (np.ndarray): Boundary edges (x1, y1, x2, y2), grouped by cell.
+        edge_zones (np.ndarray): Zone id of each edge.
+    """
+
+    def __init__(self, path):
+        with np.load(path, allow_pickle=False) as archive:
+            if int(archive['format_version']) != FORMAT_VERSION:
+                raise ValueError(f'{path}: unsupported timezone index format')
+            self.zones = archive['zones']
+            self.resolution = float(archive['resolution'])
+            self.cell_zones = archive['cell_zones']
+            self.offsets = archive['offsets']
+            self.edges = archive['edges'].astype(np.float64)
+            self.edge_zones = archive['edge_zones']
+
+    def zone_id(self, latitude, longitude):
+        """
+        Zone id at a point.
+
+        Args:
+            latitude (float): Latitude in degrees.
+            longitude (float): Longitude in degrees.
+
+        Returns:
+            int: Index into `zones`, or -1 outside every polygon.
+        """
+        rows, cols = self.cell_zones.shape
+        row = min(max(int((latitude + 90.0) / self.resolution), 0), rows - 1)
+        col = min(max(int((longitude + 180.0) / self.resolution), 0), cols - 1)
+        cell = row * cols + col
+        center_zone = int(self.cell_zones[row, col])
+        lo, hi = self.offsets[cell], self.offsets[cell + 1]
+        if lo == hi:
+            return center_zone
+
+        # Path from the point to the cell center: horizontally, then vertically
+        center_x = -180.0 + (col + 0.5) * self.resolution
+        center_y = -90.0 + (row + 0.5) * self.resolution
+        x1, y1, x2, y2 = self.edges[lo:hi].T
+        zones = self.edge_zones[lo:hi]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            spans_row = (y1 <= latitude) != (y2 <= latitude)
+            x_cross = x1 + (latitude - y1) * (x2 - x1) / (y2 - y1)
+            spans_col = (x1 <= center_x) != (x2 <= center_x)
+            y_cross = y1 + (center_x - x1) * (y2 - y1) / (x2 - x1)
+        crossings = (
+            (spans_row & ((x_cross >= min(longitude, center_x)) & (x_cross < max(longitude, center_x))))
+            ^ (spans_col & ((y_cross >= min(latitude, center_y)) & (y_cross < max(latitude, center_y))))
+        )
+        candidates, inverse = np.unique(zones, return_inverse=True)
+        parity = np.bincount(inverse, weights=crossings, minlength=candidates.size).astype(np.int64) % 2
+        inside = (candidates == center_zone) ^ (parity == 1)
+        if inside.any():
+            return int(candidates[inside.argmax()])
+        # No boundary of the center's zone crossed: still in it
+        return center_zone if center_zone not in candidates else -1
+
+    def timezone_at(self, latitude, longitude):
+        """
+        IANA timezone name at a point.
+
+        Args:
+            latitude (float): Latitude in degrees.
+            longitude (float): Longitude in degrees.
+
+        Returns:
+            str: Timezone name; the nautical zone outside every polygon.
+        """
+        zone = self.zone_id(latitude, longitude)
+        return str(self.zones[zone]) if zone >= 0 else nautical_zone(longitude)
+
+
+@functools.lru_cache(maxsize=2)
+def open_timezone_index(path=DEFAULT_PATH):
+    """
+    Load the timezone index once per process.
+
+    Args:
+        path (str, optional): Path of the index archive.
+
+    Returns:
+        TimezoneIndex or None: None when the file is missing or unreadable.
+    """
+    try:
+        return TimezoneIndex(path)
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def timezone_at(latitude, longitude):
+    """
+    IANA timezone name at a point, from the offline index.
+
+    Args:
+        latitude (float): Latitude in degrees.
+        longitude (float): Longitude in degrees.
+
+    Returns:
+        str: Timezone name; the nautical zone of the longitude when the
+        point is outside every polygon of the index.
+
+    Raises:
+        FileNotFoundError: When the index is not built. The nautical zone
+            ignores daylight saving time and political boundaries, so it is
+            not a substitute for the index on land.
+    """
+    index = open_timezone_index()
+    if index is None:
+        raise FileNotFoundError(
+            errno.ENOENT, 'Timezone index not built, run `python -m core.timezones build`', DEFAULT_PATH
+        )
+    return index.timezone_at(latitude, longitude)
+
+
+@functools.lru_cache(maxsize=None)
+def get_zone(name):
+    """Cached `pytz.timezone`; zone objects are immutable and shared."""
+    return pytz.timezone(name)
+
+
+@functools.lru_cache(maxsize=65536)
+def utc_offset(name, local_time):
+    """
+    UTC offset of a naive local time in a timezone, historical rules included.
+
+    Args:
+        name (str): IANA timezone name.
+        local_time (datetime.datetime): Naive local time.
+
+    Returns:
+        datetime.timedelta: Offset to add to UTC to get the local time.
+    """
+    return get_zone(name).localize(local_time).utcoffset()
+
+
+def local_to_utc(local_time, name):
+    """
+    Convert a naive local time to an aware UTC datetime.
+
+    Args:
+        local_time (datetime.datetime): Naive local time.
+        name (str): IANA timezone name.
+
+    Returns:
+        datetime.datetime: The same instant in UTC.
+    """
+    return (local_time - utc_offset(name, local_time)).replace(tzinfo=pytz.utc)
+
+
+def _zone_rings(geometry):
+    """Rings of a Polygon or MultiPolygon geometry as (n, 2) arrays."""
+    polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+    for polygon in polygons:
+        for ring in polygon:
+            # float32 as stored, so the build and the lookups see the same edges
+            yield np.asarray(ring, dtype=np.float32).astype(np.float64)
+
+
+def _ring_edges(rings):
+    """Edges (x1, y1, x2, y2) of closed rings, without zero-length ones."""
+    edges = np.concatenate([np.hstack([ring[:-1], ring[1:]]) for ring in rings if len(ring) > 1])
+    return edges[(edges[:, 0] != edges[:, 2]) | (edges[:, 1] != edges[:, 3])]
+
+
+def _fill_centers(edges, resolution, shape):
+    """Flat indices of the cells whose center is inside the rings (even-odd)."""
+    x1, y1, x2, y2 = edges.T
+    # Rows of cell centers y crossed by each edge, with y in [min y, max y)
+    first = np.ceil((np.minimum(y1, y2) + 90.0) / resolution - 0.5).astype(np.int64)
+    last = np.ceil((np.maximum(y1, y2) + 90.0) / resolution - 0.5).astype(np.int64) - 1
+    counts = np.maximum(last - first + 1, 0)
+    edge = np.repeat(np.arange(len(edges)), counts)
+    row = first[edge] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    y = -90.0 + (row + 0.5) * resolution
+    x = x1[edge] + (y - y1[edge]) * (x2[edge] - x1[edge]) / (y2[edge] - y1[edge])
+
+    order = np.lexsort((x, row))
+    row, x = row[order], x[order]
+    # Every row has an even number of crossings; consecutive pairs enclose the inside
+    start_x, end_x, row = x[0::2], x[1::2], row[0::2]
+    first_col = np.ceil((start_x + 180.0) / resolution - 0.5).astype(np.int64)
+    last_col = np.ceil((end_x + 180.0) / resolution - 0.5).astype(np.int64) - 1
+    counts = np.maximum(last_col - first_col + 1, 0)
+    span = np.repeat(np.arange(len(row)), counts)
+    col = first_col[span] + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    valid = (row[span] >= 0) & (row[span] < shape[0]) & (col >= 0) & (col < shape[1])
+    return row[span][valid] * shape[1] + col[valid]
+
+
+def _edge_cells(edges, resolution, shape):
+    """(edge index, flat cell index) for every cell an edge's bounding box covers."""
+    x1, y1, x2, y2 = edges.T
+    row0 = np.clip(((np.minimum(y1, y2) + 90.0) // resolution).astype(np.int64), 0, shape[0] - 1)
+    row1 = np.clip(((np.maximum(y1, y2) + 90.0) // resolution).astype(np.int64), 0, shape[0] - 1)
+    col0 = np.clip(((np.minimum(x1, x2) + 180.0) // resolution).astype(np.int64), 0, shape[1] - 1)
+    col1 = np.clip(((np.maximum(x1, x2) + 180.0) // resolution).astype(np.int64), 0, shape[1] - 1)
+    rows, cols = row1 - row0 + 1, col1 - col0 + 1
+    counts = rows * cols
+    edge = np.repeat(np.arange(len(edges)), counts)
+    position = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell = (row0[edge] + position // cols[edge]) * shape[1] + col0[edge] + position % cols[edge]
+    return edge, cell
+
+
+def _open_geojson(source):
+    """Parsed GeoJSON given as a path or URL, zipped or not."""
+    if re.match(r'https?://', source):
+        with urllib.request.urlopen(source, timeout=300) as response:
+            payload = response.read()
+    else:
+        with open(source, 'rb') as file:
+            payload = file.read()
+    if source.endswith('.zip'):
+        with zipfile.ZipFile(io.BytesIO(payload)) as archive:
+            member = next(name for name in archive.namelist() if name.endswith('json'))
+            payload = archive.read(member)
+    return json.loads(payload)
+
+
+def build_timezone_index(path, source, resolution=DEFAULT_RESOLUTION, progress=None):
+    """
+    Convert timezone polygons into a grid index.
+
+    Args:
+        path (str): Output file (.npz).
+        source (str): Path or URL of a GeoJSON FeatureCollection (or a .zip
+            holding one) whose features have a `tzid` property.
+        resolution (float, optional): Cell side in degrees.
+        progress (callable, optional): Called with (done, total) after each zone.
+
+    Returns:
+        int: Number of zones written.
+    """
+    features = _open_geojson(source)['features']
+    shape = (int(round(180 / resolution)), int(round(360 / resolution)))
+    cell_zones = np.full(shape[0] * shape[1], -1, dtype=np.int16)
+
+    zones, cell_parts, zone_parts, edge_parts = [], [], [], []
+    for number, feature in enumerate(features):
+        edges = _ring_edges(_zone_rings(feature['geometry']))
+        zone = len(zones)
+        zones.append(feature['properties']['tzid'])
+        cell_zones[_fill_centers(edges, resolution, shape)] = zone
+        edge, cell = _edge_cells(edges, resolution, shape)
+        cell_parts.append(cell)
+        zone_parts.append(np.full(len(cell), zone, dtype=np.int16))
+        edge_parts.append(edges[edge].astype(np.float32))
+        if progress is not None:
+            progress(number + 1, len(features))
+
+    cells = np.concatenate(cell_parts)
+    order = np.argsort(cells, kind='stable')
+    offsets = np.searchsorted(cells[order], np.arange(shape[0] * shape[1] + 1)).astype(np.int64)
+
+    temp_path = path + '.tmp.npz'
+    np.savez_compressed(
+        temp_path,
+        format_version=np.array(FORMAT_VERSION),
+        zones=np.array(zones, dtype=str),
+        resolution=np.array(resolution),
+        cell_zones=cell_zones.reshape(shape),
+        offsets=offsets,
+        edges=np.concatenate(edge_parts)[order],
+        edge_zones=np.concatenate(zone_parts)[order],
+    )
+    os.replace(temp_path, path)
+    return len(zones)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Build or query the offline timezone index.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='Convert timezone polygons')
+    build.add_argument('--source', required=True, help='Path or URL of a timezone-boundary-builder GeoJSON (.json or .zip)')
+    build.add_argument('--output', default=DEFAULT_PATH)
+    build.add_argument('--resolution', type=float, default=DEFAULT_RESOLUTION, help='Cell side in degrees')
+
+    lookup = commands.add_parser('lookup', help='Timezone at a point')
+    lookup.add_argument('latitude', type=float)
+    lookup.add_argument('longitude', type=float)
+    lookup.add_argument('--path', default=DEFAULT_PATH)
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        started = datetime.datetime.now()
+
+        def progress(done, total):
+            print(f'\r{done}/{total} zones ({done / total:.0%})', end='', file=sys.stderr)
+        count = build_timezone_index(args.output, args.source, args.resolution, progress)
+        print(f'\nWrote {count} zones to {args.output} in {datetime.datetime.now() - started}', file=sys.stderr)
+        return 0
+
+    index = open_timezone_index(args.path)
+    if index is None:
+        print(f'{args.path}: timezone index not found, run the build command first', file=sys.stderr)
+        return 1
+    print(index.timezone_at(args.latitude, args.longitude))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
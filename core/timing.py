@@ -0,0 +1,281 @@
+"""
+Exact timing of aspects and patterns.
+
+A coarse scan tells which samples are within orb; the functions here refine
+the moments the orb is entered, the aspect is exact and the orb is left by
+root-finding on the angular separation between the samples that bracket
+them. Roots are found with Newton steps that use the longitude speeds
+returned by `swe.calc_ut`, safeguarded by bisection, so each boundary costs a
+handful of ephemeris evaluations instead of a dense scan.
+
+For a pair of planets the directed difference d = lon1 - lon2 (wrapped to
+(-180, 180]) is compared with the aspect angle on the side it is on:
+h = wrap(d - sign(d) * angle). The aspect is exact when h = 0 and within orb
+when |h| <= orb, and dh/dt is simply speed1 - speed2.
+"""
+import numpy as np
+import swisseph as swe
+
+from core.ephemeris import DEFAULT_FLAGS
+
+# One second, in days
+TOLERANCE = 1 / 86400
+MAX_ITERATIONS = 60
+
+
+def _wrap(angle):
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+def _lon_speed(julday, planet_id, flags=DEFAULT_FLAGS):
+    xx = swe.calc_ut(julday, planet_id, flags)[0]
+    return xx[0], xx[3]
+
+
+class AspectGeometry:
+    """
+    Signed distance of a pair of planets from an aspect.
+
+    Attributes:
+        planet1 (int): First planet id.
+        planet2 (int): Second planet id.
+        angle (float): Aspect angle in degrees.
+        orb (float): Orb in degrees.
+        side (int): +1 or -1, the side of the aspect (lon1 ahead of lon2 or
+            behind it). Irrelevant for conjunctions and oppositions.
+    """
+    __slots__ = ('planet1', 'planet2', 'angle', 'orb', 'side', 'flags')
+
+    def __init__(self, planet1, planet2, angle, orb, side=1, flags=DEFAULT_FLAGS):
+        self.planet1 = int(planet1)
+        self.planet2 = int(planet2)
+        self.angle = float(angle)
+        self.orb = float(orb)
+        self.side = side
+        self.flags = flags
+
+    @classmethod
+    def at(cls, julday, planet1, planet2, angle, orb, flags=DEFAULT_FLAGS):
+        """Geometry on whichever side of the aspect the pair is at `julday`."""
+        lon1, _ = _lon_speed(julday, planet1, flags)
+        lon2, _ = _lon_speed(julday, planet2, flags)
+        return cls(planet1, planet2, angle, orb, 1 if _wrap(lon1 - lon2) >= 0 else -1, flags)
+
+    def offset(self, julday):
+        """
+        Distance from the exact aspect and its rate of change.
+
+        Returns:
+            tuple: (h, dh/dt) in degrees and degrees/day.
+        """
+        lon1, speed1 = _lon_speed(julday, self.planet1, self.flags)
+        lon2, speed2 = _lon_speed(julday, self.planet2, self.flags)
+        return _wrap(_wrap(lon1 - lon2) - self.side * self.angle), speed1 - speed2
+
+    def within(self, julday):
+        return abs(self.offset(julday)[0]) <= self.orb
+
+
+def find_root(function, lo, hi, tolerance=TOLERANCE):
+    """
+    Root of function(t) = (value, derivative) in a sign-changing bracket.
+
+    Newton steps are taken when they stay inside the bracket, otherwise the
+    bracket is bisected.
+
+    Args:
+        function (callable): Returns (value, derivative) at t.
+        lo (float): Bracket start.
+        hi (float): Bracket end.
+        tolerance (float, optional): Bracket width at which to stop, in days.
+
+    Returns:
+        float or None: The root, or None if the bracket does not change sign.
+    """
+    f_lo, _ = function(lo)
+    f_hi, _ = function(hi)
+    if f_lo == 0:
+        return lo
+    if f_hi == 0:
+        return hi
+    if np.sign(f_lo) == np.sign(f_hi):
+        return None
+
+    t = 0.5 * (lo + hi)
+    for _ in range(MAX_ITERATIONS):
+        value, derivative = function(t)
+        if value == 0:
+            return t
+        if np.sign(value) == np.sign(f_lo):
+            lo, f_lo = t, value
+        else:
+            hi = t
+        if hi - lo < tolerance:
+            break
+        step = value / derivative if derivative else np.inf
+        t_next = t - step
+        if not lo < t_next < hi:
+            t_next = 0.5 * (lo + hi)
+        elif abs(step) < tolerance:
+            return t_next
+        t = t_next
+    return 0.5 * (lo + hi)
+
+
+def orb_boundary(geometry, outside, inside, tolerance=TOLERANCE):
+    """
+    Moment a pair crosses the edge of its orb between two samples.
+
+    Args:
+        geometry (AspectGeometry): The pair and aspect.
+        outside (float): Julian day at which the pair is out of orb.
+        inside (float): Julian day at which the pair is within orb.
+        tolerance (float, optional): Accuracy in days.
+
+    Returns:
+        float: Julian day of the crossing.
+    """
+    h_out, _ = geometry.offset(outside)
+    edge = np.copysign(geometry.orb, h_out)
+
+    def function(t):
+        h, dh = geometry.offset(t)
+        return h - edge, dh
+
+    root = find_root(function, min(outside, inside), max(outside, inside), tolerance)
+    if root is not None:
+        return root
+
+    # The pair went through the whole orb, or wrapped around, between the
+    # samples: fall back to bisection on the within-orb test
+    lo, hi = outside, inside
+    while abs(hi - lo) > tolerance:
+        middle = 0.5 * (lo + hi)
+        if geometry.within(middle):
+            hi = middle
+        else:
+            lo = middle
+    return hi
+
+
+def exact_times(geometry, juldays, tolerance=TOLERANCE):
+    """
+    Moments the aspect is exact within a sampled stretch.
+
+    Several exact moments are returned when retrograde motion makes the pair
+    go back and forth over the aspect.
+
+    Args:
+        geometry (AspectGeometry): The pair and aspect.
+        juldays (array-like): Increasing sample times covering the stretch.
+        tolerance (float, optional): Accuracy in days.
+
+    Returns:
+        list of float: Julian days of exactness, in order.
+    """
+    juldays = np.asarray(juldays, dtype=np.float64)
+    offsets = np.array([geometry.offset(t)[0] for t in juldays])
+    roots = []
+    for i in np.flatnonzero(np.sign(offsets[:-1]) != np.sign(offsets[1:])):
+        # A sign change across a large offset is the wrap at +-180, not a root
+        if abs(offsets[i]) + abs(offsets[i + 1]) < 180:
+            roots.append(find_root(geometry.offset, juldays[i], juldays[i + 1], tolerance))
+    return roots
+
+
+def closest_approach(function, lo, hi, tolerance=TOLERANCE):
+    """
+    Minimum of a unimodal function on [lo, hi] by golden-section search.
+
+    Args:
+        function (callable): Function of a Julian day returning a float.
+        lo (float): Interval start.
+        hi (float): Interval end.
+        tolerance (float, optional): Accuracy in days.
+
+    Returns:
+        float: Julian day of the minimum.
+    """
+    ratio = (np.sqrt(5) - 1) / 2
+    a, b = lo, hi
+    c, d = b - ratio * (b - a), a + ratio * (b - a)
+    fc, fd = function(c), function(d)
+    while b - a > tolerance:
+        if fc < fd:
+            b, d, fd = d, c, fc
+            c = b - ratio * (b - a)
+            fc = function(c)
+        else:
+            a, c, fc = c, d, fd
+            d = a + ratio * (b - a)
+            fd = function(d)
+    return 0.5 * (a + b)
+
+
+def refine_aspect(planet1, planet2, angle, orb, first, last, step, flags=DEFAULT_FLAGS):
+    """
+    Exact entry, exact and exit times of a pair aspect found by a scan.
+
+    Args:
+        planet1 (int): First planet id.
+        planet2 (int): Second planet id.
+        angle (float): Aspect angle in degrees.
+        orb (float): Orb in degrees.
+        first (float): First sample at which the aspect was within orb.
+        last (float): Last sample at which the aspect was within orb.
+        step (float): Scan step in days.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        dict: 'entry' and 'exit' Julian days and the list of 'exact' ones.
+    """
+    geometry = AspectGeometry.at(first, planet1, planet2, angle, orb, flags)
+    # A run already within orb one step outside touches the end of the
+    # scanned range, like in `refine_pattern`: the sample itself is returned
+    before, after = first - step, last + step
+    entry = first if geometry.within(before) else orb_boundary(geometry, before, first)
+    exit = last if geometry.within(after) else orb_boundary(geometry, after, last)
+    samples = np.append(np.arange(first, last, step), last)
+    exact = exact_times(geometry, np.concatenate([[before], samples, [after]]))
+    return {
+        'entry': entry,
+        'exact': [t for t in exact if entry <= t <= exit],
+        'exit': exit,
+    }
+
+
+def refine_pattern(edges, first, last, step, flags=DEFAULT_FLAGS):
+    """
+    Exact start, peak and end of a pattern found by a scan.
+
+    A pattern holds while every edge is within orb, so it starts when the last
+    edge enters its orb and ends when the first one leaves it. The peak is the
+    moment the summed distance of all edges from exactness is smallest.
+
+    Args:
+        edges (iterable): (planet1, planet2, angle, orb) for every edge.
+        first (float): First sample at which the pattern was found.
+        last (float): Last sample at which the pattern was found.
+        step (float): Scan step in days.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        tuple: (start, peak, end) Julian days.
+    """
+    geometries = [AspectGeometry.at(first, *edge, flags=flags) for edge in edges]
+
+    # Edges already within orb one step outside the run do not bound it. If
+    # every edge was, the run touches the end of the scanned range and the
+    # sample itself is returned.
+    entries = [orb_boundary(g, first - step, first) for g in geometries if not g.within(first - step)]
+    start = max(entries) if entries else first
+    exits = [orb_boundary(g, last + step, last) for g in geometries if not g.within(last + step)]
+    end = min(exits) if exits else last
+
+    def total_offset(t):
+        return sum(abs(g.offset(t)[0]) for g in geometries)
+
+    samples = np.append(np.arange(first, last, step), last)
+    best = samples[np.argmin([total_offset(t) for t in samples])]
+    peak = closest_approach(total_offset, max(start, best - step), min(end, best + step))
+    return start, peak, end
@@ -0,0 +1,292 @@
+"""
+Transits of moving planets to the fixed points of a natal chart.
+
+A transit is a moving planet within orb of an aspect to a natal longitude:
+h = wrap(wrap(lon - natal) - side * angle), within orb when |h| <= orb, where
+side (+1 or -1) tells whether the aspect is taken ahead of or behind the
+natal point (both sides are the same target for conjunctions and
+oppositions). Since the natal point does not move, dh/dt is the planet's own
+speed, and the retrograde passes of a transit are the exact moments at which
+that speed is negative.
+
+The range is scanned in chunks, like core.scan, and transits are yielded
+when they end, so arbitrarily long ranges are searched in bounded memory:
+
+- each planet is sampled with a step small enough that it cannot cross the
+  narrowest orb between two samples (MAX_SPEED), so the Moon is sampled a
+  few times a day and the other planets daily;
+- at the start of every chunk a planet's distance from each aspect target is
+  compared with how far it can move until the chunk ends (core.pruning);
+  targets it cannot reach are not evaluated, planets with no reachable
+  target are not sampled until they can reach one, and chunks in which no
+  planet can are skipped;
+- runs of in-orb samples are refined to exact entry, exact and exit times by
+  root-finding (see core.timing).
+
+Transits that only graze the edge of an orb at a station, staying in orb for
+less than a sampling step, can be missed.
+"""
+import numpy as np
+import pandas as pd
+
+from core.ephemeris import DEFAULT_FLAGS, MAX_SPEED, julday_range
+from core.ephemeris_store import query_positions
+from core.intervals import build_intervals, events_to_intervals
+from core.pruning import reach_days
+from core.timing import _lon_speed, _wrap, exact_times, orb_boundary
+
+DEFAULT_CHUNK_DAYS = 120
+KEYS = ['transit', 'natal', 'aspect_id', 'side']
+
+
+class TransitGeometry:
+    """
+    Signed distance of a moving planet from an aspect to a fixed longitude.
+
+    Has the interface of core.timing.AspectGeometry, so `orb_boundary` and
+    `exact_times` apply to it.
+
+    Attributes:
+        planet (int): Transiting planet id.
+        natal (float): Natal longitude in degrees.
+        angle (float): Aspect angle in degrees.
+        orb (float): Orb in degrees.
+        side (int): +1 or -1, the side of the natal point the aspect is on.
+    """
+    __slots__ = ('planet', 'natal', 'angle', 'orb', 'side', 'flags')
+
+    def __init__(self, planet, natal, angle, orb, side=1, flags=DEFAULT_FLAGS):
+        self.planet = int(planet)
+        self.natal = float(natal)
+        self.angle = float(angle)
+        self.orb = float(orb)
+        self.side = side
+        self.flags = flags
+
+    def offset(self, julday):
+        """
+        Distance from the exact aspect and its rate of change.
+
+        Returns:
+            tuple: (h, dh/dt) in degrees and degrees/day.
+        """
+        lon, speed = _lon_speed(julday, self.planet, self.flags)
+        return _wrap(_wrap(lon - self.natal) - self.side * self.angle), speed
+
+    def within(self, julday):
+        return abs(self.offset(julday)[0]) <= self.orb
+
+
+def sampling_step(planet_id, table, julday_step=1.0):
+    """
+    Sampling step at which a planet cannot cross the narrowest orb unseen.
+
+    Aspects with an orb of 0 are not searched (see `_Targets`), so they do
+    not count as the narrowest orb.
+
+    Args:
+        planet_id (int): Swiss Ephemeris planet id.
+        table (AspectTable): Aspects and orbs.
+        julday_step (float, optional): Largest step, in days.
+
+    Returns:
+        float: `julday_step` divided by a whole number, so every planet's
+        samples fall on the grid of the slower ones.
+    """
+    max_speed = MAX_SPEED.get(planet_id)
+    orbs = table.orbs[table.orbs > 0]
+    if max_speed is None or orbs.size == 0:
+        return julday_step
+    return julday_step / max(1, int(np.ceil(julday_step * max_speed / orbs.min())))
+
+
+class _Targets:
+    """
+    Aspect targets of the natal points: one column per (natal, aspect, side).
+
+    Aspects with an orb of 0 are left out: an exact aspect to a fixed point
+    lasts an instant, which no sampling step can land on.
+    """
+    __slots__ = ('natal', 'aspect_id', 'side', 'longitude', 'angle', 'orb')
+
+    def __init__(self, natal_ids, natal_longitudes, table):
+        natal_ids = np.asarray(natal_ids, dtype=np.int64)
+        natal_longitudes = np.asarray(natal_longitudes, dtype=np.float64)
+        # Conjunctions and oppositions have the same target on both sides
+        sides = [(1,) if angle % 180 == 0 else (1, -1) for angle in table.angles.tolist()]
+        aspects = np.flatnonzero(table.orbs > 0).tolist()
+        rows = [
+            (point, aspect, side)
+            for point in range(natal_ids.size) for aspect in aspects for side in sides[aspect]
+        ]
+        point, aspect, side = np.array(rows, dtype=np.int64).reshape(-1, 3).T
+        self.natal = natal_ids[point]
+        self.aspect_id = table.ids[aspect]
+        self.side = side
+        self.longitude = natal_longitudes[point]
+        self.angle = table.angles[aspect]
+        self.orb = table.orbs[aspect]
+
+    def offsets(self, longitudes, columns):
+        """h for longitudes shaped (time,) against some target columns, shaped (time, column)."""
+        return _wrap(_wrap(longitudes[:, None] - self.longitude[columns]) - self.side[columns] * self.angle[columns])
+
+
+def _chunk_runs(targets, julday_start, chunk_start, chunk_end, steps, resume, flags):
+    """
+    In-orb runs within one chunk, keyed by KEYS.
+
+    Sample times are stored as indices on each planet's own grid (counted from
+    `julday_start`), so runs of every planet merge with a gap of one sample.
+    `resume` (planet id -> earliest Julian day it can be within any orb) is
+    updated for the planets looked at, and planets that cannot be within
+    orb before the chunk ends are not sampled.
+    """
+    events = []
+    by_step = {}
+    for planet_id, step in steps.items():
+        if resume[planet_id] > chunk_end:
+            continue
+        columns = np.arange(targets.natal.size)
+        if columns.size == 0:
+            resume[planet_id] = np.inf
+            continue
+        longitude, _ = _lon_speed(chunk_start, planet_id, flags)
+        distance = np.abs(targets.offsets(np.array([longitude]), columns)[0]) - targets.orb
+        days = reach_days(distance, MAX_SPEED.get(planet_id, np.inf))
+        resume[planet_id] = chunk_start + days.min()
+        columns = columns[chunk_start + days <= chunk_end]
+        if columns.size:
+            by_step.setdefault(step, []).append((planet_id, columns))
+
+    for step, planets in by_step.items():
+        positions = query_positions(chunk_start, chunk_end, step, [planet_id for planet_id, _ in planets], flags)
+        samples = np.rint((positions.jd - julday_start) / step).astype(np.int64)
+        for index, (planet_id, columns) in enumerate(planets):
+            offsets = targets.offsets(positions.longitude[:, index], columns)
+            time_index, column = np.nonzero(np.abs(offsets) <= targets.orb[columns])
+            column = columns[column]
+            events.append(pd.DataFrame({
+                'transit': planet_id,
+                'natal': targets.natal[column],
+                'aspect_id': targets.aspect_id[column],
+                'side': targets.side[column],
+                'sample': samples[time_index],
+            }))
+    if not events:
+        events = [pd.DataFrame({column: np.empty(0, dtype=np.int64) for column in KEYS + ['sample']})]
+    return events_to_intervals(pd.concat(events, ignore_index=True), KEYS, 'sample', 1)
+
+
+def refine_transits(runs, targets, julday_start, steps, flags=DEFAULT_FLAGS):
+    """
+    Exact entry, exact and exit times of sampled in-orb runs.
+
+    Args:
+        runs (pd.DataFrame): KEYS plus 'first' and 'last' sample indices.
+        targets (_Targets): Aspect targets of the natal points.
+        julday_start (float): Julian day of sample 0.
+        steps (dict): Planet id -> sampling step in days.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Returns:
+        pd.DataFrame: KEYS plus 'entry', 'exit', 'exact' (list of Julian
+        days) and 'retrograde' (list of bools, one per exact time).
+    """
+    column_of = {
+        key: column for column, key in enumerate(zip(
+            targets.natal.tolist(), targets.aspect_id.tolist(), targets.side.tolist()
+        ))
+    }
+    entries, exits, exacts, retrogrades = [], [], [], []
+    for planet_id, natal, aspect_id, side, first, last in zip(
+        *(runs[column].tolist() for column in KEYS + ['first', 'last'])
+    ):
+        step = steps[planet_id]
+        column = column_of[natal, aspect_id, side]
+        geometry = TransitGeometry(
+            planet_id, targets.longitude[column], targets.angle[column], targets.orb[column], side, flags
+        )
+        first = julday_start + first * step
+        last = julday_start + last * step
+        # A run already in orb one step outside is cut by the end of the range
+        before, after = first - step, last + step
+        entry = first if geometry.within(before) else orb_boundary(geometry, before, first)
+        exit = last if geometry.within(after) else orb_boundary(geometry, after, last)
+        exact = [
+            t for t in exact_times(geometry, np.concatenate([[before], julday_range(first, last, step), [after]]))
+            if entry <= t <= exit
+        ]
+        entries.append(entry)
+        exits.append(exit)
+        exacts.append(exact)
+        retrogrades.append([geometry.offset(t)[1] < 0 for t in exact])
+    return runs[KEYS].assign(entry=entries, exit=exits, exact=exacts, retrograde=retrogrades)
+
+
+def transit_events(natal_ids, natal_longitudes, julday_start, julday_end, planet_ids, table,
+                   julday_step=1.0, chunk_days=DEFAULT_CHUNK_DAYS, flags=DEFAULT_FLAGS):
+    """
+    Search a date range for transits to natal points, yielding them as they end.
+
+    Args:
+        natal_ids (array-like): Ids of the natal points (e.g. NatalChart.planet_ids).
+        natal_longitudes (array-like): Their longitudes in degrees.
+        julday_start (float): The starting Julian day.
+        julday_end (float): The ending Julian day.
+        planet_ids (iterable of int): Transiting planet ids.
+        table (AspectTable): Aspect angles and orbs.
+        julday_step (float, optional): Sampling step of the planets slow
+            enough for it, in days; faster ones are sampled more often.
+        chunk_days (int, optional): Days per chunk, a multiple of `julday_step`.
+        flags (int, optional): Swiss Ephemeris calculation flags.
+
+    Yields:
+        tuple: (progress, events) after every chunk, where progress is the
+        scanned fraction of the range and events is a DataFrame of the
+        transits that ended in this chunk, sorted by entry, with columns
+        transit, natal, aspect_id, side, entry, exit, exact (list of Julian
+        days) and retrograde (list of bools, one per exact time).
+    """
+    targets = _Targets(natal_ids, natal_longitudes, table)
+    steps = {int(planet_id): sampling_step(int(planet_id), table, julday_step) for planet_id in planet_ids}
+    resume = dict.fromkeys(steps, julday_start)
+    total = julday_end - julday_start
+    open_runs = None
+
+    chunk = 0
+    while True:
+        chunk_start = julday_start + chunk * chunk_days
+        if chunk_start > julday_end + 1e-9:
+            break
+        is_last_chunk = chunk_start + chunk_days > julday_end + 1e-9
+        chunk_end = julday_end if is_last_chunk else chunk_start + chunk_days - min(steps.values(), default=julday_step)
+        runs = _chunk_runs(targets, julday_start, chunk_start, chunk_end, steps, resume, flags)
+        # Extend runs carried over from the previous chunk with their continuation
+        if open_runs is not None and not open_runs.empty:
+            runs = build_intervals(pd.concat([open_runs, runs], ignore_index=True), KEYS, 1.5)
+
+        if is_last_chunk:
+            still_open = np.zeros(len(runs), dtype=bool)
+        else:
+            # Last sample index of the chunk on each planet's grid
+            step = runs['transit'].map(steps).to_numpy(dtype=float)
+            last_sample = np.rint((chunk_start + chunk_days - step - julday_start) / step)
+            still_open = runs['last'].to_numpy(dtype=float) >= last_sample
+        open_runs = runs[still_open].reset_index(drop=True)
+        events = refine_transits(runs[~still_open], targets, julday_start, steps, flags)
+        events = events.sort_values('entry', ignore_index=True)
+
+        progress = 1.0 if is_last_chunk or total <= 0 else (chunk_end - julday_start) / total
+        yield progress, events
+        if is_last_chunk:
+            break
+        chunk += 1
+        if open_runs.empty and resume:
+            # Jump to the chunk in which the first planet can be within orb
+            # again, at most to the last one so the search still finishes
+            last_chunk = int((julday_end - julday_start) // chunk_days)
+            next_start = min(resume.values())
+            if np.isfinite(next_start):
+                last_chunk = min(last_chunk, int((next_start - julday_start) // chunk_days))
+            chunk = max(chunk, last_chunk)
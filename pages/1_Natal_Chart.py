@@ -1,7 +1,11 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
-import swisseph as swe
-from utils import initialize_session, sign_string, find_aspect, birth_data, find_house, calculate_sign
+from core.aspects import NO_ASPECT
+from core.chart import natal_chart
+from core.houses import HOUSE_SYSTEMS
+from core.signs import format_dms
+from utils import initialize_session, birth_data, reference_data
 
 initialize_session()
 
@@ -10,8 +14,19 @@ st.title('Natal Chart Calculator')
 
 birth_data()
 
+# House system of the chart, and the systems shown side by side
+system_codes = {name: hsys for hsys, name in HOUSE_SYSTEMS.items()}
+house_col, compare_col = st.columns([1, 2])
+house_system = house_col.selectbox(label='House System', options=list(system_codes))
+compared_systems = compare_col.multiselect(
+    label='Compare House Systems', options=list(system_codes), default=list(system_codes)
+)
+
 # Chart display logic
 if st.button('Show Chart'):
+    if st.session_state.get('bday_julday_utc') is None:
+        st.warning('Enter the birth data first')
+        st.stop()
     st.header(f'{st.session_state.first_name} {st.session_state.last_name}\'s Natal Chart')
 
     # Convert latitude and longitude to decimal format
@@ -20,38 +35,13 @@ if st.button('Show Chart'):
     latitude_decimal = (st.session_state.bday_latitude_deg + st.session_state.bday_latitude_min / 60) * (-1 if latitude_direction == 'S' else 1)
     longitude_decimal = (st.session_state.bday_longitude_deg + st.session_state.bday_longitude_min / 60) * (-1 if longitude_direction == 'W' else 1)
 
-    # Create a list to store data and convert it to a DataFrame later
-    data_list = []
-
-    # Calculate houses and add the data to the list
-    house_system = b'P'  # Placidus system
-    house_cusps, ascmc = swe.houses(st.session_state.bday_julday_utc, latitude_decimal, longitude_decimal, house_system)
-
-    for i, cusp in enumerate(house_cusps):
-        data_list.append({
-            'Name': None, 'Type': 'House', 'House': i + 1, 'Lon': cusp, 'Symbol': None, 'Direction': None, 'Weight': 3 if i == 0 or i == 9 else 0
-        })
-
-    # Calculate planet positions and add the data to the list
-    for id, planet in st.session_state.planets.items():
-        lon, lat, dist, lon_speed, lat_speed, dist_speed = swe.calc_ut(st.session_state.bday_julday_utc, id)[0]
-        retrograde_status = '℞' if lon_speed < 0 else ""
-        data_list.append({
-            'Name': planet['name'],
-            'Type': 'Planet',
-            'House': find_house(st.session_state.bday_julday_utc, id, latitude_decimal, longitude_decimal),
-            'Lon': lon,
-            'Symbol': planet['symbol'],
-            'Direction': retrograde_status,
-            'Weight': 3 if id <= 1 else 2 if id <= 5 else 1
-        })
-
-    # Create the DataFrame all at once from the list of dictionaries
-    data = pd.DataFrame(data_list)
-
-    # Add Sign and Longitude columns
-    data['Sign'] = data['Lon'].apply(calculate_sign)
-    data['Longitude'] = data['Lon'].apply(sign_string)
+    # Compute the chart in the headless core, then only display it here
+    reference = reference_data()
+    chart = natal_chart(
+        st.session_state.bday_julday_utc, latitude_decimal, longitude_decimal, reference.planets.keys(),
+        hsys=system_codes[house_system]
+    )
+    data = chart.frame(reference)
 
     # Split the DataFrame into two: planets and houses
     planets_df = data[data['Type'] == 'Planet']
@@ -65,28 +55,39 @@ if st.button('Show Chart'):
     houses_col.subheader('House Cusps')
     houses_col.dataframe(houses_df[['House', 'Longitude']], hide_index=True, height=450)
 
-    # Calculate aspects
+    # All compared systems share one sidereal time, obliquity and planet positions
+    if compared_systems:
+        comparison = chart.house_systems([system_codes[name] for name in compared_systems])
+        symbols = reference.sign_table().symbols
+        planet_labels = [f"{planet['symbol']} {planet['name']}" for planet in (reference.planets[pid] for pid in chart.planet_ids)]
+        positions_col, cusps_col = st.columns(2)
+        positions_col.subheader('Houses by System')
+        positions_col.dataframe(pd.DataFrame(
+            {name: comparison[system_codes[name]][0] for name in compared_systems}, index=planet_labels
+        ))
+        cusps_col.subheader('Cusps by System')
+        cusps_col.dataframe(pd.DataFrame(
+            {name: format_dms(comparison[system_codes[name]][1], symbols) for name in compared_systems},
+            index=pd.Index(np.arange(1, 13), name='House')
+        ))
+
+    # Calculate aspects for every pair of planets at once
     planetary_symbols = planets_df['Symbol'].tolist()
-    planetary_aspect_matrix = pd.DataFrame('', index=planetary_symbols, columns=planetary_symbols)
+    aspect_ids, _ = chart.aspects(reference.aspect_table())
+    aspect_symbols = {aspect_id: aspect['symbol'] for aspect_id, aspect in reference.aspects.items()}
+    aspect_symbols[NO_ASPECT] = ''
 
-    for i, lon1 in enumerate(planets_df['Lon']):
-        for j in range(i + 1, len(planets_df)):
-            lon2 = planets_df.iloc[j]['Lon']
-            aspect = find_aspect(lon1, lon2)
-            if aspect:
-                planetary_aspect_matrix.iloc[j, i] = st.session_state.aspects[aspect]['symbol']
+    # Keep the lower triangle only, each pair is shown once
+    symbols = np.vectorize(aspect_symbols.get, otypes=[object])(aspect_ids)
+    symbols[np.triu_indices_from(symbols)] = ''
+    planetary_aspect_matrix = pd.DataFrame(symbols, index=planetary_symbols, columns=planetary_symbols)
 
     # Display the aspect matrix
     st.subheader('Aspects Matrix')
     st.dataframe(planetary_aspect_matrix)
 
-    # Calculate the distribution of elements and modalities in a vectorized manner
-    data['Element'] = pd.Categorical(data['Sign'].apply(lambda x: st.session_state.signs[x]['element']), categories=['Fire', 'Earth', 'Air', 'Water'], ordered=True)
-    data['Modality'] = pd.Categorical(data['Sign'].apply(lambda x: st.session_state.signs[x]['modality']), categories=['Cardinal', 'Fixed', 'Mutable'], ordered=True)
-
-    total_weight = data['Weight'].sum()
-    elements_df = data.groupby('Element', observed=False)['Weight'].sum() / total_weight * 100
-    modalities_df = data.groupby('Modality', observed=False)['Weight'].sum() / total_weight * 100
+    # Weighted distribution of elements and modalities
+    elements_df, modalities_df = chart.distribution(reference)
 
     # Display element and modality bar charts
     el, mod = st.columns(2)
@@ -1,8 +1,10 @@
 import streamlit as st
 import swisseph as swe
 import datetime as dt
-from utils import initialize_session, datetime_to_julday, calculate_sign, birth_data, find_house
 import pandas as pd
+from core.regions import cell_regions, grid_regions, region_features
+from core.solar import solar_return_maps, solar_returns
+from utils import initialize_session, datetime_to_julday, julday_to_datetime, birth_data
 import pydeck as pdk
 
 # Initialize session state variables
@@ -16,7 +18,7 @@ birth_data()  # Collect birth data input
 # Check if birth date is provided
 if st.session_state.bday_date is not None:
     st.header('Solar Revolution Criteria')
-    col1, col2 = st.columns(2)
+    col1, col2, col3 = st.columns(3)
     
     # Select Solar Revolution Year
     st.session_state.sr_year = col1.number_input(
@@ -26,15 +28,37 @@ if st.session_state.bday_date is not None:
         value=st.session_state.bday_date.year, 
         step=1
     )
+
+    # Number of consecutive returns, starting from that year
+    st.session_state.sr_count = col2.number_input(
+        label='Number of Returns',
+        min_value=1,
+        max_value=30,
+        value=1,
+        step=1
+    )
     
     # Get planet names for selection
     planet_names = ['Ascendant'] + [planet['name'] for planet in st.session_state.planets.values()]
     
     # Select view (planet or Ascendant)
-    st.session_state.sr_view = col2.selectbox(label='View', options=planet_names)
+    st.session_state.sr_view = col3.selectbox(label='View', options=planet_names)
+
+    # Select the map resolution: a uniform 1° grid or cells refined along the boundaries
+    col1, col2 = st.columns(2)
+    st.session_state.sr_grid = col1.radio(label='Grid', options=['Uniform', 'Adaptive'], horizontal=True)
+    st.session_state.sr_min_cell = col2.select_slider(
+        label='Boundary Resolution (arcminutes)',
+        options=[1, 2, 5, 10, 30],
+        value=10,
+        disabled=st.session_state.sr_grid != 'Adaptive'
+    )
 
 # Run button to execute calculations
 if st.button(label='Run'):
+    if st.session_state.get('bday_julday_utc') is None:
+        st.warning('Enter the birth data first')
+        st.stop()
     # Use the pre-calculated Julian Day from birth data (in UTC)
     birth_julian_day = st.session_state.bday_julday_utc
     
@@ -45,48 +69,64 @@ if st.button(label='Run'):
     year_start_datetime = dt.datetime(st.session_state.sr_year, 1, 1)
     year_start_julian_day = datetime_to_julday(year_start_datetime)
     
-    # Calculate the Julian Day of the Solar Revolution
-    solar_cross_julian_day = swe.solcross(sun_longitude, year_start_julian_day)
+    # Calculate the Julian Days of the Solar Revolutions, each searched from the previous one
+    solar_cross_julian_days = solar_returns(sun_longitude, year_start_julian_day, st.session_state.sr_count)
     
+    planet_id = None
     if st.session_state.sr_view == 'Ascendant':
-        # Calculate Ascendant for a range of coordinates and store results
-        results = [
-            {
-                'latitude': lat,
-                'longitude': lon,
-                'number': calculate_sign(swe.houses(solar_cross_julian_day, lat, lon)[0][0]),
-                'rgb_color': tuple(st.session_state.signs[calculate_sign(swe.houses(solar_cross_julian_day, lat, lon)[0][0])]['rgb_color']),
-                'caption': st.session_state.signs[calculate_sign(swe.houses(solar_cross_julian_day, lat, lon)[0][0])]['name']
-            }
-            for lat in range(-66, 67)
-            for lon in range(-180, 179)
-        ]
+        # Sign of the Ascendant at each point
+        colors = {number: tuple(sign['rgb_color']) for number, sign in st.session_state.signs.items()}
+        captions = {number: sign['name'] for number, sign in st.session_state.signs.items()}
     else:
-        results = []
-        planet_id = None
         for pid, planet in st.session_state.planets.items():
             if planet['name'] == st.session_state.sr_view:
                 planet_id = pid
                 break
-        for lat in range(-66, 67):
-            for lon in range(-180, 180):
-                number = find_house(solar_cross_julian_day, pid, lat, lon)
-                results.append({
-                    'latitude': lat,
-                    'longitude': lon,
-                    'number': number,
-                    'rgb_color': tuple(st.session_state.signs[number-1]['rgb_color']),
-                    'caption': st.session_state.houses[number]['name']
-                })
-
-    results_df = pd.DataFrame(results)
-
-    # Render the map with Pydeck
+        # House of the planet at each point
+        colors = {number: tuple(st.session_state.signs[number - 1]['rgb_color']) for number in st.session_state.houses}
+        captions = {number: house['name'] for number, house in st.session_state.houses.items()}
+
+    # Uniform 1° grid, or cells refined only where neighbouring points disagree;
+    # maps are shared through a process-wide cache, so repeated requests are instant
+    min_size = st.session_state.sr_min_cell / 60 if st.session_state.sr_grid == 'Adaptive' else None
+    sr_maps = solar_return_maps(solar_cross_julian_days, planet_id, min_size)
+
+    # One feature per sign/house region instead of one point per grid cell, for every
+    # year; kept in the session so the map survives reruns and page changes
+    sr_years = [st.session_state.sr_year + index for index in range(len(sr_maps))]
+    st.session_state.sr_result = {
+        'view': st.session_state.sr_view,
+        'returns': pd.DataFrame({
+            'Year': sr_years,
+            'Solar Return (UTC)': [julday_to_datetime(jd) for jd in solar_cross_julian_days],
+            'Julian Day': solar_cross_julian_days,
+        }),
+        'geojson': {
+            year: region_features(
+                cell_regions(sr_map) if min_size else grid_regions(sr_map),
+                lambda number: {'caption': captions[number], 'rgb_color': list(colors[number])}
+            ) for year, sr_map in zip(sr_years, sr_maps)
+        },
+    }
+
+# Render the map with Pydeck
+if st.session_state.get('sr_result') is not None:
+    sr_view = st.session_state.sr_result['view']
+    sr_returns = st.session_state.sr_result['returns']
+    st.dataframe(sr_returns, hide_index=True)
+
     @st.fragment
     def map_render():        
+        # Switch between the precomputed maps of each year
+        if len(sr_returns) > 1:
+            sr_map_year = st.select_slider(label='Year', options=sr_returns['Year'].tolist())
+        else:
+            sr_map_year = sr_returns['Year'].iloc[0]
+        results_geojson = st.session_state.sr_result['geojson'][sr_map_year]
+
         # Set filter criteria based on the view selected
         col1, col2 = st.columns(2)
-        if st.session_state.sr_view == 'Ascendant':
+        if sr_view == 'Ascendant':
             sign_options = ['All'] + [sign['name'] for sign in st.session_state.signs.values()]
             st.session_state.sr_filter = col1.selectbox(
                 label='Sign Filter', 
@@ -98,28 +138,25 @@ if st.button(label='Run'):
                 options=['All houses'] + [house['name'] for house in st.session_state.houses.values()]
             )
 
-        # Apply the sign filter if the view is 'Ascendant'
-        if st.session_state.sr_view == 'Ascendant' and st.session_state.sr_filter != 'All':
-            filtered_df = results_df[results_df['caption'] == st.session_state.sr_filter]
-        elif st.session_state.sr_view != 'Ascendant' and st.session_state.sr_filter != 'All houses':
-            filtered_df = results_df[results_df['caption'] == st.session_state.sr_filter]
+        # Apply the filter as a property filter on the region features
+        if st.session_state.sr_filter in ('All', 'All houses'):
+            features = results_geojson['features']  # No filtering or "All" selected
         else:
-            filtered_df = results_df  # No filtering or "All" selected
-
-        # Sort the DataFrame by 'number' to maintain natural order of signs
-        results_df_sorted = filtered_df[['number', 'caption', 'rgb_color']].drop_duplicates().sort_values(by='number')
+            features = [
+                feature for feature in results_geojson['features']
+                if feature['properties']['caption'] == st.session_state.sr_filter
+            ]
 
         # Initialize the layer variable here to avoid UnboundLocalError
         layer = None
 
-        # Create a Pydeck layer for the map using the filtered DataFrame
-        if not filtered_df.empty:  # Ensure that there is data to plot
+        # Create a Pydeck layer for the map using the filtered regions
+        if features:  # Ensure that there is data to plot
             layer = pdk.Layer(
-                'ScatterplotLayer',
-                data=filtered_df,
-                get_position='[longitude, latitude]',
-                get_fill_color='[rgb_color[0], rgb_color[1], rgb_color[2], 120]',  # RGBA with transparency
-                get_radius=30000,
+                'GeoJsonLayer',
+                data={'type': 'FeatureCollection', 'features': features},
+                get_fill_color='[properties.rgb_color[0], properties.rgb_color[1], properties.rgb_color[2], 120]',  # RGBA with transparency
+                stroked=False,
                 pickable=True
             )
 
@@ -139,14 +176,13 @@ if st.button(label='Run'):
         else:
             st.write("No data available to plot.")
 
-        # Create a legend using the sorted DataFrame
-        unique_signs = results_df_sorted.to_dict(orient='records')
+        # Create a legend from the features, already sorted by number
         cols = st.columns(4)
 
         # Distribute 12 items across 4 columns
-        for idx, sign_data in enumerate(unique_signs):
-            color = sign_data['rgb_color']
-            caption = sign_data['caption']
+        for idx, feature in enumerate(results_geojson['features']):
+            color = feature['properties']['rgb_color']
+            caption = feature['properties']['caption']
             col_idx = idx % 4
             cols[col_idx].markdown(
                 f'<span style="display: inline-block; width: 16px; height: 16px; background-color: rgb({color[0]}, {color[1]}, {color[2]}); margin-right: 8px;"></span> {caption}', 
@@ -0,0 +1,79 @@
+import streamlit as st
+import pandas as pd
+from core.chart import natal_chart
+from core.transits import transit_events
+from utils import (aspect_table, birth_data, datetime_to_julday, initialize_session, julday_to_datetime,
+                   reference_data, start_end_date)
+
+def format_exact(exact, retrograde):
+    # One entry per pass over the exact aspect, retrograde passes marked with ℞
+    return ', '.join(
+        julday_to_datetime(julday).strftime('%Y-%m-%d %H:%M') + (' ℞' if is_retrograde else '')
+        for julday, is_retrograde in zip(exact, retrograde)
+    )
+
+def format_events(events, reference):
+    # Convert the transits found into a display table, column by column
+    planet_names = {planet_id: f"{planet['symbol']} {planet['name']}" for planet_id, planet in reference.planets.items()}
+    aspect_names = {aspect_id: f"{aspect['symbol']} {aspect['name']}" for aspect_id, aspect in reference.aspects.items()}
+    return pd.DataFrame({
+        'Entry': events['entry'].map(julday_to_datetime),
+        'Exit': events['exit'].map(julday_to_datetime),
+        'Transit': events['transit'].map(planet_names),
+        'Aspect': events['aspect_id'].map(aspect_names),
+        'Natal': events['natal'].map(planet_names),
+        'Exact': [format_exact(*values) for values in zip(events['exact'], events['retrograde'])],
+        'Passes': events['exact'].map(len),
+    })
+
+initialize_session()
+
+# Page title and input section
+st.title('Transits Finder')
+st.header('Birth Data')
+birth_data()
+
+st.header('Search Criteria')
+start_end_date()
+planet_names = {planet['name']: planet_id for planet_id, planet in st.session_state.planets.items()}
+transiting = st.multiselect(label='Transiting Planets', options=list(planet_names), default=list(planet_names))
+
+if st.button('Find Transits'):
+    start_date = st.session_state.start_date
+    end_date = st.session_state.end_date
+    if st.session_state.get('bday_julday_utc') is None:
+        st.warning('Enter the birth data first')
+    elif end_date <= start_date:
+        st.warning('End Date must be higher than Start Date')
+    elif not transiting:
+        st.warning('Select at least one transiting planet')
+    else:
+        # Natal positions come from the same chart as the Natal Chart page
+        latitude_direction = st.session_state.bday_latitude_direction
+        longitude_direction = st.session_state.bday_longitude_direction
+        latitude_decimal = (st.session_state.bday_latitude_deg + st.session_state.bday_latitude_min / 60) * (-1 if latitude_direction == 'S' else 1)
+        longitude_decimal = (st.session_state.bday_longitude_deg + st.session_state.bday_longitude_min / 60) * (-1 if longitude_direction == 'W' else 1)
+        reference = reference_data()
+        chart = natal_chart(st.session_state.bday_julday_utc, latitude_decimal, longitude_decimal, reference.planets.keys())
+
+        # Transits are yielded as they end, so partial results appear while the search runs
+        progress_bar = st.progress(0.0, text='Searching...')
+        st.subheader('Transits Found')
+        results_placeholder = st.empty()
+        found = []
+
+        search = transit_events(
+            chart.planet_ids, chart.longitudes, datetime_to_julday(start_date), datetime_to_julday(end_date),
+            [planet_names[name] for name in transiting], aspect_table()
+        )
+        for progress, events in search:
+            found.append(format_events(events, reference))
+
+            progress_bar.progress(progress, text=f'Searching... {progress:.0%}')
+            transits = pd.concat(found).sort_values('Entry', ignore_index=True)
+            if not transits.empty:
+                results_placeholder.dataframe(transits, hide_index=True)
+
+        progress_bar.empty()
+        if transits.empty:
+            results_placeholder.write('No transits found.')
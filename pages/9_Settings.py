@@ -1,50 +1,60 @@
+import os
 import streamlit as st
-import datetime
-import swisseph as swe
-import pandas as pd
+from core.reference import load_reference
+from core.solar import MAP_CACHE, MAP_CACHE_ADMIN
 from utils import initialize_session
 
 # Inicializar o session_state e carregar dados necessários
 initialize_session()
 
-# Calcular o Julian Day para a data inicial e final
-julday_start = swe.julday(st.session_state.start_date.year, st.session_state.start_date.month, st.session_state.start_date.day, 0.0)
-julday_end = swe.julday(st.session_state.end_date.year, st.session_state.end_date.month, st.session_state.end_date.day, 0.0)
-
-# Calcular o step dinâmico
-julday_step = (julday_end - julday_start) / 500
-
-# Entrada dos orbes para cada aspecto
+# Entrada dos orbes para cada aspecto; só os orbes ficam na sessão, o resto é compartilhado
 st.subheader('Orbs')
-for aspect_id, aspect in st.session_state.aspects.items():
+for aspect_id, aspect in load_reference().aspects.items():
     title_col, orb_col, deg_col = st.columns(3)
     title_col.write(aspect['name'])
-    st.session_state.aspects[aspect_id]['orb']=orb_col.number_input(
+    st.session_state.orbs[aspect_id]=orb_col.number_input(
         label=f'{aspect["name"]}_orb', 
         min_value=0, 
         max_value=15, 
-        value=st.session_state.aspects[aspect_id]['orb'],
+        value=st.session_state.orbs[aspect_id],
         step=1, 
         key=f'{aspect["name"]}_orb',
         label_visibility='collapsed'
     )
     deg_col.write('degrees')
 
-# Função para calcular posições dos planetas com step dinâmico
-def calculate_planet_positions(julday_start, julday_end, julday_step):
-    data = []
-    julday = julday_start
-    while julday <= julday_end:
-        for planet_id, planet in st.session_state.planets.items():
-            lon = swe.calc_ut(julday, planet_id)[0][0]
-            data.append({
-                'julday': julday,
-                'planet_id': planet_id,
-                'longitude': lon,
-            })
-        julday += julday_step
-    return pd.DataFrame(data)
+# Número de processos usados nas buscas em intervalos longos
+st.subheader('Performance')
+title_col, workers_col, unit_col = st.columns(3)
+title_col.write('Scan workers')
+st.session_state.scan_workers = workers_col.number_input(
+    label='scan_workers',
+    min_value=1,
+    max_value=max(os.cpu_count() or 1, st.session_state.scan_workers),
+    value=st.session_state.scan_workers,
+    step=1,
+    key='scan_workers_input',
+    label_visibility='collapsed'
+)
+unit_col.write('processes (1 = serial)')
+
+# Mapas de Revolução Solar guardados em memória, compartilhados entre sessões;
+# só um administrador (SOLAR_CACHE_ADMIN=1) pode limpar o cache de todos
+cache_stats = MAP_CACHE.stats()
+title_col, stats_col, clear_col = st.columns(3)
+title_col.write('Solar map cache')
+disk_usage = (
+    f"{cache_stats['disk_entries']} on disk, {cache_stats['disk_bytes'] / 2**20:.1f} of {cache_stats['max_disk_bytes'] / 2**20:.0f} MB; "
+    if MAP_CACHE.directory else ''
+)
+stats_col.write(
+    f"{cache_stats['entries']} maps, {cache_stats['nbytes'] / 2**20:.1f} of {cache_stats['max_bytes'] / 2**20:.0f} MB; "
+    f"{disk_usage}{cache_stats['hits'] + cache_stats['disk_hits']} hits, {cache_stats['misses']} misses"
+)
+if MAP_CACHE_ADMIN and clear_col.button('Clear cache'):
+    MAP_CACHE.clear()
+    st.rerun()
 
-# Botão para salvar informações e calcular posições planetárias
-if st.button('Save settings'):    
+# Botão para salvar informações
+if st.button('Save settings'):
     st.info('Settings saved.', icon="🖋️")
\ No newline at end of file
@@ -0,0 +1,40 @@
+import unittest
+
+import numpy as np
+
+from core.aspects import NO_ASPECT, find_aspects
+from core.reference import load_reference
+from core.transits import transit_events
+
+QUINCUNX = 5
+
+
+class QuincunxTest(unittest.TestCase):
+    """Quincunx is a regular aspect: the chart and the transit search report it, not only the Yod."""
+
+    def setUp(self):
+        self.reference = load_reference()
+        self.table = self.reference.aspect_table()
+
+    def test_reference_data(self):
+        aspect = self.reference.aspects[QUINCUNX]
+        self.assertEqual((aspect['name'], aspect['angle'], aspect['orb']), ('Quincunx', 150, 3))
+        self.assertIn(QUINCUNX, self.reference.orbs())
+
+    def test_natal_aspects(self):
+        aspect_ids, orbs = find_aspects([10.0, 161.0, 10.0 + 120.0 + 7.0, 10.0 + 180.0 - 8.0], self.table)
+        self.assertEqual(aspect_ids[0, 1], QUINCUNX)
+        self.assertAlmostEqual(orbs[0, 1], 1.0)
+        # Quincunx orbs do not overlap the trine's or the opposition's
+        self.assertEqual(aspect_ids[0, 2], 2)
+        self.assertEqual(aspect_ids[0, 3], 1)
+        self.assertEqual(find_aspects([0.0, 154.0], self.table)[0][0, 1], NO_ASPECT)
+
+    def test_transits(self):
+        search = transit_events([0], [0.0], 2451545.0, 2451545.0 + 365, [0], self.table)
+        aspect_ids = np.concatenate([events['aspect_id'].to_numpy() for _, events in search])
+        self.assertIn(QUINCUNX, aspect_ids)
+
+
+if __name__ == '__main__':
+    unittest.main()
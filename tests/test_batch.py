@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+import swisseph as swe
+
+from core.batch import ChartWriter, chart_records, compute_charts
+from core.reference import load_reference
+
+
+class PolarRecordTest(unittest.TestCase):
+    """Records beyond the polar circles are charted, not aborting the batch."""
+
+    def setUp(self):
+        self.reference = load_reference()
+
+    def test_polar_row(self):
+        records = pd.DataFrame({
+            'date': ['1990-06-01', '1990-06-01'], 'time': ['12:00', '12:00'],
+            'latitude': ['69.65', '38.72'], 'longitude': ['18.96', '-9.14'],
+            'timezone': ['Europe/Oslo', 'Europe/Lisbon'],
+        })
+        for systems in ((b'P',), (b'W', b'E')):
+            output = chart_records(records, self.reference, systems)
+            self.assertEqual(output['error'].tolist(), ['', ''])
+            self.assertFalse(output[['asc_lon', 'mc_lon']].isna().any().any())
+
+    def test_angles_match_swe_houses(self):
+        rng = np.random.default_rng(0)
+        julday = 2451545.0 + rng.uniform(-20000, 20000, 50)
+        latitudes = rng.uniform(-66, 66, 50)
+        longitudes = rng.uniform(-180, 180, 50)
+        charts = compute_charts(julday, latitudes, longitudes, self.reference)
+        expected = np.array([swe.houses(*values, b'P')[1][:2] for values in zip(julday, latitudes, longitudes)])
+        difference = (charts[['asc_lon', 'mc_lon']].to_numpy() - expected + 180) % 360 - 180
+        self.assertLess(np.abs(difference).max(), 1e-8)
+
+
+
+class ChartWriterTest(unittest.TestCase):
+
+    def test_first_chunk_failed(self):
+        reference = load_reference()
+        records = pd.DataFrame({
+            'date': ['not a date', '2000-01-01'], 'time': ['12:00', '12:00'], 'latitude': ['10', '10'],
+            'longitude': ['10', '10'], 'timezone': ['UTC', 'UTC'], 'note': [None, 'x'],
+        })
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'charts.parquet')
+            with ChartWriter(path) as writer:
+                writer.write(chart_records(records.iloc[:1], reference))
+                writer.write(chart_records(records.iloc[1:], reference))
+            output = pd.read_parquet(path)
+        self.assertEqual(output['error'].tolist(), ['invalid date or time', ''])
+        self.assertTrue(output['sun_sign'].isna()[0])
+        self.assertEqual(output['sun_sign'][1], 'Capricorn')
+        self.assertEqual(output['note'][1], 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+import numpy as np
+import swisseph as swe
+
+from core.houses import ecliptic_to_equatorial, house_position, sidereal_context
+
+ANALYTIC_SYSTEMS = (b'P', b'W', b'E', b'R', b'C')
+# swe.house_pos adds one milliarcsecond to keep bodies off the cusps
+SWE_OFFSET = 1 / 3600000 / 30
+
+
+class HousePositionTest(unittest.TestCase):
+    """The analytic house positions agree with swe.house_pos."""
+
+    def test_matches_swe_house_pos(self):
+        rng = np.random.default_rng(0)
+        count = 200
+        julday = 2451545.0 + rng.uniform(-30000, 30000, count)
+        latitudes = rng.uniform(-66, 66, count)
+        longitudes = rng.uniform(-180, 180, count)
+        planet_ids = rng.integers(0, 10, count)
+
+        context = np.array([sidereal_context(jd) for jd in julday.tolist()])
+        armc = (context[:, 0] + longitudes) % 360.0
+        eps = context[:, 1]
+        ecliptic = np.array([swe.calc_ut(jd, int(planet_id))[0][:2] for jd, planet_id in zip(julday, planet_ids)])
+        equatorial = ecliptic_to_equatorial(ecliptic[:, 0], ecliptic[:, 1], eps)
+
+        for hsys in ANALYTIC_SYSTEMS:
+            with self.subTest(hsys=hsys):
+                positions = house_position(hsys, armc, eps, latitudes, (ecliptic[:, 0], ecliptic[:, 1]), equatorial)
+                expected = np.array([
+                    swe.house_pos(*values, (lon, lat), hsys)
+                    for values, (lon, lat) in zip(zip(armc, latitudes, eps), ecliptic.tolist())
+                ])
+                # Positions wrap from 12.99 to 1.0
+                difference = (positions - expected + 6) % 12 - 6
+                self.assertLess(np.abs(difference).max(), 1e-8)
+                self.assertLess(np.abs(difference + SWE_OFFSET).max(), 1e-10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from core.ephemeris import compute_positions
+from core.patterns import detect_pattern
+from core.pruning import PruningIndex, active_windows
+from core.reference import load_reference
+from core.scan import scan_pattern_periods
+
+JULDAY_START = 2451545.0
+JULDAY_END = JULDAY_START + 10 * 365.25
+PATTERNS = ('Grand Trine', 'Yod', 'T-Square')
+
+
+class PruningTest(unittest.TestCase):
+    """Pruning skips only samples at which a pattern cannot hold."""
+
+    @classmethod
+    def setUpClass(cls):
+        reference = load_reference()
+        cls.table = reference.aspect_table()
+        cls.planet_ids = list(reference.planets)
+        cls.patterns = [pattern for pattern in reference.patterns.values() if pattern.name in PATTERNS]
+        cls.positions = compute_positions(np.arange(JULDAY_START, JULDAY_END + 0.5, 1.0), cls.planet_ids)
+
+    def scan(self, pattern, prune):
+        periods = pd.concat([
+            periods for _, periods in scan_pattern_periods(
+                JULDAY_START, JULDAY_END, 1.0, self.planet_ids, self.table, pattern, prune=prune
+            )
+        ], ignore_index=True)
+        return periods.sort_values(list(periods.columns), ignore_index=True)
+
+    def test_same_periods_with_and_without_pruning(self):
+        for pattern in self.patterns:
+            with self.subTest(pattern=pattern.name):
+                pruned, full = self.scan(pattern, True), self.scan(pattern, False)
+                self.assertFalse(full.empty)
+                pd.testing.assert_frame_equal(pruned, full, check_dtype=False)
+
+    def test_windows_cover_every_match(self):
+        index = PruningIndex(self.planet_ids, self.table)
+        for pattern in self.patterns:
+            with self.subTest(pattern=pattern.name):
+                time_index, _ = detect_pattern(self.positions.longitude, self.table, pattern)
+                windows = np.array(active_windows(
+                    JULDAY_START, JULDAY_END, 1.0, lambda julday: index.pattern_start(julday, pattern)
+                ))
+                matched = np.unique(self.positions.jd[time_index])
+                covered = ((matched[:, None] >= windows[:, 0] - 1e-9) & (matched[:, None] <= windows[:, 1] + 1e-9)).any(axis=1)
+                self.assertTrue(covered.all(), matched[~covered])
+
+
+if __name__ == '__main__':
+    unittest.main()
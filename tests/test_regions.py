@@ -0,0 +1,31 @@
+import unittest
+
+import numpy as np
+
+from core.regions import trace_regions
+
+
+def _area(ring):
+    y, x = ring[:, 0], ring[:, 1]
+    return abs(0.5 * np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y))
+
+
+class NestedRegionsTest(unittest.TestCase):
+
+    def test_hole_goes_to_smallest_outline(self):
+        # A frame around a ring around a single cell, all of value 1: the
+        # ring sits in the frame's hole and has a hole of its own
+        grid = np.zeros((9, 9), dtype=int)
+        grid[0, :] = grid[8, :] = grid[:, 0] = grid[:, 8] = 1
+        grid[2:7, 2:7] = 1
+        grid[3:6, 3:6] = 0
+        grid[4, 4] = 1
+        rows, cols = np.indices(grid.shape)
+        regions = trace_regions(rows.ravel(), cols.ravel(), np.ones(grid.size, dtype=int), grid.ravel(), tolerance=0)
+        polygons = sorted([_area(ring) for ring in polygon] for polygon in regions[1])
+        # Outline first, then its holes
+        self.assertEqual(polygons, [[1.0], [25.0, 9.0], [81.0, 49.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
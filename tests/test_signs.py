@@ -0,0 +1,28 @@
+import unittest
+
+import numpy as np
+
+from core.chart import sign_string
+from core.reference import load_reference
+from core.signs import weighted_shares
+
+
+class SignsTest(unittest.TestCase):
+
+    def test_weighted_shares_zero_weights(self):
+        shares = weighted_shares([[0, 1, 1], [2, 3, 0]], [[0, 0, 0], [1, 1, 2]], 4)
+        np.testing.assert_array_equal(shares, [[0, 0, 0, 0], [50, 0, 25, 25]])
+
+    def test_weighted_shares_no_rows(self):
+        shares = weighted_shares(np.empty((0, 12), dtype=np.int64), np.ones(12), 4)
+        self.assertEqual(shares.shape, (0, 4))
+        self.assertEqual(shares.dtype, np.float64)
+
+    def test_sign_string(self):
+        table = load_reference().sign_table()
+        self.assertEqual(sign_string(45.5, table), f'{table.symbols[1]} 15° 30\' 0"')
+        self.assertEqual(sign_string(359.99999, table), f'{table.symbols[0]} 0° 0\' 0"')
+
+
+if __name__ == '__main__':
+    unittest.main()
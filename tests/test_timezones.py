@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+import unittest
+
+from core.timezones import TimezoneIndex, build_timezone_index
+
+
+def _box(west, south, east, north):
+    return [[west, south], [east, south], [east, north], [west, north], [west, south]]
+
+
+class TimezoneIndexTest(unittest.TestCase):
+    """Lookups in a synthetic index whose boundaries cross the insides of cells."""
+
+    @classmethod
+    def setUpClass(cls):
+        features = [
+            {'type': 'Feature', 'properties': {'tzid': 'Test/West'}, 'geometry': {
+                'type': 'Polygon', 'coordinates': [_box(0, 0, 40.2, 10), _box(29.1, 4.1, 31.1, 6.1)[::-1]],
+            }},
+            {'type': 'Feature', 'properties': {'tzid': 'Test/East'}, 'geometry': {
+                'type': 'MultiPolygon', 'coordinates': [[_box(40.2, 0, 50, 10)], [_box(60, 0, 61, 1)]],
+            }},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'zones.json')
+            path = os.path.join(directory, 'timezones.npz')
+            with open(source, 'w') as file:
+                json.dump({'type': 'FeatureCollection', 'features': features}, file)
+            build_timezone_index(path, source, resolution=0.5)
+            cls.index = TimezoneIndex(path)
+
+    def test_cell_without_edges(self):
+        rows, cols = self.index.cell_zones.shape
+        cell = int((2 + 90) / 0.5) * cols + int((2 + 180) / 0.5)
+        self.assertEqual(self.index.offsets[cell], self.index.offsets[cell + 1])
+        self.assertEqual(self.index.timezone_at(2, 2), 'Test/West')
+
+    def test_both_sides_of_a_boundary_in_one_cell(self):
+        # 40.1 and 40.3 both fall in the cell [40, 40.5], split at 40.2
+        self.assertEqual(self.index.timezone_at(5, 40.1), 'Test/West')
+        self.assertEqual(self.index.timezone_at(5, 40.3), 'Test/East')
+        self.assertEqual(self.index.timezone_at(0.5, 60.5), 'Test/East')
+
+    def test_hole(self):
+        self.assertEqual(self.index.timezone_at(5, 30), 'Etc/GMT-2')
+        # Either side of the hole's edge at 29.1, in the cell [29, 29.5]
+        self.assertEqual(self.index.timezone_at(5, 29.05), 'Test/West')
+        self.assertEqual(self.index.timezone_at(5, 29.15), 'Etc/GMT-2')
+
+    def test_nautical_fallback(self):
+        self.assertEqual(self.index.zone_id(50, 100), -1)
+        self.assertEqual(self.index.timezone_at(50, 100), 'Etc/GMT-7')
+        self.assertEqual(self.index.timezone_at(-20, -75), 'Etc/GMT+5')
+        self.assertEqual(self.index.timezone_at(-20, 0), 'Etc/GMT')
+
+
+if __name__ == '__main__':
+    unittest.main()
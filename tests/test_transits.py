@@ -0,0 +1,29 @@
+import unittest
+
+from core.aspects import AspectTable
+from core.transits import sampling_step, transit_events
+
+
+class ZeroOrbTest(unittest.TestCase):
+    """An orb set to 0 on the Settings page must not break the search."""
+
+    def test_sampling_step_ignores_zero_orb(self):
+        table = AspectTable([0, 1], [0.0, 180.0], [0.0, 8.0])
+        self.assertEqual(sampling_step(1, table), sampling_step(1, AspectTable([1], [180.0], [8.0])))
+
+    def test_zero_orb_aspect_is_not_searched(self):
+        table = AspectTable([0, 1], [0.0, 180.0], [0.0, 8.0])
+        events = [events for _, events in transit_events([0], [100.0], 2451545.0, 2451545.0 + 400, [0], table)]
+        found = sum(len(chunk) for chunk in events)
+        self.assertGreater(found, 0)
+        self.assertTrue(all((chunk['aspect_id'] == 1).all() for chunk in events))
+
+    def test_all_orbs_zero(self):
+        table = AspectTable([0, 1], [0.0, 180.0], [0.0, 0.0])
+        results = list(transit_events([0], [100.0], 2451545.0, 2451545.0 + 400, [0, 1], table))
+        self.assertEqual(results[-1][0], 1.0)
+        self.assertTrue(all(events.empty for _, events in results))
+
+
+if __name__ == '__main__':
+    unittest.main()
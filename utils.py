@@ -1,89 +1,58 @@
 import json
 import streamlit as st
 import datetime
-import swisseph as swe
-import pandas as pd
 import datetime as dt
-import requests
-import pytz
-
-def load_json_file(file_path):
-    """
-    Load data from a JSON file with error handling.
-
-    Args:
-        file_path (str): Path to the JSON file.
-
-    Returns:
-        dict: Parsed data from the JSON file if successful.
-    
-    Raises:
-        FileNotFoundError: If the file is not found.
-        JSONDecodeError: If there is an error decoding the JSON file.
-    """
-    try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
-    except FileNotFoundError:
-        st.error(f"File not found: {file_path}")
-    except json.JSONDecodeError:
-        st.error(f"Error decoding JSON in file: {file_path}")
+from core import chart
+from core.chart import calculate_sign
+from core.ephemeris import datetime_to_julday, julday_to_datetime
+from core.ephemeris_store import query_positions
+from core.geocoding import GeocodingError, geocode, suggest_places
+from core.houses import house_positions
+from core.parallel import DEFAULT_WORKERS
+from core.reference import default_orbs, load_reference
+from core.timezones import local_to_utc, timezone_at
+
+# calculate_sign, datetime_to_julday and julday_to_datetime moved to core and
+# are re-exported here under their old names for the pages
+__all__ = [
+    'initialize_session', 'birth_data', 'start_end_date', 'calculate_sign', 'datetime_to_julday',
+    'julday_to_datetime', 'calculate_planet_positions', 'is_aspect', 'aspect_table', 'find_aspect',
+    'sign_string', 'reference_data', 'find_house',
+]
 
 def initialize_session():
-    # Load sign data
+    # Reference tables are parsed once per process and shared, read-only, by every session
+    try:
+        reference = load_reference()
+    except FileNotFoundError as error:
+        st.error(f"File not found: {error.filename}")
+        st.stop()
+    except json.JSONDecodeError as error:
+        st.error(f"Error decoding JSON in the data files: {error}")
+        st.stop()
     if 'signs' not in st.session_state:
-        signs_data = load_json_file('data/signs.json')
-        st.session_state.signs = {
-            sign['id']: {
-                'name': sign['name'], 
-                'symbol': sign['symbol'], 
-                'element': sign['element'], 
-                'modality': sign['modality'],
-                'color': sign['color'],
-                'rgb_color': sign['rgb_color']
-            } for sign in signs_data
-        }
-
-    # Load astrological house data
+        st.session_state.signs = reference.signs
     if 'houses' not in st.session_state:
-        houses_data = load_json_file('data/houses.json')
-        st.session_state.houses = {
-            house['id']: {
-                'name': house['name'],
-                'symbol': house['symbol'],
-                'roman': house['roman_numeral']
-            } for house in houses_data
-        } 
-
-    # Load planet data
+        st.session_state.houses = reference.houses
     if 'planets' not in st.session_state:
-        planets_data = load_json_file('data/planets.json')
-        st.session_state.planets = {
-            planet['id']: {
-                'name': planet['name'], 
-                'symbol': planet['symbol'], 
-                'type': planet['type']
-            } for planet in planets_data
-        }
+        st.session_state.planets = reference.planets
+    if 'patterns' not in st.session_state:
+        st.session_state.patterns = reference.patterns
+
+    # Orbs are edited in Settings: each session keeps only its own {aspect id: orb}
+    if 'orbs' not in st.session_state:
+        st.session_state.orbs = default_orbs()
 
-    # Load aspect data
-    if 'aspects' not in st.session_state:
-        aspects_data = load_json_file('data/aspects.json')
-        st.session_state.aspects = {
-            aspect['id']: {
-                'name': aspect['name'], 
-                'symbol': aspect['symbol'], 
-                'angle': aspect['angle'], 
-                'orb': aspect['orb']
-            } for aspect in aspects_data
-        }
-    
     # Initialize default date range in session_state
     if 'start_date' not in st.session_state:
         st.session_state.start_date = datetime.date.today()
     if 'end_date' not in st.session_state:
         st.session_state.end_date = datetime.date.today() + datetime.timedelta(days=365)
 
+    # Number of worker processes for long time-range scans
+    if 'scan_workers' not in st.session_state:
+        st.session_state.scan_workers = DEFAULT_WORKERS
+
     # Initialize other session_state variables
     if 'first_name' not in st.session_state:
         st.session_state.first_name = None
@@ -109,21 +78,6 @@ def initialize_session():
         st.session_state.bday_longitude_direction = None   
 
 def birth_data():
-    def get_coordinates(city_name):
-        api_key = '4c0bc0bb660c4b4cb7c6f01873c9d372'
-        url = f'https://api.opencagedata.com/geocode/v1/json?q={city_name}&key={api_key}'
-        response = requests.get(url)
-        data = response.json()
-
-        if data['results']:
-            result = data['results'][0]
-            latitude = result['geometry']['lat']
-            longitude = result['geometry']['lng']
-            timezone = result['annotations']['timezone']['name']  # Retrieve timezone from the API
-            return latitude, longitude, timezone
-        else:
-            return None, None, None
-    
     # Input columns for first and last names
     first_name_col, last_name_col = st.columns(2)
     st.session_state.first_name = first_name_col.text_input(label='First Name', value=st.session_state.first_name)
@@ -141,8 +95,25 @@ def birth_data():
     st.session_state.city_name = city_col[0].text_input(label='City of Birth', value=st.session_state.get('city_name', ''))
 
     if st.session_state.city_name:
-        latitude, longitude, timezone = get_coordinates(st.session_state.city_name)
-        if latitude and longitude:
+        # Offline gazetteer first; the remote geocoder only when it has no match
+        suggestions = suggest_places(st.session_state.city_name)
+        if len(suggestions) > 1:
+            place_index = city_col[0].selectbox(
+                label='Matching Places',
+                options=range(len(suggestions)),
+                format_func=lambda index: f'{suggestions[index].label} ({suggestions[index].timezone})'
+            )
+            place = suggestions[place_index]
+        else:
+            try:
+                place = suggestions[0] if suggestions else geocode(st.session_state.city_name)
+            except GeocodingError as error:
+                # Service down, or no gazetteer and no API key (see Readme.md): not the same as an unknown city
+                st.error(f"Cannot look up the city: {error}.")
+                return
+
+        if place is not None:
+            latitude, longitude, timezone = place.latitude, place.longitude, place.timezone
             # Save latitude and longitude in the same session_state keys as before
             st.session_state.bday_latitude_deg = int(abs(latitude))  # Convert to integer degrees
             st.session_state.bday_latitude_min = int((abs(latitude) - abs(int(latitude))) * 60)  # Convert to minutes
@@ -160,12 +131,14 @@ def birth_data():
                 hour=st.session_state.bday_hour,
                 minute=st.session_state.bday_minute
             )
-            tz = pytz.timezone(timezone)
-
-            local_time_with_tz = tz.localize(local_time)
-
-            # Convert to UTC
-            utc_time = local_time_with_tz.astimezone(pytz.utc)
+            # Convert to UTC; the zone comes from the coordinates when the place has none
+            try:
+                timezone = timezone or timezone_at(latitude, longitude)
+            except FileNotFoundError as error:
+                st.error(f"{error.strerror}; the birth time cannot be converted to UTC without a timezone.")
+                st.session_state.bday_julday_utc = None
+                return
+            utc_time = local_to_utc(local_time, timezone)
             st.session_state.bday_utc_time = utc_time
             
             st.session_state.bday_julday_utc = datetime_to_julday(utc_time)
@@ -195,60 +168,7 @@ def start_end_date():
         label_visibility='collapsed'
     )
 
-def calculate_sign(longitude):
-    """
-    Calculate the zodiac sign for a given planetary longitude.
-
-    Args:
-        longitude (float): Longitude of the planet in degrees.
-
-    Returns:
-        int: The zodiac sign corresponding to the longitude (0-11).
-    """
-    return int(longitude // 30)
-
-def datetime_to_julday(date):
-    """
-    Convert a datetime object to a Julian day.
-
-    Args:
-        date (datetime): A Python datetime object.
-
-    Returns:
-        float: The Julian day corresponding to the given date.
-    """
-    year = date.year
-    month = date.month
-    day = date.day
-    hour = getattr(date, 'hour', 0)
-    minute = getattr(date, 'minute', 0)
-    second = getattr(date, 'second', 0)
-    microsecond = getattr(date, 'microsecond', 0)
-    
-    hour_float = hour + minute / 60 + second / 3600 + microsecond / 3600000
-    return swe.julday(year, month, day, hour_float)
-
-def julday_to_datetime(julday: float) -> datetime:
-    """
-    Convert a Julian day to a datetime object.
-
-    Args:
-        julday (float): Julian day to be converted.
-
-    Returns:
-        datetime: A Python datetime object representing the given Julian day.
-    """
-    year, month, day, hour = swe.revjul(julday)
-    
-    # Extract hours, minutes, and seconds from the fractional part of the day
-    hours = int(hour)
-    minutes = int((hour - hours) * 60)
-    seconds = int((((hour - hours) * 60) - minutes) * 60)
-    
-    # Create the datetime object
-    return datetime.datetime(year, month, day, hours, minutes, seconds)
-
-def calculate_planet_positions(julday_start, julday_end, julday_step):
+def calculate_planet_positions(julday_start, julday_end, julday_step, as_frame=True):
     """
     Calculate planetary positions over a specified date range.
 
@@ -256,22 +176,14 @@ def calculate_planet_positions(julday_start, julday_end, julday_step):
         julday_start (float): The starting Julian day.
         julday_end (float): The ending Julian day.
         julday_step (float): The increment in Julian days for each calculation step.
+        as_frame (bool, optional): Return the long-format DataFrame view (default).
+            When False, the array-backed PlanetPositions is returned instead.
 
     Returns:
-        pd.DataFrame: A DataFrame containing the calculated planetary positions.
+        pd.DataFrame or PlanetPositions: The calculated planetary positions.
     """
-    data = []
-    julday = julday_start
-    while julday <= julday_end:
-        for planet_id, planet in st.session_state.planets.items():
-            lon = swe.calc_ut(julday, planet_id)[0][0]
-            data.append({
-                'julday': julday,
-                'planet_id': planet_id,
-                'longitude': lon,
-            })
-        julday += julday_step
-    return pd.DataFrame(data)
+    positions = query_positions(julday_start, julday_end, julday_step, st.session_state.planets.keys())
+    return positions.to_frame() if as_frame else positions
 
 def is_aspect(angle1, angle2, aspect_id):
     """
@@ -285,32 +197,32 @@ def is_aspect(angle1, angle2, aspect_id):
     Returns:
         bool: True if the aspect is formed, False otherwise.
     """
-    aspect = st.session_state.aspects[aspect_id]
-    angle = aspect['angle']
-    orb = aspect['orb']
-    return angle - orb <= abs(swe.difdeg2n(angle1, angle2)) <= angle + orb
+    return chart.is_aspect(angle1, angle2, reference_data().aspects[aspect_id])
+
+def aspect_table():
+    """
+    Build the vectorized aspect table from the session's aspects and orbs.
+
+    Returns:
+        AspectTable: Aspect ids, angles and orbs as arrays.
+    """
+    return reference_data().aspect_table()
 
 def find_aspect(lon1, lon2):
-    for id in st.session_state.aspects.keys():
-        if is_aspect(lon1, lon2, id):
-            return id
-    return None
+    return chart.find_aspect(lon1, lon2, reference_data().aspects)
 
 def sign_string(lon):
-    # Determine the sign based on the longitude
-    sign = calculate_sign(lon)
-    # Retrieve the symbol for the sign from session_state
-    sign_symbol = st.session_state.signs[sign]['symbol']
-    # Calculate the degrees within the sign (0-29)
-    degree = lon - sign * 30
-    deg_int = int(degree)
-    # Calculate minutes and seconds
-    minute = (degree - deg_int) * 60
-    min_int = int(minute)
-    second = (minute - min_int) * 60
-    sec_int = round(second)  # Rounded to avoid float precision issues
-    # Return formatted string
-    return f'{sign_symbol} {deg_int}° {min_int}\' {sec_int}\"'
+    return chart.sign_string(lon, load_reference().sign_table())
+
+def reference_data():
+    """
+    Reference tables with the session's aspect orbs.
+
+    Returns:
+        ReferenceData: The shared tables, with the orbs edited in Settings
+        laid over the aspects.
+    """
+    return load_reference().with_orbs(st.session_state.orbs)
 
 def find_house(jd, planet_id, lat, lon, hsys=b'P'):
     """
@@ -326,23 +238,6 @@ def find_house(jd, planet_id, lat, lon, hsys=b'P'):
     Returns:
     int: The house position of the planet.
     """
-    # Calculate ARMC (Apparent Right Ascension of the Meridian)
-    armc = swe.sidtime(jd) * 15 + lon
-    
-    # Calculate the ecliptic obliquity
-    eps = swe.calc_ut(jd, swe.ECL_NUT)[0][0]
-    
-    # Get the ecliptic longitude and latitude of the planet
-    planet_pos = swe.calc_ut(jd, planet_id)[0]
-    ecl_lon = planet_pos[0]
-    ecl_lat = planet_pos[1]
-    
-    # Prepare the input for house position calculation
-    xpin = (ecl_lon, ecl_lat)
-    serr = bytes(256)
-    
-    # Calculate the house position
-    house_pos = swe.house_pos(armc, lat, eps, xpin, hsys)
-    house_number = int(house_pos)
-    
-    return house_number
\ No newline at end of file
+    # Time-dependent quantities are computed once inside the batch API
+    house_numbers, _ = house_positions(jd, [planet_id], lat, lon, hsys)
+    return int(house_numbers[0])
\ No newline at end of file